@@ -0,0 +1,66 @@
+import logging
+from os import environ, path
+from pathlib import Path
+
+from pnd_utils.configuration.config_exceptions import InvalidConfigException
+from pnd_utils.configuration.configuration import Configuration, ConfigurationCollection
+from pnd_utils.logging import get_logger
+
+
+class CassetteConfiguration(Configuration):  # type: ignore
+    class Defaults:
+        logger = get_logger("config.cassette", level=logging.INFO)
+        cassette_path = path.join(Path(__file__).parents[2], "cache", "cassette.jsonl")
+        time_scale = 1.0
+
+    class Modes:
+        off = ""
+        record = "record"
+        replay = "replay"
+
+    def __init__(
+        self,
+        mode: str = Modes.off,
+        cassette_path: str = Defaults.cassette_path,
+        time_scale: float = Defaults.time_scale,
+        logger: logging.Logger = Defaults.logger,
+    ):
+        super().__init__()
+        self.mode = mode
+        self.cassette_path = cassette_path
+        self.time_scale = time_scale
+        self.logger = logger
+
+    def validate(self) -> None:
+        if self.mode not in (self.Modes.off, self.Modes.record, self.Modes.replay):
+            raise InvalidConfigException(
+                "$CASSETTE_MODE must be empty, 'record' or 'replay'"
+            )
+        if self.time_scale < 0:
+            raise InvalidConfigException("$CASSETTE_TIME_SCALE must not be negative")
+
+
+class CassetteConfigurationCollection(
+    ConfigurationCollection[CassetteConfiguration]  # type: ignore
+):
+    def get_config(self, config_name: str) -> CassetteConfiguration:
+        return super().get_config(config_name)
+
+    def get_all_configs(self) -> dict[str, CassetteConfiguration]:
+        return super().get_all_configs()
+
+
+cassette_configs = CassetteConfigurationCollection()
+cassette_configs.add(
+    cassette=CassetteConfiguration(
+        mode=environ.get("CASSETTE_MODE", CassetteConfiguration.Modes.off),
+        cassette_path=environ.get(
+            "CASSETTE_PATH", CassetteConfiguration.Defaults.cassette_path
+        ),
+        time_scale=float(
+            environ.get(
+                "CASSETTE_TIME_SCALE", CassetteConfiguration.Defaults.time_scale
+            )
+        ),
+    ),
+)
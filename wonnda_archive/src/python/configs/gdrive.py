@@ -1,5 +1,6 @@
 import logging
-from os import environ
+from os import environ, path
+from pathlib import Path
 
 from pnd_utils.configuration.config_exceptions import InvalidConfigException
 from pnd_utils.configuration.configuration import Configuration, ConfigurationCollection
@@ -10,6 +11,11 @@ class GDriveConfiguration(Configuration):  # type: ignore
     class Defaults:
         logger = get_logger("config.gdrive", level=logging.INFO)
         dwh_dataset = "dl_gdrive"
+        manifest_table = "ingest_manifest"
+        schema_sample_size = 1000
+        query_templates_path = path.join(
+            Path(__file__).parents[2], "sql", "bigquery_templates"
+        )
 
     def __init__(
         self,
@@ -18,6 +24,9 @@ class GDriveConfiguration(Configuration):  # type: ignore
         processed_folder_id: str,
         dwh_table: str,
         dwh_dataset: str = Defaults.dwh_dataset,
+        manifest_table: str = Defaults.manifest_table,
+        schema_sample_size: int = Defaults.schema_sample_size,
+        query_templates_path: str = Defaults.query_templates_path,
         logger: logging.Logger = Defaults.logger,
     ):
         super().__init__()
@@ -27,6 +36,9 @@ class GDriveConfiguration(Configuration):  # type: ignore
         self.processed_folder_id = processed_folder_id
         self.dwh_table = dwh_table
         self.dwh_dataset = dwh_dataset
+        self.manifest_table = manifest_table
+        self.schema_sample_size = schema_sample_size
+        self.query_templates_path = query_templates_path
 
     def validate(self) -> None:
         if not self.service_account_file_path:
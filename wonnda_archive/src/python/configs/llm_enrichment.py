@@ -1,6 +1,7 @@
 import logging
-from os import path
+from os import environ, path
 from pathlib import Path
+from typing import Optional
 
 from pnd_utils.configuration.config_exceptions import InvalidConfigException
 from pnd_utils.configuration.configuration import Configuration, ConfigurationCollection
@@ -8,12 +9,47 @@ from pnd_utils.logging import get_logger
 
 
 class LLMEnrichmentConfiguration(Configuration):  # type: ignore
+    class Priorities:
+        # Companies seen at the most recent tradeshow first
+        latest_tradeshow_date = "latest_tradeshow_date"
+        # Companies already linked to Bubble first
+        bubble_company_id = "bubble_company_id"
+        # Companies with the fewest missing input fields first
+        missing_fields = "missing_fields"
+
+    class InputFields:
+        # Fields the prompts are built from, read from the columns mapped to
+        # them in input_columns
+        company_name = "company_name"
+        address = "address"
+        description = "description"
+        domain = "domain"
+        country = "country"
+
     class Defaults:
         unprocessed_dataset = "ol"
         processed_dataset = "el"
         query_templates_path = path.join(
             Path(__file__).parents[2], "sql", "bigquery_templates"
         )
+        processed_watermark_column = "enriched_at"
+        unprocessed_watermark_column = "loaded_at"
+        # The processed ID index needs a directory that outlives the job, e.g. a
+        # mounted bucket. Without one, pending rows are found by an anti-join
+        index_dir = environ.get("LLM_ENRICHMENT_INDEX_DIR")
+        # Input field -> column of the target, the columns of ol.companies
+        input_columns = {
+            "company_name": "company_name",
+            "address": "address",
+            "description": "description",
+            "domain": "domain",
+            "country": "country",
+        }
+        priorities = [
+            "latest_tradeshow_date",
+            "bubble_company_id",
+            "missing_fields",
+        ]
         logger = get_logger("config.llm_enrichment", level=logging.INFO)
 
     def __init__(
@@ -24,6 +60,13 @@ class LLMEnrichmentConfiguration(Configuration):  # type: ignore
         unprocessed_dataset: str = Defaults.unprocessed_dataset,
         processed_dataset: str = Defaults.processed_dataset,
         query_templates_path: str = Defaults.query_templates_path,
+        processed_watermark_column: str = Defaults.processed_watermark_column,
+        unprocessed_watermark_column: str = Defaults.unprocessed_watermark_column,
+        index_dir: Optional[str] = Defaults.index_dir,
+        input_columns: Optional[dict[str, str]] = None,
+        priorities: Optional[list[str]] = None,
+        max_runtime: Optional[float] = None,
+        max_spend: Optional[float] = None,
         logger: logging.Logger = Defaults.logger,
     ):
         super().__init__()
@@ -33,11 +76,53 @@ class LLMEnrichmentConfiguration(Configuration):  # type: ignore
         self.unprocessed_dataset = unprocessed_dataset
         self.processed_dataset = processed_dataset
         self.query_templates_path = query_templates_path
+        self.processed_watermark_column = processed_watermark_column
+        self.unprocessed_watermark_column = unprocessed_watermark_column
+        self.index_path = (
+            path.join(index_dir, f"{processed_dataset}_{processed_table}.json")
+            if index_dir
+            else None
+        )
+        # Fields that are not mapped are read from the column of the same name
+        self.input_columns = {**self.Defaults.input_columns, **(input_columns or {})}
+        self.priorities = (
+            priorities if priorities is not None else list(self.Defaults.priorities)
+        )
+        self.max_runtime = max_runtime
+        self.max_spend = max_spend
         self.logger = logger
 
     def validate(self) -> None:
         if not (self.unprocessed_table and self.processed_table):
             raise InvalidConfigException("Please set table names.")
+        if not self.id_column:
+            raise InvalidConfigException("Please set an ID column.")
+        known_input_fields = (
+            self.InputFields.company_name,
+            self.InputFields.address,
+            self.InputFields.description,
+            self.InputFields.domain,
+            self.InputFields.country,
+        )
+        unknown_input_fields = [
+            field for field in self.input_columns if field not in known_input_fields
+        ]
+        if unknown_input_fields:
+            raise InvalidConfigException(
+                f"Unknown input fields {', '.join(unknown_input_fields)}."
+            )
+        known_priorities = (
+            self.Priorities.latest_tradeshow_date,
+            self.Priorities.bubble_company_id,
+            self.Priorities.missing_fields,
+        )
+        unknown_priorities = [
+            priority for priority in self.priorities if priority not in known_priorities
+        ]
+        if unknown_priorities:
+            raise InvalidConfigException(
+                f"Unknown priorities {', '.join(unknown_priorities)}."
+            )
 
 
 class LLMEnrichmentConfigurationCollection(
@@ -50,6 +135,8 @@ class LLMEnrichmentConfigurationCollection(
         return super().get_all_configs()
 
 
+# Every target needs a unique id_column and the columns its input_columns map
+# the input fields to, e.g. input_columns={"company_name": "offering_name"}
 llm_enrichment_configs = LLMEnrichmentConfigurationCollection()
 llm_enrichment_configs.add(
     companies=LLMEnrichmentConfiguration(
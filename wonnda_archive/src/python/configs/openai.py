@@ -10,18 +10,62 @@ class OpenAIConfiguration(Configuration):  # type: ignore
     class Defaults:
         logger = get_logger("config.openai", level=logging.INFO)
         model = "gpt-4o-mini"
+        requests_per_minute = 500
+        tokens_per_minute = 200_000
+        max_concurrency = 4
+        # USD per million tokens of the default model
+        input_price_per_million = 0.15
+        output_price_per_million = 0.6
+        # Batch requests are billed at half the price
+        batch_input_price_per_million = 0.075
+        batch_output_price_per_million = 0.3
+        batch_base_url = "https://api.openai.com/v1"
+        batch_poll_interval = 60
+        # Append-only log of the submitted batches and their outcome
+        batch_state_dataset = "el"
+        batch_state_table = "enrichment_batches"
+        # Inputs of the requests of each batch, to resume pending batches
+        batch_request_table = "enrichment_batch_requests"
 
     def __init__(
         self,
+        api_key: str,
         model: str = Defaults.model,
+        requests_per_minute: int = Defaults.requests_per_minute,
+        tokens_per_minute: int = Defaults.tokens_per_minute,
+        max_concurrency: int = Defaults.max_concurrency,
+        input_price_per_million: float = Defaults.input_price_per_million,
+        output_price_per_million: float = Defaults.output_price_per_million,
+        batch_input_price_per_million: float = Defaults.batch_input_price_per_million,
+        batch_output_price_per_million: float = (
+            Defaults.batch_output_price_per_million
+        ),
+        batch_base_url: str = Defaults.batch_base_url,
+        batch_poll_interval: float = Defaults.batch_poll_interval,
+        batch_state_dataset: str = Defaults.batch_state_dataset,
+        batch_state_table: str = Defaults.batch_state_table,
+        batch_request_table: str = Defaults.batch_request_table,
         logger: logging.Logger = Defaults.logger,
     ):
         super().__init__()
+        self.api_key = api_key
         self.model = model
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max_concurrency
+        self.input_price_per_million = input_price_per_million
+        self.output_price_per_million = output_price_per_million
+        self.batch_input_price_per_million = batch_input_price_per_million
+        self.batch_output_price_per_million = batch_output_price_per_million
+        self.batch_base_url = batch_base_url
+        self.batch_poll_interval = batch_poll_interval
+        self.batch_state_dataset = batch_state_dataset
+        self.batch_state_table = batch_state_table
+        self.batch_request_table = batch_request_table
         self.logger = logger
 
     def validate(self) -> None:
-        if not environ.get("OPENAI_API_KEY"):
+        if not self.api_key:
             raise InvalidConfigException("Please provide a key via $OPENAI_API_KEY")
 
 
@@ -36,4 +80,11 @@ class OpenAIConfigurationCollection(
 
 
 openai_configs = OpenAIConfigurationCollection()
-openai_configs.add(openai=OpenAIConfiguration())
+openai_configs.add(
+    openai=OpenAIConfiguration(
+        api_key=environ.get("OPENAI_API_KEY", ""),
+        batch_base_url=environ.get(
+            "OPENAI_BATCH_BASE_URL", OpenAIConfiguration.Defaults.batch_base_url
+        ),
+    ),
+)
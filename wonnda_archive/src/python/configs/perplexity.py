@@ -10,16 +10,30 @@ class PerplexityConfiguration(Configuration):  # type: ignore
     class Defaults:
         logger = get_logger("config.perplexity", level=logging.INFO)
         model = "sonar"
+        # API rate limit of the default model
+        requests_per_minute = 50
+        # USD per million tokens and per request of the default model
+        input_price_per_million = 1.0
+        output_price_per_million = 1.0
+        request_price = 0.005
 
     def __init__(
         self,
         auth_token: str,
         model: str = Defaults.model,
+        requests_per_minute: int = Defaults.requests_per_minute,
+        input_price_per_million: float = Defaults.input_price_per_million,
+        output_price_per_million: float = Defaults.output_price_per_million,
+        request_price: float = Defaults.request_price,
         logger: logging.Logger = Defaults.logger,
     ):
         super().__init__()
         self.auth_token = auth_token
         self.model = model
+        self.requests_per_minute = requests_per_minute
+        self.input_price_per_million = input_price_per_million
+        self.output_price_per_million = output_price_per_million
+        self.request_price = request_price
         self.logger = logger
 
     def validate(self) -> None:
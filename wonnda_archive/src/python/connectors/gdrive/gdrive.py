@@ -0,0 +1,74 @@
+import logging
+from typing import Any
+
+import requests
+from google.auth.transport.requests import Request
+from google.oauth2.service_account import Credentials
+from pnd_utils.logging import get_logger
+from requests.exceptions import HTTPError
+from retry import retry
+
+DEFAULT_LOGGER = get_logger("client.gdrive", level=logging.INFO)
+
+
+class GDrive:
+    BASE_URL = "https://www.googleapis.com/drive/v3"
+    REQUEST_TIMEOUT = 120
+    PAGE_SIZE = 1000
+    SCOPES = ["https://www.googleapis.com/auth/drive.readonly"]
+    # Listed file metadata, including the checksum and modification time the
+    # ingest manifest needs
+    FILE_FIELDS = "nextPageToken, files(id, name, mimeType, md5Checksum, modifiedTime)"
+
+    class Endpoints:
+        files = "files"
+
+    def __init__(self, service_account_file_path: str, logger: logging.Logger):
+        self.credentials = Credentials.from_service_account_file(
+            service_account_file_path, scopes=self.SCOPES
+        )
+        self.logger = logger
+
+    def get_headers(self) -> dict[str, str]:
+        if not self.credentials.valid:
+            self.credentials.refresh(Request())
+
+        return {"Authorization": f"Bearer {self.credentials.token}"}
+
+    @retry(
+        exceptions=HTTPError,
+        tries=4,
+        delay=2,
+        backoff=30,
+        logger=DEFAULT_LOGGER,
+    )
+    def list_files_in_folder(self, folder_id: str) -> list[dict[str, Any]]:
+        """
+        List the files in a folder with their Drive metadata. Native Google
+        files have no MD5 checksum.
+
+        :param folder_id: ID of the folder
+        :return: ID, name, mimeType, md5Checksum and modifiedTime per file
+        """
+        files = list()
+        page_token = None
+        while True:
+            response = requests.get(
+                url="/".join([self.BASE_URL, self.Endpoints.files]),
+                headers=self.get_headers(),
+                params={
+                    "q": f"{folder_id!r} in parents and trashed = false",
+                    "fields": self.FILE_FIELDS,
+                    "pageSize": self.PAGE_SIZE,
+                    "pageToken": page_token,
+                    "supportsAllDrives": True,
+                    "includeItemsFromAllDrives": True,
+                },
+                timeout=self.REQUEST_TIMEOUT,
+            )
+            response.raise_for_status()
+            response_json = response.json()
+            files.extend(response_json.get("files", list()))
+            page_token = response_json.get("nextPageToken")
+            if not page_token:
+                return files
@@ -1,24 +1,34 @@
 import logging
-from typing import Type
+from typing import Optional, Type
 
 from langchain_core.exceptions import OutputParserException
 from langchain_core.messages import HumanMessage
 from langchain_openai import ChatOpenAI
+from openai import RateLimitError
 from pnd_utils.logging import get_logger
 from pydantic import BaseModel
 from retry import retry
+from utils.rate_limiter import RateLimiter
+from utils.spend_meter import SpendMeter
 
 DEFAULT_LOGGER = get_logger("client.openai", level=logging.INFO)
 
 
 class OpenAI:
+    # Rough token estimate for prompts, which are mostly English text
+    CHARS_PER_TOKEN = 4
+
     def __init__(
         self,
         logger: logging.Logger,
         model: str,
         temperature: float = 0,
+        rate_limiter: Optional[RateLimiter] = None,
+        spend_meter: Optional[SpendMeter] = None,
     ):
         self.logger = logger
+        self.rate_limiter = rate_limiter
+        self.spend_meter = spend_meter
         self._llm = ChatOpenAI(
             model=model,
             temperature=temperature,
@@ -34,28 +44,63 @@ class OpenAI:
         message = [HumanMessage(prompt)]
         prompt_response = self._llm.invoke(message)
 
+        usage = prompt_response.usage_metadata
+        if self.spend_meter and usage:
+            self.spend_meter.record(
+                input_tokens=usage["input_tokens"],
+                output_tokens=usage["output_tokens"],
+            )
+
         return prompt_response.content
 
     @retry(
-        exceptions=OutputParserException,
+        exceptions=(OutputParserException, RateLimitError),
         tries=3,
         delay=30,
         backoff=4,
         logger=DEFAULT_LOGGER,
     )
     def get_structured_response(
-        self, prompt: str, structure: Type[BaseModel]
+        self,
+        prompt: str,
+        structure: Type[BaseModel],
+        expected_completion_tokens: int = 0,
     ) -> BaseModel:
         """
         Get structured response according to provided Pydantic model.
 
         :param prompt: Input text prompt
         :param structure: Pydantic model class for response structure
+        :param expected_completion_tokens: Estimated response size, used to
+        reserve the token budget of the rate limiter
         :return: Structured response as Pydantic model instance
         """
-        structured_llm = self._llm.with_structured_output(structure)
+        structured_llm = self._llm.with_structured_output(structure, include_raw=True)
         message = [HumanMessage(prompt)]
 
-        prompt_response = structured_llm.invoke(message)
+        reservation = None
+        if self.rate_limiter:
+            reservation = self.rate_limiter.acquire(
+                tokens=len(prompt) // self.CHARS_PER_TOKEN + expected_completion_tokens
+            )
+        try:
+            prompt_response = structured_llm.invoke(message)
+        except RateLimitError:
+            if self.rate_limiter:
+                self.rate_limiter.report_rate_limit()
+            raise
+
+        usage = prompt_response["raw"].usage_metadata
+        if self.rate_limiter and reservation and usage:
+            self.rate_limiter.record_usage(
+                reservation=reservation, tokens=usage["total_tokens"]
+            )
+        if self.spend_meter and usage:
+            self.spend_meter.record(
+                input_tokens=usage["input_tokens"],
+                output_tokens=usage["output_tokens"],
+            )
+        if prompt_response["parsing_error"]:
+            raise OutputParserException(str(prompt_response["parsing_error"]))
 
-        return prompt_response
+        return prompt_response["parsed"]
@@ -0,0 +1,278 @@
+import json
+import logging
+from time import monotonic, sleep
+from typing import Any, Optional, Type
+
+import requests
+from pnd_utils.logging import get_logger
+from pydantic import BaseModel
+from requests.exceptions import HTTPError
+from retry import retry
+from utils.spend_meter import SpendMeter
+
+DEFAULT_LOGGER = get_logger("client.openai_batch", level=logging.INFO)
+
+
+class BatchFailedError(Exception):
+    pass
+
+
+class BatchTimeoutError(Exception):
+    pass
+
+
+def get_strict_schema(schema: Any) -> Any:
+    """
+    Make a JSON schema comply with the strict mode of structured outputs, in
+    which every object lists all its properties as required and allows no
+    others.
+
+    :param schema: JSON schema, e.g. of a pydantic model
+    :return: Strict copy of the schema
+    """
+    if isinstance(schema, list):
+        return [get_strict_schema(item) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+
+    strict_schema = {key: get_strict_schema(value) for key, value in schema.items()}
+    if strict_schema.get("type") == "object" and "properties" in strict_schema:
+        strict_schema["additionalProperties"] = False
+        strict_schema["required"] = list(strict_schema["properties"])
+
+    return strict_schema
+
+
+class OpenAIBatch:
+    BASE_URL = "https://api.openai.com/v1"
+    REQUEST_TIMEOUT = 120
+    COMPLETION_WINDOW = "24h"
+
+    class Endpoints:
+        files = "files"
+        batches = "batches"
+        # Endpoint the batch requests are run against, relative to the API host
+        chat_completions = "/v1/chat/completions"
+
+    class Statuses:
+        completed = "completed"
+        failed = "failed"
+        expired = "expired"
+        cancelled = "cancelled"
+
+    def __init__(
+        self,
+        token: str,
+        model: str,
+        logger: logging.Logger,
+        base_url: str = BASE_URL,
+        temperature: float = 0,
+        spend_meter: Optional[SpendMeter] = None,
+    ):
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.model = model
+        self.logger = logger
+        self.base_url = base_url
+        self.temperature = temperature
+        self.spend_meter = spend_meter
+
+    def render_request(
+        self, custom_id: str, prompt: str, structure: Type[BaseModel]
+    ) -> dict[str, Any]:
+        """
+        Render a single structured chat completion request of a batch.
+
+        :param custom_id: ID to match the result to the request
+        :param prompt: Input text prompt
+        :param structure: Pydantic model class for response structure
+        :return: Batch request line
+        """
+        return {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": self.Endpoints.chat_completions,
+            "body": {
+                "model": self.model,
+                "temperature": self.temperature,
+                "messages": [{"role": "user", "content": prompt}],
+                "response_format": {
+                    "type": "json_schema",
+                    "json_schema": {
+                        "name": structure.__name__,
+                        "schema": get_strict_schema(structure.model_json_schema()),
+                        "strict": True,
+                    },
+                },
+            },
+        }
+
+    @retry(
+        exceptions=HTTPError,
+        tries=4,
+        delay=2,
+        backoff=30,
+        logger=DEFAULT_LOGGER,
+    )
+    def submit_batch(
+        self, batch_requests: list[tuple[str, str, Type[BaseModel]]]
+    ) -> str:
+        """
+        Upload structured chat completion requests as a JSONL file and create a
+        batch for them.
+
+        :param batch_requests: Tuples of custom ID, prompt and response structure
+        :return: ID of the created batch
+        """
+        batch_file = "\n".join(
+            json.dumps(self.render_request(custom_id, prompt, structure))
+            for custom_id, prompt, structure in batch_requests
+        )
+
+        file_response = requests.post(
+            url="/".join([self.base_url, self.Endpoints.files]),
+            headers=self.headers,
+            data={"purpose": "batch"},
+            files={"file": ("batch.jsonl", batch_file.encode())},
+            timeout=self.REQUEST_TIMEOUT,
+        )
+        file_response.raise_for_status()
+
+        batch_response = requests.post(
+            url="/".join([self.base_url, self.Endpoints.batches]),
+            headers=self.headers,
+            json={
+                "input_file_id": file_response.json()["id"],
+                "endpoint": self.Endpoints.chat_completions,
+                "completion_window": self.COMPLETION_WINDOW,
+            },
+            timeout=self.REQUEST_TIMEOUT,
+        )
+        batch_response.raise_for_status()
+        batch_id: str = batch_response.json()["id"]
+        self.logger.info(
+            f"Submitted batch {batch_id} with {len(batch_requests)} requests."
+        )
+
+        return batch_id
+
+    @retry(
+        exceptions=HTTPError,
+        tries=4,
+        delay=2,
+        backoff=30,
+        logger=DEFAULT_LOGGER,
+    )
+    def get_batch(self, batch_id: str) -> dict[str, Any]:
+        """
+        Get the current state of a batch.
+
+        :param batch_id: ID of the batch
+        :return: Batch object
+        """
+        response = requests.get(
+            url="/".join([self.base_url, self.Endpoints.batches, batch_id]),
+            headers=self.headers,
+            timeout=self.REQUEST_TIMEOUT,
+        )
+        response.raise_for_status()
+
+        return response.json()
+
+    @retry(
+        exceptions=HTTPError,
+        tries=4,
+        delay=2,
+        backoff=30,
+        logger=DEFAULT_LOGGER,
+    )
+    def get_file_content(self, file_id: str) -> str:
+        """
+        Download the content of a file.
+
+        :param file_id: ID of the file
+        :return: File content
+        """
+        response = requests.get(
+            url="/".join([self.base_url, self.Endpoints.files, file_id, "content"]),
+            headers=self.headers,
+            timeout=self.REQUEST_TIMEOUT,
+        )
+        response.raise_for_status()
+
+        return response.text
+
+    def wait_for_batch(
+        self,
+        batch_id: str,
+        poll_interval: float,
+        max_wait: Optional[float] = None,
+    ) -> dict[str, str]:
+        """
+        Poll a batch until it is finished and return the response messages. The
+        usage of the responses is recorded in the spend meter.
+
+        :param batch_id: ID of the batch
+        :param poll_interval: Seconds to wait between status checks
+        :param max_wait: Seconds after which to stop polling, None to wait until
+        the batch is finished
+        :return: Response message content per custom ID. Requests that failed
+        individually are logged and left out.
+        :raises BatchFailedError: if the batch failed, expired or was cancelled
+        :raises BatchTimeoutError: if the batch is not finished after max_wait
+        """
+        start_time = monotonic()
+        batch = self.get_batch(batch_id)
+        while batch["status"] not in (
+            self.Statuses.completed,
+            self.Statuses.failed,
+            self.Statuses.expired,
+            self.Statuses.cancelled,
+        ):
+            if max_wait is not None and monotonic() - start_time + poll_interval > (
+                max_wait
+            ):
+                raise BatchTimeoutError(
+                    f"Batch {batch_id} is still {batch['status']} after "
+                    f"{monotonic() - start_time:.0f}s"
+                )
+            self.logger.info(
+                f"Batch {batch_id} is {batch['status']}. "
+                f"Checking again in {poll_interval}s."
+            )
+            sleep(poll_interval)
+            batch = self.get_batch(batch_id)
+
+        if batch["status"] != self.Statuses.completed:
+            raise BatchFailedError(f"Batch {batch_id} ended as {batch['status']}")
+
+        if batch.get("error_file_id"):
+            self.logger.warning(
+                f"Batch {batch_id} has failed requests in file {batch['error_file_id']}"
+            )
+
+        responses: dict[str, str] = dict()
+        if not batch.get("output_file_id"):
+            return responses
+
+        for line in self.get_file_content(batch["output_file_id"]).splitlines():
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            response = result.get("response") or {}
+            usage = (response.get("body") or {}).get("usage")
+            if usage and self.spend_meter is not None:
+                self.spend_meter.record(
+                    input_tokens=usage.get("prompt_tokens", 0),
+                    output_tokens=usage.get("completion_tokens", 0),
+                )
+            if result.get("error") or response.get("status_code") != 200:
+                self.logger.warning(
+                    f"Request {result['custom_id']} failed: "
+                    f"{result.get('error') or response.get('body')}"
+                )
+                continue
+            responses[result["custom_id"]] = response["body"]["choices"][0]["message"][
+                "content"
+            ]
+
+        return responses
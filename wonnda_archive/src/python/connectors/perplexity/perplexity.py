@@ -1,9 +1,12 @@
 import logging
+from typing import Optional
 
 import requests
 from pnd_utils.logging import get_logger
 from requests.exceptions import HTTPError
 from retry import retry
+from utils.rate_limiter import RateLimiter
+from utils.spend_meter import SpendMeter
 
 DEFAULT_LOGGER = get_logger("client.perplexity", level=logging.INFO)
 
@@ -29,7 +32,11 @@ class Perplexity:
         token: str,
         model: str,
         logger: logging.Logger,
+        rate_limiter: Optional[RateLimiter] = None,
+        spend_meter: Optional[SpendMeter] = None,
     ):
+        self.rate_limiter = rate_limiter
+        self.spend_meter = spend_meter
         self.headers = {
             "Authorization": f"Bearer {token}",
             "Content-Type": "application/json",
@@ -71,12 +78,17 @@ class Perplexity:
             ],
         }
 
+        reservation = None
+        if self.rate_limiter:
+            reservation = self.rate_limiter.acquire(tokens=0)
         response = requests.post(
             url=request_url,
             headers=self.headers,
             json=payload,
             timeout=self.REQUEST_TIMEOUT,
         )
+        if response.status_code == 429 and self.rate_limiter:
+            self.rate_limiter.report_rate_limit()
         response.raise_for_status()
 
         # Control for sporadic empty responses
@@ -84,6 +96,16 @@ class Perplexity:
             self.logger.warning("204 Empty Response")
             raise EmptyResponseError
 
-        prompt_response = response.json()["choices"][0]["message"]["content"]
+        response_json = response.json()
+        usage = response_json.get("usage")
+        if self.rate_limiter and reservation:
+            self.rate_limiter.record_usage(reservation=reservation, tokens=0)
+        if self.spend_meter and usage:
+            self.spend_meter.record(
+                input_tokens=usage["prompt_tokens"],
+                output_tokens=usage["completion_tokens"],
+            )
+
+        prompt_response = response_json["choices"][0]["message"]["content"]
 
         return prompt_response
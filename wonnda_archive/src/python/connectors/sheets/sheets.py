@@ -0,0 +1,105 @@
+import logging
+from typing import Any
+
+import requests
+from google.auth.transport.requests import Request
+from google.oauth2.service_account import Credentials
+from pnd_utils.logging import get_logger
+from requests.exceptions import HTTPError
+from retry import retry
+
+DEFAULT_LOGGER = get_logger("client.sheets", level=logging.INFO)
+
+
+def get_sheet_range(sheet_name: str) -> str:
+    """
+    Get the A1 range of a whole sheet, quoting the name as the Sheets API
+    requires for names with spaces or special characters.
+
+    :param sheet_name: Name of the sheet
+    :return: Range of the sheet
+    """
+    return "'{}'".format(sheet_name.replace("'", "''"))
+
+
+class Sheets:
+    BASE_URL = "https://sheets.googleapis.com/v4/spreadsheets"
+    REQUEST_TIMEOUT = 120
+    SCOPES = ["https://www.googleapis.com/auth/spreadsheets.readonly"]
+    SHEET_FIELDS = "sheets.properties(title,hidden)"
+
+    class Endpoints:
+        batch_get = "values:batchGet"
+
+    def __init__(self, service_account_file_path: str, logger: logging.Logger):
+        self.credentials = Credentials.from_service_account_file(
+            service_account_file_path, scopes=self.SCOPES
+        )
+        self.logger = logger
+
+    def get_headers(self) -> dict[str, str]:
+        if not self.credentials.valid:
+            self.credentials.refresh(Request())
+
+        return {"Authorization": f"Bearer {self.credentials.token}"}
+
+    @retry(
+        exceptions=HTTPError,
+        tries=4,
+        delay=2,
+        backoff=30,
+        logger=DEFAULT_LOGGER,
+    )
+    def get_sheet_names(self, spreadsheet_id: str) -> list[str]:
+        """
+        Get the names of the visible sheets of a spreadsheet.
+
+        :param spreadsheet_id: ID of the spreadsheet
+        :return: Sheet names in tab order
+        """
+        response = requests.get(
+            url="/".join([self.BASE_URL, spreadsheet_id]),
+            headers=self.get_headers(),
+            params={"fields": self.SHEET_FIELDS},
+            timeout=self.REQUEST_TIMEOUT,
+        )
+        response.raise_for_status()
+
+        return [
+            sheet["properties"]["title"]
+            for sheet in response.json().get("sheets", list())
+            if not sheet["properties"].get("hidden")
+        ]
+
+    @retry(
+        exceptions=HTTPError,
+        tries=4,
+        delay=2,
+        backoff=30,
+        logger=DEFAULT_LOGGER,
+    )
+    def read_sheets(
+        self, spreadsheet_id: str, sheet_names: list[str]
+    ) -> list[list[list[Any]]]:
+        """
+        Read the values of several sheets of a spreadsheet in a single request.
+
+        :param spreadsheet_id: ID of the spreadsheet
+        :param sheet_names: Names of the sheets to read
+        :return: Values per sheet, in the order of sheet_names. Empty sheets
+        have no values.
+        """
+        response = requests.get(
+            url="/".join([self.BASE_URL, spreadsheet_id, self.Endpoints.batch_get]),
+            headers=self.get_headers(),
+            params={
+                "ranges": [get_sheet_range(sheet_name) for sheet_name in sheet_names]
+            },
+            timeout=self.REQUEST_TIMEOUT,
+        )
+        response.raise_for_status()
+
+        return [
+            value_range.get("values", list())
+            for value_range in response.json().get("valueRanges", list())
+        ]
@@ -1,71 +1,379 @@
 from datetime import datetime
+from os import path
 from re import compile, sub
+from tempfile import TemporaryDirectory
+from typing import Any, NamedTuple, Optional
 
 from configs.bigquery import BigQueryConfiguration, bq_configs
+from configs.cassette import cassette_configs
 from configs.gdrive import GDriveConfiguration, gdrive_configs
+from connectors.gdrive.gdrive import GDrive
+from connectors.sheets.sheets import Sheets
 from pnd_database.bigquery.bigquery import BigQuery
 from pnd_database.bigquery.bigquery_utils import get_schema_from_row
 from pnd_gsheets.g_sheets import GSheets
 from pnd_gsheets.gsheets_utils import transform_sheet_data_to_list_of_dicts
+from utils.cassette import Cassette
+from utils.ingest_manifest import (
+    IngestManifest,
+    get_content_checksum,
+    get_row_fingerprint,
+)
+from utils.normalisation import normalise_tradeshow_company
+from utils.schema_planner import SchemaMismatchError, SchemaPlan
 
 XLSX_FILE_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
 GSHEETS_FILE_TYPE = "application/vnd.google-apps.spreadsheet"
 
 
-def process_file(
+class GDriveLoadFailedError(Exception):
+    pass
+
+
+def write_rows(
+    rows: list[dict[str, Any]],
+    table_name: str,
+    gdrive_config: GDriveConfiguration,
+    bq_client: BigQuery,
+    bq_config: BigQueryConfiguration,
+    check_for_new_columns: bool = False,
+) -> None:
+    """
+    Write rows to a table of the GDrive dataset, creating it if needed.
+    :param rows: Rows to write.
+    :param table_name: Name of the table.
+    :param gdrive_config: Google Drive configuration object.
+    :param bq_client: BigQuery client instance.
+    :param bq_config: BigQuery configuration object.
+    :param check_for_new_columns: Whether to add missing columns to the table.
+    """
+    bq_client.create_dataset(
+        dataset_name=gdrive_config.dwh_dataset, location=bq_config.location
+    )
+    if not bq_client.table_exists(
+        dataset_name=gdrive_config.dwh_dataset,
+        table_name=table_name,
+    ):
+        schema = get_schema_from_row(data=rows[0], schema=list())
+        bq_client.create_table(
+            dataset=gdrive_config.dwh_dataset,
+            table_name=table_name,
+            schema=schema,
+        )
+    bq_client.write_to_table(
+        data=rows,
+        dataset=gdrive_config.dwh_dataset,
+        table_name=table_name,
+        check_for_new_columns=check_for_new_columns,
+    )
+
+
+def get_ingest_manifest(
+    gdrive_config: GDriveConfiguration,
+    bq_client: BigQuery,
+) -> IngestManifest:
+    """
+    Read the checksums of ingested files and the fingerprints of the rows
+    loaded to the DWH table.
+    :param gdrive_config: Google Drive configuration object.
+    :param bq_client: BigQuery client instance.
+    :return: Ingest manifest.
+    """
+    manifest = IngestManifest()
+    query_params = [
+        BigQuery.QueryParam(
+            name=name,
+            type_=BigQuery.QueryParam.Types.IDENTIFIER,
+            value=value,
+        )
+        for name, value in {
+            "dataset": gdrive_config.dwh_dataset,
+            "manifest_table": gdrive_config.manifest_table,
+            "dwh_table": gdrive_config.dwh_table,
+        }.items()
+    ]
+
+    if bq_client.table_exists(
+        dataset_name=gdrive_config.dwh_dataset,
+        table_name=gdrive_config.manifest_table,
+    ):
+        for row in bq_client.parametrized_query(
+            query_path=path.join(
+                gdrive_config.query_templates_path, "ingested_files.sql"
+            ),
+            query_params=query_params,
+        ):
+            manifest.add_file(row["md5_checksum"], row["content_checksum"])
+
+    if bq_client.table_exists(
+        dataset_name=gdrive_config.dwh_dataset,
+        table_name=gdrive_config.dwh_table,
+    ):
+        # Tables loaded before rows carried their fingerprint lack the column
+        list(
+            bq_client.parametrized_query(
+                query_path=path.join(
+                    gdrive_config.query_templates_path,
+                    "add_row_fingerprint_column.sql",
+                ),
+                query_params=query_params,
+            )
+        )
+        manifest.add_rows(
+            row["row_fingerprint"]
+            for row in bq_client.parametrized_query(
+                query_path=path.join(
+                    gdrive_config.query_templates_path,
+                    "ingested_row_fingerprints.sql",
+                ),
+                query_params=query_params,
+            )
+        )
+
+    gdrive_config.logger.info(
+        f"Manifest holds {len(manifest.checksums)} file checksums and "
+        f"{len(manifest.row_fingerprints)} row fingerprints."
+    )
+
+    return manifest
+
+
+def move_to_processed(
     file_name: str,
     file_id: str,
-    file_type: str,
     gsheets: GSheets,
     gdrive_config: GDriveConfiguration,
-    bq_client: BigQuery,
-    bq_config: BigQueryConfiguration,
 ) -> None:
     """
-    Process a single file by reading its contents, loading to BigQuery,
-    and moving to the processed folder.
-    :param file_name: Name of the file to process.
+    Move a file from the unprocessed to the processed folder.
+    :param file_name: Name of the file.
     :param file_id: ID of the file.
-    :param file_type: MimeType of the file.
     :param gsheets: Google Sheets client instance.
     :param gdrive_config: Google Drive configuration object.
-    :param bq_client: BigQuery client instance.
-    :param bq_config: BigQuery configuration object.
     """
-    gdrive_config.logger.info(f"Processing file {file_name}")
+    gdrive_config.logger.info(
+        f"Moving file {file_name} from unprocessed to processed folder."
+    )
+    gsheets.move_file(
+        file_id=file_id,
+        source_folder_id=gdrive_config.unprocessed_folder_id,
+        destination_folder_id=gdrive_config.processed_folder_id,
+    )
+
+
+class PendingFile(NamedTuple):
+    """
+    File read from the unprocessed folder, with the rows still to be loaded.
+    """
+
+    file_name: str
+    file_id: str
+    content_checksum: str
+    row_count: int
+    load_data: list[dict[str, Any]]
+    md5_checksum: Optional[str] = None
+    modified_time: Optional[str] = None
+
 
+def read_sheets(
+    file_id: str,
+    file_type: str,
+    gsheets: GSheets,
+    sheets_client: Sheets,
+    gdrive_config: GDriveConfiguration,
+) -> Optional[list[tuple[Optional[str], list[list[Any]]]]]:
+    """
+    Read the values of all sheets of a file. All visible tabs of a Google Sheet
+    are read in a single request after listing them.
+    :param file_id: ID of the file.
+    :param file_type: MimeType of the file.
+    :param gsheets: Google Sheets client instance.
+    :param sheets_client: Sheets API client instance.
+    :param gdrive_config: Google Drive configuration object.
+    :return: Sheet name and values per sheet, or None for unsupported file types.
+    The sheet name of XLSX files is None.
+    """
     # XLSX file format
     if file_type == XLSX_FILE_TYPE:
-        sheet_data = gsheets.read_xlsx(file_id)
+        return [(None, gsheets.read_xlsx(file_id))]
 
     # Google Sheet file format
-    elif file_type == GSHEETS_FILE_TYPE:
-        # Extract the first sheet from the spreadsheet
-        sheet = gsheets.get_spreadsheet_meta(file_id)["sheets"][0]
-        sheet_name = sheet["properties"]["title"]
-        sheet_data = gsheets.read_values(spreadsheet_id=file_id, read_ranges=sheet_name)
+    if file_type == GSHEETS_FILE_TYPE:
+        sheet_names = sheets_client.get_sheet_names(spreadsheet_id=file_id)
+        if not sheet_names:
+            return list()
+        gdrive_config.logger.info(
+            f"Reading {len(sheet_names)} sheets: {', '.join(sheet_names)}."
+        )
+        sheet_values = sheets_client.read_sheets(
+            spreadsheet_id=file_id, sheet_names=sheet_names
+        )
 
-    else:
-        gdrive_config.logger.warning(f"File type {file_type} not implemented. Skipping")
-        return
+        return list(zip(sheet_names, sheet_values, strict=True))
+
+    gdrive_config.logger.warning(f"File type {file_type} not implemented. Skipping")
+    return None
 
-    sheet_json_data = transform_sheet_data_to_list_of_dicts(data=sheet_data)
+
+def read_file(
+    file_name: str,
+    file_id: str,
+    file_type: str,
+    gsheets: GSheets,
+    sheets_client: Sheets,
+    gdrive_config: GDriveConfiguration,
+    manifest: IngestManifest,
+    md5_checksum: Optional[str] = None,
+    modified_time: Optional[str] = None,
+) -> Optional[PendingFile]:
+    """
+    Read a single file and prepare its rows for the load. Files that were
+    ingested before are moved to the processed folder without loading, and
+    only rows not loaded before are kept.
+    :param file_name: Name of the file to process.
+    :param file_id: ID of the file.
+    :param file_type: MimeType of the file.
+    :param gsheets: Google Sheets client instance.
+    :param sheets_client: Sheets API client instance.
+    :param gdrive_config: Google Drive configuration object.
+    :param manifest: Ingest manifest, updated with the read file.
+    :param md5_checksum: MD5 checksum of the file as listed by Drive, if any.
+    :param modified_time: Modification time of the file as listed by Drive, if any.
+    :return: The file to load, or None if there is nothing to load.
+    """
+    gdrive_config.logger.info(f"Reading file {file_name}")
+
+    # Byte-identical copies can be detected before downloading
+    if manifest.has_file(md5_checksum):
+        gdrive_config.logger.info(f"File {file_name} was ingested before. Skipping.")
+        move_to_processed(file_name, file_id, gsheets, gdrive_config)
+        return None
+
+    sheets = read_sheets(
+        file_id=file_id,
+        file_type=file_type,
+        gsheets=gsheets,
+        sheets_client=sheets_client,
+        gdrive_config=gdrive_config,
+    )
+    if sheets is None:
+        return None
+    # Empty tabs have no header to build rows from
+    sheets = [
+        (sheet_name, sheet_data) for sheet_name, sheet_data in sheets if sheet_data
+    ]
+
+    # Copies with the same content, e.g. re-exports or other formats. Files with
+    # a single sheet are hashed as before multiple tabs were read, so the
+    # checksums of ingested files stay valid
+    if len(sheets) == 1:
+        content_checksum = get_content_checksum(sheets[0][1])
+    else:
+        content_checksum = get_content_checksum(
+            [sheet_data for _, sheet_data in sheets]
+        )
+    if manifest.has_file(content_checksum):
+        gdrive_config.logger.info(
+            f"Content of file {file_name} was ingested before. Skipping."
+        )
+        move_to_processed(file_name, file_id, gsheets, gdrive_config)
+        return None
 
     # Process data for load
     key_pattern = compile(r"(?<!^)(?=\s+|[A-Z])")
+    row_count = 0
     load_data = list()
-    for row in sheet_json_data:
-        row["source_file"] = sub(".csv", "", file_name)
-        row["loaded_at"] = datetime.now()
-        # Format keys from CamelCase to snake_case and remove whitespace,
-        # and replace '-' values with NoneTypes
-        clean_row = {
-            key_pattern.sub("_", key).lower(): value if value != "-" else None
-            for key, value in row.items()
-        }
-        load_data.append(clean_row)
+    row_fingerprints = list()
+    for sheet_name, sheet_data in sheets:
+        sheet_json_data = transform_sheet_data_to_list_of_dicts(data=sheet_data)
+        row_count += len(sheet_json_data)
+        for row in sheet_json_data:
+            # Skip rows that were already loaded from another file
+            row_fingerprint = get_row_fingerprint(row)
+            if row_fingerprint in manifest.row_fingerprints:
+                continue
+            row_fingerprints.append(row_fingerprint)
 
-    # Load data to DWH
+            row["source_file"] = sub(".csv", "", file_name)
+            row["sheet_name"] = sheet_name
+            row["loaded_at"] = datetime.now()
+            # Format keys from CamelCase to snake_case and remove whitespace,
+            # and replace '-' values with NoneTypes
+            clean_row = {
+                key_pattern.sub("_", key).lower(): value if value != "-" else None
+                for key, value in row.items()
+            }
+            # Loaded with the row, so that a retried load skips the rows that
+            # made it into the table
+            clean_row["row_fingerprint"] = row_fingerprint
+            # Pre-compute the domain, email, date and ID columns used by the IL SQL
+            load_data.append(normalise_tradeshow_company(clean_row))
+
+    # Files of the same run can share rows and content as well
+    manifest.add_file(md5_checksum, content_checksum)
+    manifest.add_rows(row_fingerprints)
+
+    return PendingFile(
+        file_name=file_name,
+        file_id=file_id,
+        content_checksum=content_checksum,
+        row_count=row_count,
+        load_data=load_data,
+        md5_checksum=md5_checksum,
+        modified_time=modified_time,
+    )
+
+
+def add_planned_columns(
+    columns: list[str],
+    schema_plan: SchemaPlan,
+    gdrive_config: GDriveConfiguration,
+    bq_client: BigQuery,
+) -> None:
+    """
+    Add columns to the DWH table with their planned types, in a single
+    ALTER TABLE statement.
+    :param columns: Columns to add.
+    :param schema_plan: Union schema of all rows of the run.
+    :param gdrive_config: Google Drive configuration object.
+    :param bq_client: BigQuery client instance.
+    """
+    with open(
+        path.join(gdrive_config.query_templates_path, "add_planned_columns.sql")
+    ) as template_file:
+        query_template = template_file.read()
+    # Column names come from the sheet headers, so they are quoted
+    column_definitions = ",\n".join(
+        f"ADD COLUMN IF NOT EXISTS `{column}` {schema_plan.get_column_type(column)}"
+        for column in columns
+    )
+    with TemporaryDirectory() as query_dir:
+        query_path = path.join(query_dir, "add_planned_columns.sql")
+        with open(query_path, "w") as query_file:
+            query_file.write(
+                query_template.format(
+                    dataset=gdrive_config.dwh_dataset,
+                    dwh_table=gdrive_config.dwh_table,
+                    column_definitions=column_definitions,
+                )
+            )
+        bq_client.query(query_path, async_=False)
+
+
+def apply_schema_plan(
+    schema_plan: SchemaPlan,
+    gdrive_config: GDriveConfiguration,
+    bq_client: BigQuery,
+    bq_config: BigQueryConfiguration,
+) -> None:
+    """
+    Create the DWH table with the planned schema, or add the planned columns
+    missing from the existing table with their planned types.
+    :param schema_plan: Union schema of all rows of the run.
+    :param gdrive_config: Google Drive configuration object.
+    :param bq_client: BigQuery client instance.
+    :param bq_config: BigQuery configuration object.
+    """
     bq_client.create_dataset(
         dataset_name=gdrive_config.dwh_dataset, location=bq_config.location
     )
@@ -73,51 +381,188 @@ def process_file(
         dataset_name=gdrive_config.dwh_dataset,
         table_name=gdrive_config.dwh_table,
     ):
-        schema = get_schema_from_row(data=load_data[0], schema=list())
+        gdrive_config.logger.info(
+            f"Creating table {gdrive_config.dwh_table} with "
+            f"{len(schema_plan.columns)} planned columns."
+        )
         bq_client.create_table(
             dataset=gdrive_config.dwh_dataset,
             table_name=gdrive_config.dwh_table,
-            schema=schema,
+            schema=get_schema_from_row(
+                data=schema_plan.get_prototype_row(), schema=list()
+            ),
         )
-    bq_client.write_to_table(
-        data=load_data,
-        dataset=gdrive_config.dwh_dataset,
-        table_name=gdrive_config.dwh_table,
-        check_for_new_columns=True,
+        schema_plan.set_existing_columns(
+            {
+                column: schema_plan.get_column_type(column)
+                for column in schema_plan.columns
+            }
+        )
+        return
+
+    existing_columns = {
+        row["column_name"]: row["data_type"]
+        for row in bq_client.parametrized_query(
+            query_path=path.join(
+                gdrive_config.query_templates_path, "table_columns.sql"
+            ),
+            query_params=[
+                BigQuery.QueryParam(
+                    name="dataset",
+                    type_=BigQuery.QueryParam.Types.IDENTIFIER,
+                    value=gdrive_config.dwh_dataset,
+                ),
+                BigQuery.QueryParam(
+                    name="table_name",
+                    type_=BigQuery.QueryParam.Types.STRING,
+                    value=gdrive_config.dwh_table,
+                ),
+            ],
+        )
+    }
+    schema_plan.set_existing_columns(existing_columns)
+    new_columns = schema_plan.get_new_columns()
+    if not new_columns:
+        return
+
+    gdrive_config.logger.info(
+        f"Adding columns {', '.join(new_columns)} to {gdrive_config.dwh_table}."
+    )
+    add_planned_columns(
+        columns=new_columns,
+        schema_plan=schema_plan,
+        gdrive_config=gdrive_config,
+        bq_client=bq_client,
+    )
+    schema_plan.set_existing_columns(
+        {
+            **existing_columns,
+            **{column: schema_plan.get_column_type(column) for column in new_columns},
+        }
     )
 
-    # Move file from unprocessed to processed folder
+
+def load_file(
+    pending_file: PendingFile,
+    schema_plan: SchemaPlan,
+    gsheets: GSheets,
+    gdrive_config: GDriveConfiguration,
+    bq_client: BigQuery,
+    bq_config: BigQueryConfiguration,
+) -> None:
+    """
+    Load the rows of a read file to BigQuery, record it in the ingest manifest
+    and move it to the processed folder.
+    :param pending_file: File to load.
+    :param schema_plan: Union schema of all rows of the run.
+    :param gsheets: Google Sheets client instance.
+    :param gdrive_config: Google Drive configuration object.
+    :param bq_client: BigQuery client instance.
+    :param bq_config: BigQuery configuration object.
+    :raises SchemaMismatchError: if a value does not fit the type of its column.
+    Nothing of the file is loaded then.
+    """
+    load_data = pending_file.load_data
     gdrive_config.logger.info(
-        f"Moving file {file_name} from unprocessed to processed folder."
+        f"Loading {len(load_data)} of {pending_file.row_count} rows "
+        f"of {pending_file.file_name}."
     )
-    gsheets.move_file(
-        file_id=file_id,
-        source_folder_id=gdrive_config.unprocessed_folder_id,
-        destination_folder_id=gdrive_config.processed_folder_id,
+
+    # Load data to DWH
+    if load_data:
+        # All rows are coerced before the write, so a file is loaded in full or
+        # not at all
+        rows = [schema_plan.coerce_row(row) for row in load_data]
+        write_rows(
+            rows=rows,
+            table_name=gdrive_config.dwh_table,
+            gdrive_config=gdrive_config,
+            bq_client=bq_client,
+            bq_config=bq_config,
+        )
+
+    # The manifest marks the file as done, so it is written last. A run failing
+    # before reads the file again and skips the rows already loaded by their
+    # fingerprint
+    write_rows(
+        rows=[
+            {
+                "file_id": pending_file.file_id,
+                "file_name": pending_file.file_name,
+                "md5_checksum": pending_file.md5_checksum or "",
+                "content_checksum": pending_file.content_checksum,
+                "modified_time": pending_file.modified_time or "",
+                "row_count": pending_file.row_count,
+                "loaded_row_count": len(load_data),
+                "ingested_at": datetime.now(),
+            }
+        ],
+        table_name=gdrive_config.manifest_table,
+        gdrive_config=gdrive_config,
+        bq_client=bq_client,
+        bq_config=bq_config,
+    )
+
+    # Move file from unprocessed to processed folder
+    move_to_processed(
+        pending_file.file_name, pending_file.file_id, gsheets, gdrive_config
     )
 
 
-def process_gdrive() -> None:
+def process_gdrive(cassette: Optional[Cassette] = None) -> None:
     """
     Process all Google Drive files from the unprocessed folder.
+    :param cassette: Cassette to record or replay the client calls with, shared
+    by the stages of a pipeline run. Defaults to a cassette of its own.
     :return:
     """
     bq_config = bq_configs.get_config("bigquery")
     gdrive_config = gdrive_configs.get_config("gdrive")
 
-    bq_client = BigQuery(
-        service_account_path=bq_config.service_account_file_path,
-        project=bq_config.project,
-        location=bq_config.location,
+    # Record or replay all client calls if a cassette mode is set
+    if cassette is None:
+        cassette = Cassette.from_config(cassette_configs.get_config("cassette"))
+
+    bq_client = cassette.wrap(
+        lambda: BigQuery(
+            service_account_path=bq_config.service_account_file_path,
+            project=bq_config.project,
+            location=bq_config.location,
+            logger=bq_config.logger,
+        ),
+        service="gdrive.bigquery",
         logger=bq_config.logger,
     )
 
-    gsheets_client = GSheets(
-        service_account_file_path=gdrive_config.service_account_file_path,
+    gsheets_client = cassette.wrap(
+        lambda: GSheets(
+            service_account_file_path=gdrive_config.service_account_file_path,
+            logger=gdrive_config.logger,
+        ),
+        service="gdrive.gsheets",
         logger=gdrive_config.logger,
     )
 
-    files_to_process = gsheets_client.list_files_in_folder(
+    # Reads all tabs of a Google Sheet in one request
+    sheets_client = cassette.wrap(
+        lambda: Sheets(
+            service_account_file_path=gdrive_config.service_account_file_path,
+            logger=gdrive_config.logger,
+        ),
+        service="gdrive.sheets",
+        logger=gdrive_config.logger,
+    )
+
+    # Listed with the Drive API directly, to get the checksums of the files
+    gdrive_client = cassette.wrap(
+        lambda: GDrive(
+            service_account_file_path=gdrive_config.service_account_file_path,
+            logger=gdrive_config.logger,
+        ),
+        service="gdrive.drive",
+        logger=gdrive_config.logger,
+    )
+    files_to_process = gdrive_client.list_files_in_folder(
         folder_id=gdrive_config.unprocessed_folder_id
     )
 
@@ -125,19 +570,63 @@ def process_gdrive() -> None:
         gdrive_config.logger.info("No files to process. Skipping load.")
         return
 
-    # Iterate over unprocessed files
-    gdrive_config.logger.info(f"Processing {len(files_to_process)} files.")
+    manifest = get_ingest_manifest(gdrive_config=gdrive_config, bq_client=bq_client)
+
+    # Read all unprocessed files first, so that the schema is planned once
+    gdrive_config.logger.info(f"Reading {len(files_to_process)} files.")
+    schema_plan = SchemaPlan(sample_size=gdrive_config.schema_sample_size)
+    pending_files = list()
     for file in files_to_process:
-        process_file(
+        pending_file = read_file(
             file_name=file["name"],
             file_id=file["id"],
             file_type=file["mimeType"],
             gsheets=gsheets_client,
+            sheets_client=sheets_client,
+            gdrive_config=gdrive_config,
+            manifest=manifest,
+            md5_checksum=file.get("md5Checksum"),
+            modified_time=file.get("modifiedTime"),
+        )
+        if pending_file is not None:
+            schema_plan.add_rows(pending_file.load_data)
+            pending_files.append(pending_file)
+
+    # Create or extend the table once for the whole run, so that all loads
+    # skip the schema check
+    if any(pending_file.load_data for pending_file in pending_files):
+        apply_schema_plan(
+            schema_plan=schema_plan,
             gdrive_config=gdrive_config,
             bq_client=bq_client,
             bq_config=bq_config,
         )
 
+    gdrive_config.logger.info(f"Loading {len(pending_files)} files.")
+    failed_files = list()
+    for pending_file in pending_files:
+        try:
+            load_file(
+                pending_file=pending_file,
+                schema_plan=schema_plan,
+                gsheets=gsheets_client,
+                gdrive_config=gdrive_config,
+                bq_client=bq_client,
+                bq_config=bq_config,
+            )
+        except SchemaMismatchError as error:
+            # Left in the unprocessed folder for review, the other files load
+            gdrive_config.logger.error(
+                f"Not loading file {pending_file.file_name}: {error}"
+            )
+            failed_files.append(pending_file.file_name)
+
+    if failed_files:
+        raise GDriveLoadFailedError(
+            f"Files {', '.join(failed_files)} do not fit the schema of "
+            f"{gdrive_config.dwh_table} and were left for review."
+        )
+
 
 if __name__ == "__main__":
     process_gdrive()
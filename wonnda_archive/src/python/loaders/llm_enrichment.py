@@ -1,24 +1,49 @@
 import concurrent.futures
+import json
+from datetime import datetime, timezone
 from os import path
 from pathlib import Path
-from time import sleep
-from typing import Any
+from typing import Any, Optional, Type
 
 from configs.bigquery import bq_configs
+from configs.cassette import cassette_configs
 from configs.llm_enrichment import LLMEnrichmentConfiguration, llm_enrichment_configs
-from configs.openai import openai_configs
+from configs.openai import OpenAIConfiguration, openai_configs
 from configs.perplexity import perplexity_configs
 from connectors.langchain.openai import OpenAI
+from connectors.openai_batch.openai_batch import (
+    BatchFailedError,
+    BatchTimeoutError,
+    OpenAIBatch,
+)
 from connectors.perplexity.perplexity import Perplexity
 from pnd_database.bigquery.bigquery import BigQuery
 from pnd_database.bigquery.bigquery_utils import get_schema_from_row
 from pnd_utils import chunked
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
+from utils.cassette import Cassette
+from utils.company_record import CompanyRecord
+from utils.enrichment_scheduler import EnrichmentBudget, prioritise_companies
+from utils.formatting import (
+    FAST_PATH_CONFIDENCE,
+    format_address,
+    format_company_name,
+)
+from utils.processed_index import ProcessedIdIndex
+from utils.rate_limiter import RateLimiter
+from utils.spend_meter import SpendMeter
 
 CHUNK_SIZE = 25
+# Rough response size per company, used for the OpenAI token budget
+COMPLETION_TOKENS_PER_COMPANY = 250
 PROMPT_DIR = path.join(Path(__file__).parents[2], "prompt_templates")
 
 
+class BatchRequestTypes:
+    full = "full"
+    description = "description"
+
+
 # Define output structure
 class CompanyArray(BaseModel):  # type: ignore
     class Company(BaseModel):  # type: ignore
@@ -31,89 +56,211 @@ class CompanyArray(BaseModel):  # type: ignore
     companies: list[Company]
 
 
+class CompanyDescriptionArray(BaseModel):  # type: ignore
+    class Company(BaseModel):  # type: ignore
+        company_id: str
+        determined_company_type1: str
+        enriched_description: str
+
+    companies: list[Company]
+
+
+def get_query_params(
+    llm_enrichment_config: LLMEnrichmentConfiguration,
+    watermark: Optional[str] = None,
+) -> list[BigQuery.QueryParam]:
+    """
+    Build the query parameters shared by the LLM enrichment query templates.
+
+    :param llm_enrichment_config: Configuration for LLM enrichment process
+    :param watermark: Optional load watermark to filter on
+    :return: List of query parameters
+    """
+    identifiers = {
+        "unprocessed_dataset": llm_enrichment_config.unprocessed_dataset,
+        "processed_dataset": llm_enrichment_config.processed_dataset,
+        "unprocessed_table": llm_enrichment_config.unprocessed_table,
+        "processed_table": llm_enrichment_config.processed_table,
+        "id_column": llm_enrichment_config.id_column,
+        "watermark_column": llm_enrichment_config.processed_watermark_column,
+        "unprocessed_watermark_column": (
+            llm_enrichment_config.unprocessed_watermark_column
+        ),
+    }
+    query_params = [
+        BigQuery.QueryParam(
+            name=name,
+            type_=BigQuery.QueryParam.Types.IDENTIFIER,
+            value=value,
+        )
+        for name, value in identifiers.items()
+    ]
+    if watermark is not None:
+        query_params.append(
+            BigQuery.QueryParam(
+                name="watermark",
+                type_=BigQuery.QueryParam.Types.STRING,
+                value=watermark,
+            )
+        )
+
+    return query_params
+
+
+def sync_processed_index(
+    bq_client: BigQuery,
+    llm_enrichment_config: LLMEnrichmentConfiguration,
+    processed_index: ProcessedIdIndex,
+) -> None:
+    """
+    Incrementally sync the local processed ID index with the processed table,
+    pulling only rows loaded after the index's processed watermark.
+
+    :param bq_client: BigQuery client instance for database operations
+    :param llm_enrichment_config: Configuration for LLM enrichment process
+    :param processed_index: Local index of processed IDs to update
+    """
+    if processed_index.processed_watermark is None:
+        query_name = "processed_ids.sql"
+    else:
+        query_name = "processed_ids_since.sql"
+
+    query_result = bq_client.parametrized_query(
+        query_path=path.join(llm_enrichment_config.query_templates_path, query_name),
+        query_params=get_query_params(
+            llm_enrichment_config, watermark=processed_index.processed_watermark
+        ),
+    )
+
+    new_ids = list()
+    for row in query_result:
+        new_ids.append(row["id"])
+        if row["watermark"] is not None:
+            watermark = row["watermark"].isoformat()
+            if (
+                processed_index.processed_watermark is None
+                or watermark > processed_index.processed_watermark
+            ):
+                processed_index.processed_watermark = watermark
+
+    processed_index.add(new_ids)
+    llm_enrichment_config.logger.info(
+        f"Synced {len(new_ids)} processed IDs. Index holds {len(processed_index)}."
+    )
+
+
+def load_processed_index(
+    llm_enrichment_config: LLMEnrichmentConfiguration,
+) -> ProcessedIdIndex:
+    """
+    Load the processed ID index of an enrichment target. Without an index path
+    the index only lives for the current run.
+
+    :param llm_enrichment_config: Configuration for LLM enrichment process
+    :return: Processed ID index
+    """
+    if llm_enrichment_config.index_path is None:
+        return ProcessedIdIndex()
+
+    return ProcessedIdIndex.load(llm_enrichment_config.index_path)
+
+
+def save_processed_index(
+    processed_index: ProcessedIdIndex,
+    llm_enrichment_config: LLMEnrichmentConfiguration,
+) -> None:
+    if llm_enrichment_config.index_path is not None:
+        processed_index.save(llm_enrichment_config.index_path)
+
+
 def get_companies_to_process(
     bq_client: BigQuery,
     llm_enrichment_config: LLMEnrichmentConfiguration,
-) -> list[dict[str, Any]]:
+    processed_index: ProcessedIdIndex,
+) -> list[CompanyRecord]:
     """
     Retrieve a list of companies that need to be processed for LLM enrichment.
 
-    If the processed table exists, it returns companies that haven't been processed yet.
-    If not, it returns all companies from the unprocessed table.
+    Without a durable index, the companies not in the processed table are
+    selected with an anti-join in BigQuery. With an index, it is synced from the
+    processed table first. Only companies loaded since the last completed
+    discovery are then pulled from the unprocessed table and filtered against
+    the index. If the processed table does not exist, the index is reset and all
+    companies are returned.
 
     :param bq_client: BigQuery client instance for database operations
     :param llm_enrichment_config: Configuration for LLM enrichment process
+    :param processed_index: Local index of processed IDs
     :return: List of company records to be processed
     """
-    if bq_client.table_exists(
+    if not bq_client.table_exists(
         dataset_name=llm_enrichment_config.processed_dataset,
         table_name=llm_enrichment_config.processed_table,
     ):
-        query_path = path.join(
-            llm_enrichment_config.query_templates_path, "companies_to_process.sql"
+        llm_enrichment_config.logger.info(
+            "Processed table not found. Returning all companies."
         )
+        processed_index.clear()
+        query_name = "select_all_companies.sql"
+    elif llm_enrichment_config.index_path is None:
+        query_name = "companies_to_process.sql"
     else:
-        llm_enrichment_config.logger.info(
-            "Unprocessed table not found. Returning all companies."
+        # Tables created before the watermark column existed lack it until the
+        # first write, but the sync selects it
+        list(
+            bq_client.parametrized_query(
+                query_path=path.join(
+                    llm_enrichment_config.query_templates_path,
+                    "add_watermark_column.sql",
+                ),
+                query_params=get_query_params(llm_enrichment_config),
+            )
         )
-        query_path = path.join(
-            llm_enrichment_config.query_templates_path, "select_all_companies.sql"
+        sync_processed_index(
+            bq_client=bq_client,
+            llm_enrichment_config=llm_enrichment_config,
+            processed_index=processed_index,
         )
+        if processed_index.unprocessed_watermark is None:
+            query_name = "select_all_companies.sql"
+        else:
+            query_name = "companies_since.sql"
 
-    query_params = [
-        BigQuery.QueryParam(
-            name="unprocessed_dataset",
-            type_=BigQuery.QueryParam.Types.IDENTIFIER,
-            value=llm_enrichment_config.unprocessed_dataset,
-        ),
-        BigQuery.QueryParam(
-            name="processed_dataset",
-            type_=BigQuery.QueryParam.Types.IDENTIFIER,
-            value=llm_enrichment_config.processed_dataset,
-        ),
-        BigQuery.QueryParam(
-            name="unprocessed_table",
-            type_=BigQuery.QueryParam.Types.IDENTIFIER,
-            value=llm_enrichment_config.unprocessed_table,
-        ),
-        BigQuery.QueryParam(
-            name="processed_table",
-            type_=BigQuery.QueryParam.Types.IDENTIFIER,
-            value=llm_enrichment_config.processed_table,
-        ),
-        BigQuery.QueryParam(
-            name="id_column",
-            type_=BigQuery.QueryParam.Types.IDENTIFIER,
-            value=llm_enrichment_config.id_column,
+    query_result = bq_client.parametrized_query(
+        query_path=path.join(llm_enrichment_config.query_templates_path, query_name),
+        query_params=get_query_params(
+            llm_enrichment_config, watermark=processed_index.unprocessed_watermark
         ),
-    ]
+    )
 
-    query_result = [
-        dict(row)
-        for row in bq_client.parametrized_query(
-            query_path=query_path,
-            query_params=query_params,
-        )
-    ]
+    companies_to_process = list()
+    for row in query_result:
+        company = CompanyRecord.from_row(row)
+        watermark = company[llm_enrichment_config.unprocessed_watermark_column]
+        if watermark is not None and (
+            processed_index.discovered_watermark is None
+            or watermark.isoformat() > processed_index.discovered_watermark
+        ):
+            processed_index.discovered_watermark = watermark.isoformat()
+        if company[llm_enrichment_config.id_column] not in processed_index:
+            companies_to_process.append(company)
 
-    return query_result
+    return companies_to_process
 
 
 def retrieve_missing_addresses_and_descriptions(
-    companies: list[dict[str, str]],
+    companies: list[CompanyRecord],
     perplexity_client: Perplexity,
-    concurrency_interval: float = 2.4,
-) -> list[dict[str, str]]:
+    llm_enrichment_config: LLMEnrichmentConfiguration,
+) -> list[CompanyRecord]:
     """
     Concurrently retrieve missing addresses and descriptions for companies using
-    the Perplexity client.
+    the Perplexity client, whose rate limiter paces the requests.
 
-    :param companies: List of company dictionaries containing company information
+    :param companies: List of company records containing company information
     :param perplexity_client: Client instance for making requests to Perplexity
-    :param concurrency_interval: The interval (in seconds) at which to submit
-    concurrent tasks. Defaults to 1.2s based on the API rate limit of 50 requests
-    per minute.
-    :return: List of company dictionaries with updated addresses and descriptions
+    :param llm_enrichment_config: Configuration of the enrichment target
+    :return: List of company records with updated addresses and descriptions
     """
     with open(path.join(PROMPT_DIR, "retrieve_address.txt")) as address_prompt_file:
         address_prompt_template = address_prompt_file.read()
@@ -127,11 +274,11 @@ def retrieve_missing_addresses_and_descriptions(
     with concurrent.futures.ThreadPoolExecutor() as executor:
         futures = list()
         for company in companies:
-            sleep(concurrency_interval)
             future = executor.submit(
                 retrieve_company_address_and_description,
                 company=company,
                 perplexity_client=perplexity_client,
+                input_columns=llm_enrichment_config.input_columns,
                 address_prompt_template=address_prompt_template,
                 description_prompt_template=description_prompt_template,
             )
@@ -144,44 +291,48 @@ def retrieve_missing_addresses_and_descriptions(
 
 
 def retrieve_company_address_and_description(
-    company: dict[str, str],
+    company: CompanyRecord,
     perplexity_client: Perplexity,
+    input_columns: dict[str, str],
     address_prompt_template: str,
     description_prompt_template: str,
-) -> dict[str, str]:
+) -> CompanyRecord:
     """
     Retrieve the address and description for a single company using the
     Perplexity client.
 
-    :param company: Dictionary containing company information
+    :param company: Company record containing company information
     :param perplexity_client: Client instance for making requests to Perplexity API
+    :param input_columns: Column of the company record per input field
     :param address_prompt_template: Template string for generating address
     retrieval prompts
     :param description_prompt_template: Template string for generating company
     description prompts
-    :return: Updated company dictionary with retrieved address and/or description
+    :return: Updated company record with retrieved address and/or description
     """
-    company_name = company["company_name"]
-    company_domain = company["domain"]
-    company_country = company["country"]
-    if not company["address"]:
+    address_column = input_columns["address"]
+    description_column = input_columns["description"]
+    company_name = company[input_columns["company_name"]]
+    company_domain = company[input_columns["domain"]]
+    company_country = company[input_columns["country"]]
+    if not company[address_column]:
         perplexity_client.logger.info(f"Retrieving address for {company_name}")
         prompt = address_prompt_template.format(
             company_name=company_name,
             domain=company_domain,
             country=company_country,
         )
-        company["address"] = perplexity_client.get_chat_response(
+        company[address_column] = perplexity_client.get_chat_response(
             prompt=prompt,
             search_domain_filter=[company_domain] if company_domain else None,
         )
-    if not company["description"]:
+    if not company[description_column]:
         perplexity_client.logger.info(f"Creating description for {company_name}")
         prompt = description_prompt_template.format(
             company_name=company_name,
             domain=company_domain,
         )
-        company["description"] = perplexity_client.get_chat_response(
+        company[description_column] = perplexity_client.get_chat_response(
             prompt=prompt,
             search_domain_filter=[company_domain] if company_domain else None,
         )
@@ -189,43 +340,42 @@ def retrieve_company_address_and_description(
     return company
 
 
-def reformat_and_enrich_companies(
-    companies: list[dict[str, Any]],
+def read_prompt_template(template_name: str) -> str:
+    """
+    Read a prompt template from the prompt template directory.
+
+    :param template_name: File name of the template
+    :return: Template string
+    """
+    with open(path.join(PROMPT_DIR, template_name)) as prompt_file:
+        return prompt_file.read()
+
+
+def parse_enriched_rows(
+    structured_response: CompanyArray | CompanyDescriptionArray,
+    input_companies: list[dict[str, Any]],
+    prompt_template: str,
+    structure: Type[CompanyArray] | Type[CompanyDescriptionArray],
+    required_field: str,
     openai_client: OpenAI,
 ) -> list[dict[str, Any]]:
     """
-    Process and enhance company data using the OpenAI client.
+    Parse a structured enrichment response, retrying single companies for which
+    the required field is returned empty.
 
-    :param companies: List of company records to be processed
+    :param structured_response: Structured response for the input companies
+    :param input_companies: Company records as passed to the prompt
+    :param prompt_template: Prompt template with a {companies} placeholder
+    :param structure: Pydantic model class for response structure
+    :param required_field: Field whose empty value triggers a retry
     :param openai_client: OpenAI client instance for enrichment operations
     :return: List of enriched company records
     """
-    openai_client.logger.info("Reformatting and enriching company data.")
-    with open(path.join(PROMPT_DIR, "enrich_companies.txt")) as prompt_file:
-        prompt_template = prompt_file.read()
-
-    enriched_companies = list()
-
-    input_companies = [
-        {
-            "company_id": company["company_id"],
-            "name": company["company_name"],
-            "address": company["address"],
-            "description": company["description"],
-        }
-        for company in companies
-    ]
-
-    prompt = prompt_template.format(companies=input_companies)
-    structured_response = openai_client.get_structured_response(
-        prompt=prompt,
-        structure=CompanyArray,
-    )
-    # Parse response
+    enriched_rows = list()
     for row in structured_response.companies:
         enriched_company = row.model_dump()
         # Control for false nulls by retrying
-        if not enriched_company["formatted_company_name"]:
+        if not enriched_company[required_field]:
             openai_client.logger.info(
                 "Null return for company ID "
                 f"{enriched_company['company_id']}. Retrying..."
@@ -237,99 +387,1326 @@ def reformat_and_enrich_companies(
             ]
             retry_prompt = prompt_template.format(companies=retry_input)
             retry_response = openai_client.get_structured_response(
-                prompt=retry_prompt, structure=CompanyArray
+                prompt=retry_prompt,
+                structure=structure,
+                expected_completion_tokens=COMPLETION_TOKENS_PER_COMPANY,
             )
             enriched_company = retry_response.companies[0].model_dump()
 
-        enriched_companies.append(enriched_company)
+        enriched_rows.append(enriched_company)
+
+    return enriched_rows
+
+
+def get_enriched_rows(
+    input_companies: list[dict[str, Any]],
+    prompt_template: str,
+    structure: Type[CompanyArray] | Type[CompanyDescriptionArray],
+    required_field: str,
+    openai_client: OpenAI,
+) -> list[dict[str, Any]]:
+    """
+    Request structured enrichment for a list of companies.
+
+    :param input_companies: Company records as passed to the prompt
+    :param prompt_template: Prompt template with a {companies} placeholder
+    :param structure: Pydantic model class for response structure
+    :param required_field: Field whose empty value triggers a retry
+    :param openai_client: OpenAI client instance for enrichment operations
+    :return: List of enriched company records
+    """
+    structured_response = openai_client.get_structured_response(
+        prompt=prompt_template.format(companies=input_companies),
+        structure=structure,
+        expected_completion_tokens=len(input_companies) * COMPLETION_TOKENS_PER_COMPANY,
+    )
+
+    return parse_enriched_rows(
+        structured_response=structured_response,
+        input_companies=input_companies,
+        prompt_template=prompt_template,
+        structure=structure,
+        required_field=required_field,
+        openai_client=openai_client,
+    )
+
+
+def prepare_enrichment_inputs(
+    companies: list[CompanyRecord],
+    llm_enrichment_config: LLMEnrichmentConfiguration,
+    fast_path_confidence: float = FAST_PATH_CONFIDENCE,
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]], dict[str, dict[str, str]]]:
+    """
+    Format names and addresses with deterministic rules and split the companies
+    into those that need the full LLM prompt and those that only need their type
+    and description enriched. The prompt inputs carry the ID of the target row as
+    company_id.
+
+    :param companies: List of company records to be processed
+    :param llm_enrichment_config: Configuration of the enrichment target
+    :param fast_path_confidence: Minimum rule-based formatting confidence for a
+    company to skip LLM formatting
+    :return: Full prompt inputs, description prompt inputs, and the rule-based
+    formatted fields of the latter by company ID
+    """
+    llm_input_companies = list()
+    fast_path_input_companies = list()
+    formatted_fields = dict()
+    input_columns = llm_enrichment_config.input_columns
+    for company in companies:
+        company_id = company[llm_enrichment_config.id_column]
+        company_name = company[input_columns["company_name"]]
+        address = company[input_columns["address"]]
+        description = company[input_columns["description"]]
+        formatted_company_name, name_confidence = format_company_name(company_name)
+        formatted_address, address_confidence = format_address(address)
+        if min(name_confidence, address_confidence) >= fast_path_confidence:
+            formatted_fields[company_id] = {
+                "formatted_company_name": formatted_company_name,
+                "formatted_address": formatted_address,
+            }
+            fast_path_input_companies.append(
+                {
+                    "company_id": company_id,
+                    "name": formatted_company_name,
+                    "description": description,
+                }
+            )
+        else:
+            llm_input_companies.append(
+                {
+                    "company_id": company_id,
+                    "name": company_name,
+                    "address": address,
+                    "description": description,
+                }
+            )
+
+    return llm_input_companies, fast_path_input_companies, formatted_fields
+
+
+def reformat_and_enrich_companies(
+    companies: list[CompanyRecord],
+    openai_client: OpenAI,
+    llm_enrichment_config: LLMEnrichmentConfiguration,
+    fast_path_confidence: float = FAST_PATH_CONFIDENCE,
+) -> list[dict[str, Any]]:
+    """
+    Process and enhance company data using the OpenAI client.
+
+    Names and addresses are first formatted with deterministic rules. Companies
+    for which both reach the confidence threshold only have their type and
+    description requested from the LLM, the rest goes through the full prompt.
+
+    :param companies: List of company records to be processed
+    :param openai_client: OpenAI client instance for enrichment operations
+    :param llm_enrichment_config: Configuration of the enrichment target
+    :param fast_path_confidence: Minimum rule-based formatting confidence for a
+    company to skip LLM formatting
+    :return: List of enriched company records
+    """
+    openai_client.logger.info("Reformatting and enriching company data.")
+    (
+        llm_input_companies,
+        fast_path_input_companies,
+        formatted_fields,
+    ) = prepare_enrichment_inputs(
+        companies=companies,
+        llm_enrichment_config=llm_enrichment_config,
+        fast_path_confidence=fast_path_confidence,
+    )
+    openai_client.logger.info(
+        f"Formatted {len(fast_path_input_companies)} / {len(companies)} "
+        "companies without the LLM."
+    )
+
+    enriched_companies = list()
+    if llm_input_companies:
+        enriched_companies.extend(
+            get_enriched_rows(
+                input_companies=llm_input_companies,
+                prompt_template=read_prompt_template("enrich_companies.txt"),
+                structure=CompanyArray,
+                required_field="formatted_company_name",
+                openai_client=openai_client,
+            )
+        )
+    if fast_path_input_companies:
+        for enriched_company in get_enriched_rows(
+            input_companies=fast_path_input_companies,
+            prompt_template=read_prompt_template("enrich_descriptions.txt"),
+            structure=CompanyDescriptionArray,
+            required_field="enriched_description",
+            openai_client=openai_client,
+        ):
+            enriched_company.update(formatted_fields[enriched_company["company_id"]])
+            enriched_companies.append(enriched_company)
 
     return enriched_companies
 
 
-def process_enrichment(chunk_size: int = CHUNK_SIZE) -> None:
+def get_retrieved_fields(
+    companies: list[CompanyRecord],
+    input_companies: list[dict[str, Any]],
+    llm_enrichment_config: LLMEnrichmentConfiguration,
+) -> dict[str, dict[str, Any]]:
+    """
+    Get the Perplexity results of the companies of a batch request, so they need
+    not be retrieved again when the batch is resumed.
+
+    :param companies: Company records of the chunk
+    :param input_companies: Prompt inputs of the request
+    :param llm_enrichment_config: Configuration of the enrichment target
+    :return: Retrieved address and description columns by company ID
+    """
+    input_ids = {company["company_id"] for company in input_companies}
+    retrieved_columns = (
+        llm_enrichment_config.input_columns["address"],
+        llm_enrichment_config.input_columns["description"],
+    )
+
+    return {
+        company[llm_enrichment_config.id_column]: {
+            column: company[column] for column in retrieved_columns
+        }
+        for company in companies
+        if company[llm_enrichment_config.id_column] in input_ids
+    }
+
+
+def get_batch_retrieved_fields(
+    batch_state: dict[str, Any],
+) -> dict[str, dict[str, Any]]:
+    """
+    Get the Perplexity results of all companies submitted in a batch.
+
+    :param batch_state: Batch state as returned by submit_enrichment_batch
+    :return: Retrieved address and description columns by company ID
+    """
+    return {
+        company_id: fields
+        for request_state in batch_state["requests"].values()
+        for company_id, fields in request_state["retrieved_fields"].items()
+    }
+
+
+def render_enrichment_requests(
+    company_chunk: list[CompanyRecord],
+    chunk_index: int,
+    llm_enrichment_config: LLMEnrichmentConfiguration,
+    fast_path_confidence: float = FAST_PATH_CONFIDENCE,
+) -> list[tuple[str, str, Type[BaseModel], dict[str, Any]]]:
+    """
+    Render the batch requests of a chunk of companies.
+
+    :param company_chunk: Chunk of company records to be processed
+    :param chunk_index: Index of the chunk within the batch
+    :param llm_enrichment_config: Configuration of the enrichment target
+    :param fast_path_confidence: Minimum rule-based formatting confidence for a
+    company to skip LLM formatting
+    :return: Custom ID, prompt, response structure and request state per request
     """
-    Run the LLM enrichment process on the company data.
+    (
+        llm_input_companies,
+        fast_path_input_companies,
+        formatted_fields,
+    ) = prepare_enrichment_inputs(
+        companies=company_chunk,
+        llm_enrichment_config=llm_enrichment_config,
+        fast_path_confidence=fast_path_confidence,
+    )
+
+    chunk_requests: list[tuple[str, str, Type[BaseModel], dict[str, Any]]] = list()
+    if llm_input_companies:
+        chunk_requests.append(
+            (
+                f"{chunk_index}-{BatchRequestTypes.full}",
+                read_prompt_template("enrich_companies.txt").format(
+                    companies=llm_input_companies
+                ),
+                CompanyArray,
+                {
+                    "type": BatchRequestTypes.full,
+                    "input_companies": llm_input_companies,
+                    "retrieved_fields": get_retrieved_fields(
+                        company_chunk, llm_input_companies, llm_enrichment_config
+                    ),
+                },
+            )
+        )
+    if fast_path_input_companies:
+        chunk_requests.append(
+            (
+                f"{chunk_index}-{BatchRequestTypes.description}",
+                read_prompt_template("enrich_descriptions.txt").format(
+                    companies=fast_path_input_companies
+                ),
+                CompanyDescriptionArray,
+                {
+                    "type": BatchRequestTypes.description,
+                    "input_companies": fast_path_input_companies,
+                    "formatted_fields": formatted_fields,
+                    "retrieved_fields": get_retrieved_fields(
+                        company_chunk, fast_path_input_companies, llm_enrichment_config
+                    ),
+                },
+            )
+        )
+
+    return chunk_requests
+
+
+def estimate_request_spend(
+    prompt: str,
+    company_count: int,
+    spend_meter: SpendMeter,
+) -> float:
+    """
+    Estimate the price of a batch request from its prompt length and the
+    expected response size.
+
+    :param prompt: Prompt of the request
+    :param company_count: Number of companies in the request
+    :param spend_meter: Spend meter with the prices of the batch requests
+    :return: Estimated price in USD
+    """
+    return spend_meter.get_price(
+        input_tokens=len(prompt) // OpenAI.CHARS_PER_TOKEN,
+        output_tokens=company_count * COMPLETION_TOKENS_PER_COMPANY,
+    )
+
+
+def submit_enrichment_batch(
+    company_chunks: list[list[CompanyRecord]],
+    openai_batch_client: OpenAIBatch,
+    llm_enrichment_config: LLMEnrichmentConfiguration,
+    max_spend: Optional[float] = None,
+    fast_path_confidence: float = FAST_PATH_CONFIDENCE,
+) -> Optional[dict[str, Any]]:
+    """
+    Render the enrichment prompts of the chunks into one batch and submit it.
+    With a spend limit, only the chunks whose estimated price fits it are
+    submitted.
+
+    :param company_chunks: Chunks of company records to be processed
+    :param openai_batch_client: OpenAI batch client instance
+    :param llm_enrichment_config: Configuration of the enrichment target
+    :param max_spend: Spend in USD the batch may cost, None for no limit
+    :param fast_path_confidence: Minimum rule-based formatting confidence for a
+    company to skip LLM formatting
+    :return: Batch state needed to parse the results, also after a restart, or
+    None if no chunk was submitted
+    """
+    batch_requests: list[tuple[str, str, Type[BaseModel]]] = list()
+    request_states: dict[str, dict[str, Any]] = dict()
+    estimated_spend = 0.0
+    for chunk_index, company_chunk in enumerate(company_chunks):
+        chunk_requests = render_enrichment_requests(
+            company_chunk=company_chunk,
+            chunk_index=chunk_index,
+            llm_enrichment_config=llm_enrichment_config,
+            fast_path_confidence=fast_path_confidence,
+        )
+        if max_spend is not None and openai_batch_client.spend_meter is not None:
+            estimated_spend += sum(
+                estimate_request_spend(
+                    prompt=prompt,
+                    company_count=len(request_state["input_companies"]),
+                    spend_meter=openai_batch_client.spend_meter,
+                )
+                for _, prompt, _, request_state in chunk_requests
+            )
+            if estimated_spend > max_spend:
+                openai_batch_client.logger.info(
+                    f"Submitting {chunk_index} of {len(company_chunks)} chunks, "
+                    f"the rest exceeds the remaining spend of ${max_spend:.2f}."
+                )
+                break
+        for custom_id, prompt, structure, request_state in chunk_requests:
+            batch_requests.append((custom_id, prompt, structure))
+            request_states[custom_id] = request_state
+
+    if not batch_requests:
+        return None
+    batch_id = openai_batch_client.submit_batch(batch_requests)
+
+    return {"batch_id": batch_id, "requests": request_states}
+
+
+def parse_enrichment_batch(
+    batch_state: dict[str, Any],
+    responses: dict[str, str],
+    openai_client: OpenAI,
+) -> tuple[list[dict[str, Any]], set[str]]:
+    """
+    Parse the results of an enrichment batch. Requests without a result are
+    run synchronously instead. Results that do not match the response structure
+    are logged and their companies reported as failed.
+
+    :param batch_state: Batch state as returned by submit_enrichment_batch
+    :param responses: Response message content per custom ID
+    :param openai_client: OpenAI client instance for retries
+    :return: List of enriched company records and IDs of the failed companies
+    """
+    prompt_templates = {
+        BatchRequestTypes.full: read_prompt_template("enrich_companies.txt"),
+        BatchRequestTypes.description: read_prompt_template("enrich_descriptions.txt"),
+    }
+    structures: dict[str, Type[CompanyArray] | Type[CompanyDescriptionArray]] = {
+        BatchRequestTypes.full: CompanyArray,
+        BatchRequestTypes.description: CompanyDescriptionArray,
+    }
+    required_fields = {
+        BatchRequestTypes.full: "formatted_company_name",
+        BatchRequestTypes.description: "enriched_description",
+    }
+
+    enriched_companies = list()
+    failed_ids: set[str] = set()
+    for custom_id, request_state in batch_state["requests"].items():
+        request_type = request_state["type"]
+        if custom_id in responses:
+            try:
+                structured_response = structures[request_type].model_validate_json(
+                    responses[custom_id]
+                )
+            except ValidationError as error:
+                openai_client.logger.warning(
+                    f"Invalid batch result for request {custom_id}: {error}"
+                )
+                failed_ids.update(
+                    company["company_id"]
+                    for company in request_state["input_companies"]
+                )
+                continue
+            enriched_rows = parse_enriched_rows(
+                structured_response=structured_response,
+                input_companies=request_state["input_companies"],
+                prompt_template=prompt_templates[request_type],
+                structure=structures[request_type],
+                required_field=required_fields[request_type],
+                openai_client=openai_client,
+            )
+        else:
+            openai_client.logger.warning(
+                f"No batch result for request {custom_id}. Running it directly."
+            )
+            enriched_rows = get_enriched_rows(
+                input_companies=request_state["input_companies"],
+                prompt_template=prompt_templates[request_type],
+                structure=structures[request_type],
+                required_field=required_fields[request_type],
+                openai_client=openai_client,
+            )
+        for enriched_company in enriched_rows:
+            enriched_company.update(
+                request_state.get("formatted_fields", {}).get(
+                    enriched_company["company_id"], {}
+                )
+            )
+            enriched_companies.append(enriched_company)
+
+    return enriched_companies, failed_ids
+
+
+class BatchStatuses:
+    pending = "pending"
+    completed = "completed"
+    failed = "failed"
+
+
+def get_batch_query_params(
+    openai_config: OpenAIConfiguration,
+    **values: str,
+) -> list[BigQuery.QueryParam]:
+    """
+    Build the query parameters of the batch state query templates.
+
+    :param openai_config: OpenAI configuration with the batch state tables
+    :param values: String parameters to filter on
+    :return: List of query parameters
+    """
+    identifiers = {
+        "batch_state_dataset": openai_config.batch_state_dataset,
+        "batch_state_table": openai_config.batch_state_table,
+        "batch_request_table": openai_config.batch_request_table,
+    }
+    query_params = [
+        BigQuery.QueryParam(
+            name=name,
+            type_=BigQuery.QueryParam.Types.IDENTIFIER,
+            value=value,
+        )
+        for name, value in identifiers.items()
+    ]
+    query_params.extend(
+        BigQuery.QueryParam(
+            name=name,
+            type_=BigQuery.QueryParam.Types.STRING,
+            value=value,
+        )
+        for name, value in values.items()
+    )
+
+    return query_params
+
+
+def load_batch_state(
+    bq_client: BigQuery,
+    openai_config: OpenAIConfiguration,
+    llm_enrichment_config: LLMEnrichmentConfiguration,
+) -> Optional[dict[str, Any]]:
+    """
+    Load the state of the pending enrichment batch of a target, rebuilt from the
+    rows of its requests.
+
+    :param bq_client: BigQuery client instance for database operations
+    :param openai_config: OpenAI configuration with the batch state tables
+    :param llm_enrichment_config: Configuration of the enrichment target
+    :return: Batch state, or None if no batch is pending
+    """
+    if not bq_client.table_exists(
+        dataset_name=openai_config.batch_state_dataset,
+        table_name=openai_config.batch_state_table,
+    ):
+        return None
+
+    target = get_target_name(llm_enrichment_config)
+    batch_ids = [
+        row["batch_id"]
+        for row in bq_client.parametrized_query(
+            query_path=path.join(
+                llm_enrichment_config.query_templates_path,
+                "pending_enrichment_batch.sql",
+            ),
+            query_params=get_batch_query_params(openai_config, target=target),
+        )
+    ]
+    if not batch_ids:
+        return None
+
+    request_states = dict()
+    for row in bq_client.parametrized_query(
+        query_path=path.join(
+            llm_enrichment_config.query_templates_path,
+            "enrichment_batch_requests.sql",
+        ),
+        query_params=get_batch_query_params(
+            openai_config, target=target, batch_id=batch_ids[0]
+        ),
+    ):
+        request_states[row["custom_id"]] = {
+            "type": row["request_type"],
+            "input_companies": json.loads(row["input_companies"]),
+            "formatted_fields": json.loads(row["formatted_fields"]),
+            "retrieved_fields": json.loads(row["retrieved_fields"]),
+        }
+
+    return {"batch_id": batch_ids[0], "requests": request_states}
+
+
+def write_batch_rows(
+    bq_client: BigQuery,
+    dataset: str,
+    table_name: str,
+    rows: list[dict[str, Any]],
+) -> None:
+    """
+    Append rows to a batch state table, creating it if needed.
+
+    :param bq_client: BigQuery client instance for database operations
+    :param dataset: Dataset of the table
+    :param table_name: Name of the table
+    :param rows: Rows to append
+    """
+    bq_client.create_dataset(dataset_name=dataset)
+    if not bq_client.table_exists(dataset_name=dataset, table_name=table_name):
+        bq_client.create_table(
+            dataset=dataset,
+            table_name=table_name,
+            schema=get_schema_from_row(data=rows[0], schema=list()),
+        )
+    bq_client.write_to_table(
+        data=rows,
+        dataset=dataset,
+        table_name=table_name,
+        check_for_new_columns=False,
+    )
+
+
+def save_batch_requests(
+    bq_client: BigQuery,
+    openai_config: OpenAIConfiguration,
+    llm_enrichment_config: LLMEnrichmentConfiguration,
+    batch_state: dict[str, Any],
+) -> None:
+    """
+    Record the inputs of the requests of a submitted batch, one row per request,
+    so the batch can be resumed after a restart.
+
+    :param bq_client: BigQuery client instance for database operations
+    :param openai_config: OpenAI configuration with the batch state tables
+    :param llm_enrichment_config: Configuration of the enrichment target
+    :param batch_state: Batch state as returned by submit_enrichment_batch
+    """
+    recorded_at = datetime.now(timezone.utc)
+    rows = [
+        {
+            "target": get_target_name(llm_enrichment_config),
+            "batch_id": batch_state["batch_id"],
+            "custom_id": custom_id,
+            "request_type": request_state["type"],
+            "input_companies": json.dumps(request_state["input_companies"]),
+            "formatted_fields": json.dumps(
+                request_state.get("formatted_fields", dict())
+            ),
+            "retrieved_fields": json.dumps(request_state["retrieved_fields"]),
+            "recorded_at": recorded_at,
+        }
+        for custom_id, request_state in batch_state["requests"].items()
+    ]
+    if rows:
+        write_batch_rows(
+            bq_client=bq_client,
+            dataset=openai_config.batch_state_dataset,
+            table_name=openai_config.batch_request_table,
+            rows=rows,
+        )
+
+
+def save_batch_state(
+    bq_client: BigQuery,
+    openai_config: OpenAIConfiguration,
+    llm_enrichment_config: LLMEnrichmentConfiguration,
+    batch_state: dict[str, Any],
+    status: str = BatchStatuses.pending,
+) -> None:
+    """
+    Record the status of an enrichment batch. The batch state table is append
+    only, the latest row of a batch holds its status.
+
+    :param bq_client: BigQuery client instance for database operations
+    :param openai_config: OpenAI configuration with the batch state tables
+    :param llm_enrichment_config: Configuration of the enrichment target
+    :param batch_state: Batch state as returned by submit_enrichment_batch
+    :param status: Status of the batch, see BatchStatuses
+    """
+    write_batch_rows(
+        bq_client=bq_client,
+        dataset=openai_config.batch_state_dataset,
+        table_name=openai_config.batch_state_table,
+        rows=[
+            {
+                "target": get_target_name(llm_enrichment_config),
+                "batch_id": batch_state["batch_id"],
+                "status": status,
+                "recorded_at": datetime.now(timezone.utc),
+            }
+        ],
+    )
+
+
+def join_enriched_fields(
+    companies: list[CompanyRecord],
+    enriched_fields: list[dict[str, Any]],
+    llm_enrichment_config: LLMEnrichmentConfiguration,
+) -> None:
+    """
+    Join enriched fields back to the company data and set the load watermark.
+
+    :param companies: List of company records, updated in place
+    :param enriched_fields: List of enriched company records
+    :param llm_enrichment_config: Configuration for LLM enrichment process
+    """
+    enriched_at = datetime.now(timezone.utc)
+    # The prompts return the target ID as company_id, which must not overwrite a
+    # company_id column of targets keyed by another column
+    enriched_by_id = {
+        row["company_id"]: {
+            key: value for key, value in row.items() if key != "company_id"
+        }
+        for row in enriched_fields
+    }
+    for company_row in companies:
+        company_row[llm_enrichment_config.processed_watermark_column] = enriched_at
+        company_row.update(
+            enriched_by_id.get(company_row[llm_enrichment_config.id_column], {})
+        )
+
+
+def write_companies(
+    companies: list[CompanyRecord],
+    bq_client: BigQuery,
+    llm_enrichment_config: LLMEnrichmentConfiguration,
+    check_for_new_columns: bool = False,
+) -> None:
+    """
+    Write enriched companies to the processed table, creating it if needed.
+
+    :param companies: List of enriched company records
+    :param bq_client: BigQuery client instance for database operations
+    :param llm_enrichment_config: Configuration for LLM enrichment process
+    :param check_for_new_columns: Whether to add missing columns to the table
+    """
+    # Rows are only materialised as dicts for the load itself
+    rows = [company.as_row() for company in companies]
+    bq_client.create_dataset(dataset_name=llm_enrichment_config.processed_dataset)
+    if not bq_client.table_exists(
+        dataset_name=llm_enrichment_config.processed_dataset,
+        table_name=llm_enrichment_config.processed_table,
+    ):
+        schema = get_schema_from_row(
+            data=rows[0],
+            schema=list(),
+        )
+        bq_client.create_table(
+            dataset=llm_enrichment_config.processed_dataset,
+            table_name=llm_enrichment_config.processed_table,
+            schema=schema,
+        )
+    llm_enrichment_config.logger.info(f"Writing {len(companies)} rows to the database.")
+    bq_client.write_to_table(
+        data=rows,
+        dataset=llm_enrichment_config.processed_dataset,
+        table_name=llm_enrichment_config.processed_table,
+        check_for_new_columns=check_for_new_columns,
+    )
+
+
+class EnrichmentFailedError(Exception):
+    pass
+
+
+def get_target_name(llm_enrichment_config: LLMEnrichmentConfiguration) -> str:
+    return (
+        f"{llm_enrichment_config.processed_dataset}."
+        f"{llm_enrichment_config.processed_table}"
+    )
+
+
+def check_target_schema(
+    companies: list[CompanyRecord],
+    llm_enrichment_config: LLMEnrichmentConfiguration,
+) -> None:
+    """
+    Check that the rows of an enrichment target have the configured ID and input
+    columns.
+
+    Rows are keyed by the ID column throughout the enrichment, so a target
+    missing one of the columns or with duplicate IDs would fail mid-run or
+    overwrite rows with each other's enrichment.
+
+    :param companies: Rows of the target to be processed
+    :param llm_enrichment_config: Configuration of the enrichment target
+    :raises EnrichmentFailedError: if the rows lack a column or have duplicate IDs
+    """
+    target_name = get_target_name(llm_enrichment_config)
+    required_columns = [
+        llm_enrichment_config.id_column,
+        *llm_enrichment_config.input_columns.values(),
+    ]
+    missing_columns = [
+        column for column in required_columns if column not in companies[0]
+    ]
+    if missing_columns:
+        raise EnrichmentFailedError(
+            f"Target {target_name} lacks the columns {', '.join(missing_columns)}."
+        )
+    company_ids = {company[llm_enrichment_config.id_column] for company in companies}
+    if len(company_ids) < len(companies):
+        raise EnrichmentFailedError(
+            f"Target {target_name} has {len(companies) - len(company_ids)} "
+            f"duplicate values of {llm_enrichment_config.id_column}."
+        )
+
+
+def get_budget_limit(
+    limit: Optional[float],
+    configured_limits: list[Optional[float]],
+) -> Optional[float]:
+    """
+    Get a run budget limit, defaulting to the tightest configured limit.
+
+    :param limit: Limit set for the run, if any
+    :param configured_limits: Limits of the enrichment configurations
+    :return: Limit, None for no limit
+    """
+    if limit is not None:
+        return limit
+    limits: list[float] = [
+        configured_limit
+        for configured_limit in configured_limits
+        if configured_limit is not None
+    ]
+
+    return min(limits) if limits else None
+
+
+def process_enrichment(
+    chunk_size: int = CHUNK_SIZE,
+    batch_mode: bool = False,
+    max_concurrency: Optional[int] = None,
+    max_runtime: Optional[float] = None,
+    max_spend: Optional[float] = None,
+    targets: Optional[list[str]] = None,
+    cassette: Optional[Cassette] = None,
+) -> None:
+    """
+    Run the LLM enrichment process for all registered enrichment targets.
+
+    The targets run concurrently and share the connectors, the OpenAI and
+    Perplexity rate limits, the OpenAI concurrency and the run budget. Within a
+    target, companies are enriched in the priority order of its configuration.
+    Once the runtime or spend budget is exhausted no further chunks are started;
+    the chunks in flight are still written and the remaining companies are left
+    for the next run.
     :param chunk_size: the chunk size to use during processing
+    :param batch_mode: submit all OpenAI requests as one asynchronous batch per
+    target instead of one synchronous request per chunk. A pending batch of a
+    previous run is resumed first.
+    :param max_concurrency: the number of chunks enriched by OpenAI at the same
+    time, across all targets. Defaults to the OpenAI configuration.
+    :param max_runtime: the wall-clock budget of the run in seconds. Defaults to
+    the tightest limit of the enrichment configurations.
+    :param max_spend: the API spend budget of the run in USD. Defaults to the
+    tightest limit of the enrichment configurations.
+    :param targets: names of the enrichment configurations to run. Defaults to
+    all registered configurations.
+    :param cassette: Cassette to record or replay the client calls with, shared
+    by the stages of a pipeline run. Defaults to a cassette of its own.
     """
+    # Record or replay all client calls if a cassette mode is set
+    if cassette is None:
+        cassette = Cassette.from_config(cassette_configs.get_config("cassette"))
+
     bq_config = bq_configs.get_config("bigquery")
-    bq_client = BigQuery(
-        service_account_path=bq_config.service_account_file_path,
-        project=bq_config.project,
-        location=bq_config.location,
+    bq_client = cassette.wrap(
+        lambda: BigQuery(
+            service_account_path=bq_config.service_account_file_path,
+            project=bq_config.project,
+            location=bq_config.location,
+        ),
+        service="enrichment.bigquery",
+        logger=bq_config.logger,
     )
 
-    companies_enrichment_config = llm_enrichment_configs.get_config("companies")
+    enrichment_configs = llm_enrichment_configs.get_all_configs()
+    if targets is not None:
+        unknown_targets = [
+            target for target in targets if target not in enrichment_configs
+        ]
+        if unknown_targets:
+            raise EnrichmentFailedError(
+                f"Unknown enrichment targets {', '.join(unknown_targets)}."
+            )
+        enrichment_configs = {target: enrichment_configs[target] for target in targets}
 
     perplexity_config = perplexity_configs.get_config("perplexity")
-    perplexity_client = Perplexity(
-        token=perplexity_config.auth_token,
-        model=perplexity_config.model,
+    perplexity_spend_meter = SpendMeter(
+        input_price_per_million=perplexity_config.input_price_per_million,
+        output_price_per_million=perplexity_config.output_price_per_million,
+        request_price=perplexity_config.request_price,
+    )
+    perplexity_client = cassette.wrap(
+        lambda: Perplexity(
+            token=perplexity_config.auth_token,
+            model=perplexity_config.model,
+            logger=perplexity_config.logger,
+            rate_limiter=RateLimiter(
+                requests_per_minute=perplexity_config.requests_per_minute,
+                tokens_per_minute=None,
+                logger=perplexity_config.logger,
+            ),
+            spend_meter=perplexity_spend_meter,
+        ),
+        service="enrichment.perplexity",
         logger=perplexity_config.logger,
+        # Replayed calls never reach the client, so the cassette meters them
+        spend_meter=perplexity_spend_meter,
     )
 
     openai_config = openai_configs.get_config("openai")
-    openai_client = OpenAI(model=openai_config.model, logger=openai_config.logger)
+    if max_concurrency is None:
+        max_concurrency = openai_config.max_concurrency
+    openai_spend_meter = SpendMeter(
+        input_price_per_million=openai_config.input_price_per_million,
+        output_price_per_million=openai_config.output_price_per_million,
+    )
+    openai_client = cassette.wrap(
+        lambda: OpenAI(
+            model=openai_config.model,
+            logger=openai_config.logger,
+            rate_limiter=RateLimiter(
+                requests_per_minute=openai_config.requests_per_minute,
+                tokens_per_minute=openai_config.tokens_per_minute,
+                logger=openai_config.logger,
+            ),
+            spend_meter=openai_spend_meter,
+        ),
+        service="enrichment.openai",
+        logger=openai_config.logger,
+        spend_meter=openai_spend_meter,
+    )
+
+    # Batch results are billed at their own prices once the batch completes
+    openai_batch_spend_meter = SpendMeter(
+        input_price_per_million=openai_config.batch_input_price_per_million,
+        output_price_per_million=openai_config.batch_output_price_per_million,
+    )
 
+    budget = EnrichmentBudget(
+        logger=LLMEnrichmentConfiguration.Defaults.logger,
+        max_runtime=get_budget_limit(
+            max_runtime,
+            [config.max_runtime for config in enrichment_configs.values()],
+        ),
+        max_spend=get_budget_limit(
+            max_spend,
+            [config.max_spend for config in enrichment_configs.values()],
+        ),
+        spend_meters=[
+            perplexity_spend_meter,
+            openai_spend_meter,
+            openai_batch_spend_meter,
+        ],
+    )
+
+    # OpenAI chunks of all targets share one pool of max_concurrency workers
+    failed_targets = list()
+    with (
+        concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_concurrency
+        ) as openai_executor,
+        concurrent.futures.ThreadPoolExecutor(
+            max_workers=len(enrichment_configs) or 1
+        ) as target_executor,
+    ):
+        target_futures = {
+            target_executor.submit(
+                process_enrichment_target,
+                llm_enrichment_config=llm_enrichment_config,
+                chunk_size=chunk_size,
+                batch_mode=batch_mode,
+                max_concurrency=max_concurrency,
+                bq_client=bq_client,
+                perplexity_client=perplexity_client,
+                openai_client=openai_client,
+                openai_executor=openai_executor,
+                budget=budget,
+                openai_batch_spend_meter=openai_batch_spend_meter,
+                cassette=cassette,
+            ): target
+            for target, llm_enrichment_config in enrichment_configs.items()
+        }
+        # A failing target does not stop the others
+        for target_future in concurrent.futures.as_completed(target_futures):
+            target = target_futures[target_future]
+            try:
+                target_future.result()
+            except Exception:
+                budget.logger.exception(f"Enrichment of target {target} failed.")
+                failed_targets.append(target)
+
+    budget.logger.info(
+        f"Enrichment spend: ${budget.spend:.2f} in {budget.runtime:.0f}s."
+    )
+    if failed_targets:
+        raise EnrichmentFailedError(
+            f"Enrichment failed for targets {', '.join(failed_targets)}."
+        )
+
+
+def process_enrichment_target(
+    llm_enrichment_config: LLMEnrichmentConfiguration,
+    chunk_size: int,
+    batch_mode: bool,
+    max_concurrency: int,
+    bq_client: BigQuery,
+    perplexity_client: Perplexity,
+    openai_client: OpenAI,
+    openai_executor: concurrent.futures.ThreadPoolExecutor,
+    budget: EnrichmentBudget,
+    openai_batch_spend_meter: SpendMeter,
+    cassette: Cassette,
+) -> None:
+    """
+    Run the LLM enrichment process for a single enrichment target.
+
+    :param llm_enrichment_config: Configuration of the enrichment target
+    :param chunk_size: the chunk size to use during processing
+    :param batch_mode: submit all OpenAI requests as one asynchronous batch
+    :param max_concurrency: the number of chunks of this target enriched by
+    OpenAI at the same time
+    :param bq_client: BigQuery client instance for database operations
+    :param perplexity_client: Client instance for making requests to Perplexity
+    :param openai_client: OpenAI client instance for enrichment operations
+    :param openai_executor: Executor shared by all targets for OpenAI chunks
+    :param budget: Budget shared by all targets
+    :param openai_batch_spend_meter: Spend meter of the OpenAI batch results
+    :param cassette: Cassette to record or replay the client calls with
+    """
+    target_name = get_target_name(llm_enrichment_config)
+    processed_index = load_processed_index(llm_enrichment_config)
     companies_to_process = get_companies_to_process(
         bq_client=bq_client,
-        llm_enrichment_config=companies_enrichment_config,
+        llm_enrichment_config=llm_enrichment_config,
+        processed_index=processed_index,
     )
     if not companies_to_process:
-        companies_enrichment_config.logger.info("No companies to process.")
+        llm_enrichment_config.logger.info(f"No rows of {target_name} to process.")
+        processed_index.commit_discovery()
+        save_processed_index(processed_index, llm_enrichment_config)
         return
+    check_target_schema(companies_to_process, llm_enrichment_config)
 
-    companies_enrichment_config.logger.info(
-        f"Processing {len(companies_to_process)} companies."
+    # The most valuable companies are enriched first
+    companies_to_process = prioritise_companies(
+        companies=companies_to_process,
+        priorities=llm_enrichment_config.priorities,
     )
-    processed_count = 0
-    for company_chunk in chunked(companies_to_process, chunk_size=chunk_size):
-        processed_count += len(company_chunk)
-        openai_client.logger.info(
-            f"Processing {processed_count} / {len(companies_to_process)} companies."
+
+    if batch_mode:
+        process_enrichment_batch(
+            companies=companies_to_process,
+            chunk_size=chunk_size,
+            bq_client=bq_client,
+            llm_enrichment_config=llm_enrichment_config,
+            perplexity_client=perplexity_client,
+            openai_client=openai_client,
+            processed_index=processed_index,
+            budget=budget,
+            openai_batch_spend_meter=openai_batch_spend_meter,
+            cassette=cassette,
         )
+        return
+
+    llm_enrichment_config.logger.info(
+        f"Processing {len(companies_to_process)} rows of {target_name}."
+    )
+    # Perplexity retrieval runs chunk by chunk, while up to max_concurrency
+    # chunks are enriched by OpenAI at the same time
+    written_count = 0
+    is_stopped_early = False
+    futures: set[concurrent.futures.Future[list[CompanyRecord]]] = set()
+    for company_chunk in chunked(companies_to_process, chunk_size=chunk_size):
+        if budget.is_exhausted():
+            is_stopped_early = True
+            break
 
         # Retrieve missing fields from Perplexity
         retrieve_missing_addresses_and_descriptions(
             companies=company_chunk,
             perplexity_client=perplexity_client,
+            llm_enrichment_config=llm_enrichment_config,
         )
 
         # Reformat and enrich fields with OpenAI
-        enriched_fields = reformat_and_enrich_companies(
+        futures.add(
+            openai_executor.submit(
+                enrich_company_chunk,
+                companies=company_chunk,
+                openai_client=openai_client,
+                llm_enrichment_config=llm_enrichment_config,
+            )
+        )
+        if len(futures) < max_concurrency:
+            continue
+
+        done, futures = concurrent.futures.wait(
+            futures, return_when=concurrent.futures.FIRST_COMPLETED
+        )
+        for future in done:
+            written_count = write_enriched_chunk(
+                companies=future.result(),
+                written_count=written_count,
+                total_count=len(companies_to_process),
+                bq_client=bq_client,
+                llm_enrichment_config=llm_enrichment_config,
+                processed_index=processed_index,
+            )
+
+    for future in concurrent.futures.as_completed(futures):
+        written_count = write_enriched_chunk(
+            companies=future.result(),
+            written_count=written_count,
+            total_count=len(companies_to_process),
+            bq_client=bq_client,
+            llm_enrichment_config=llm_enrichment_config,
+            processed_index=processed_index,
+        )
+
+    if is_stopped_early:
+        # Keep the discovery watermark, so the next run picks up the remainder
+        llm_enrichment_config.logger.info(
+            f"Carrying {len(companies_to_process) - written_count} rows of "
+            f"{target_name} over to the next run."
+        )
+    else:
+        # All discovered companies are processed, so later runs can skip them
+        processed_index.commit_discovery()
+    save_processed_index(processed_index, llm_enrichment_config)
+
+
+def enrich_company_chunk(
+    companies: list[CompanyRecord],
+    openai_client: OpenAI,
+    llm_enrichment_config: LLMEnrichmentConfiguration,
+) -> list[CompanyRecord]:
+    """
+    Reformat and enrich a chunk of companies with OpenAI and join the enriched
+    fields back to the company data.
+
+    :param companies: List of company records, updated in place
+    :param openai_client: OpenAI client instance for enrichment operations
+    :param llm_enrichment_config: Configuration for LLM enrichment process
+    :return: The enriched company records
+    """
+    enriched_fields = reformat_and_enrich_companies(
+        companies=companies,
+        openai_client=openai_client,
+        llm_enrichment_config=llm_enrichment_config,
+    )
+    join_enriched_fields(
+        companies=companies,
+        enriched_fields=enriched_fields,
+        llm_enrichment_config=llm_enrichment_config,
+    )
+
+    return companies
+
+
+def write_enriched_chunk(
+    companies: list[CompanyRecord],
+    written_count: int,
+    total_count: int,
+    bq_client: BigQuery,
+    llm_enrichment_config: LLMEnrichmentConfiguration,
+    processed_index: ProcessedIdIndex,
+) -> int:
+    """
+    Load an enriched chunk to the DWH and add it to the processed ID index.
+
+    :param companies: List of enriched company records
+    :param written_count: Number of companies written so far
+    :param total_count: Number of companies to process in this run
+    :param bq_client: BigQuery client instance for database operations
+    :param llm_enrichment_config: Configuration for LLM enrichment process
+    :param processed_index: Local index of processed IDs
+    :return: Number of companies written including this chunk
+    """
+    write_companies(
+        companies=companies,
+        bq_client=bq_client,
+        llm_enrichment_config=llm_enrichment_config,
+        # Adds the watermark column to tables created before it existed
+        check_for_new_columns=written_count == 0,
+    )
+    processed_index.add(
+        company[llm_enrichment_config.id_column] for company in companies
+    )
+    written_count += len(companies)
+    llm_enrichment_config.logger.info(
+        f"Processed {written_count} / {total_count} companies."
+    )
+
+    return written_count
+
+
+def start_enrichment_batch(
+    companies: list[CompanyRecord],
+    chunk_size: int,
+    perplexity_client: Perplexity,
+    openai_batch_client: OpenAIBatch,
+    llm_enrichment_config: LLMEnrichmentConfiguration,
+    budget: EnrichmentBudget,
+) -> Optional[dict[str, Any]]:
+    """
+    Retrieve missing fields chunk by chunk until the budget is exhausted and
+    submit the chunks that fit the remaining spend as one batch.
+
+    :param companies: List of company records to be processed
+    :param chunk_size: the chunk size of the companies per batch request
+    :param perplexity_client: Client instance for making requests to Perplexity
+    :param openai_batch_client: OpenAI batch client instance
+    :param llm_enrichment_config: Configuration of the enrichment target
+    :param budget: Budget shared by all targets
+    :return: Batch state as returned by submit_enrichment_batch, or None if no
+    chunk was submitted
+    """
+    company_chunks = list()
+    for company_chunk in chunked(companies, chunk_size=chunk_size):
+        if budget.is_exhausted():
+            break
+        retrieve_missing_addresses_and_descriptions(
             companies=company_chunk,
-            openai_client=openai_client,
+            perplexity_client=perplexity_client,
+            llm_enrichment_config=llm_enrichment_config,
         )
+        company_chunks.append(company_chunk)
+
+    return submit_enrichment_batch(
+        company_chunks=company_chunks,
+        openai_batch_client=openai_batch_client,
+        llm_enrichment_config=llm_enrichment_config,
+        max_spend=budget.remaining_spend,
+    )
 
-        # Join enriched fields back to company data
-        for company_row in company_chunk:
-            for enriched_row in enriched_fields:
-                if company_row["company_id"] == enriched_row["company_id"]:
-                    for key in enriched_row:
-                        company_row[key] = enriched_row[key]
 
-        # Load to DWH
-        bq_client.create_dataset(
-            dataset_name=companies_enrichment_config.processed_dataset
+def process_enrichment_batch(
+    companies: list[CompanyRecord],
+    chunk_size: int,
+    bq_client: BigQuery,
+    llm_enrichment_config: LLMEnrichmentConfiguration,
+    perplexity_client: Perplexity,
+    openai_client: OpenAI,
+    processed_index: ProcessedIdIndex,
+    budget: EnrichmentBudget,
+    openai_batch_spend_meter: SpendMeter,
+    cassette: Cassette,
+) -> None:
+    """
+    Enrich companies through the OpenAI batch endpoint. If a batch of a previous
+    run is still pending, only its companies are processed and the rest is left
+    for the next run. Only the companies that fit the remaining budget are
+    submitted, and a batch that does not finish within the remaining runtime
+    stays pending for the next run.
+
+    :param companies: List of company records to be processed
+    :param chunk_size: the chunk size of the companies per batch request
+    :param bq_client: BigQuery client instance for database operations
+    :param llm_enrichment_config: Configuration for LLM enrichment process
+    :param perplexity_client: Client instance for making requests to Perplexity
+    :param openai_client: OpenAI client instance for retries
+    :param processed_index: Local index of processed IDs
+    :param budget: Budget shared by all targets
+    :param openai_batch_spend_meter: Spend meter of the batch results
+    :param cassette: Cassette to record or replay the batch client calls with
+    """
+    openai_config = openai_configs.get_config("openai")
+    openai_batch_client = cassette.wrap(
+        lambda: OpenAIBatch(
+            token=openai_config.api_key,
+            model=openai_config.model,
+            logger=openai_config.logger,
+            base_url=openai_config.batch_base_url,
+            spend_meter=openai_batch_spend_meter,
+        ),
+        service="enrichment.openai_batch",
+        logger=openai_config.logger,
+        spend_meter=openai_batch_spend_meter,
+    )
+
+    # Each target keeps its own pending batch
+    batch_state = load_batch_state(bq_client, openai_config, llm_enrichment_config)
+    if batch_state:
+        openai_config.logger.info(f"Resuming batch {batch_state['batch_id']}.")
+        retrieved_fields = get_batch_retrieved_fields(batch_state)
+        companies = [
+            company
+            for company in companies
+            if company[llm_enrichment_config.id_column] in retrieved_fields
+        ]
+        for company in companies:
+            company.update(retrieved_fields[company[llm_enrichment_config.id_column]])
+        is_partial = True
+    else:
+        new_batch_state = start_enrichment_batch(
+            companies=companies,
+            chunk_size=chunk_size,
+            perplexity_client=perplexity_client,
+            openai_batch_client=openai_batch_client,
+            llm_enrichment_config=llm_enrichment_config,
+            budget=budget,
         )
-        if not bq_client.table_exists(
-            dataset_name=companies_enrichment_config.processed_dataset,
-            table_name=companies_enrichment_config.processed_table,
-        ):
-            schema = get_schema_from_row(
-                data=company_chunk[0],
-                schema=list(),
-            )
-            bq_client.create_table(
-                dataset=companies_enrichment_config.processed_dataset,
-                table_name=companies_enrichment_config.processed_table,
-                schema=schema,
+        if new_batch_state is None:
+            openai_config.logger.info(
+                "No companies fit the remaining budget, skipping the batch."
             )
-        bq_config.logger.info(f"Writing {len(company_chunk)} rows to the database.")
-        bq_client.write_to_table(
-            data=company_chunk,
-            dataset=companies_enrichment_config.processed_dataset,
-            table_name=companies_enrichment_config.processed_table,
+            return
+        batch_state = new_batch_state
+        # The requests are recorded first, so a pending batch can be rebuilt
+        save_batch_requests(
+            bq_client, openai_config, llm_enrichment_config, batch_state
         )
+        save_batch_state(bq_client, openai_config, llm_enrichment_config, batch_state)
+        submitted_ids = get_batch_retrieved_fields(batch_state).keys()
+        is_partial = len(submitted_ids) < len(companies)
+        companies = [
+            company
+            for company in companies
+            if company[llm_enrichment_config.id_column] in submitted_ids
+        ]
+
+    try:
+        responses = openai_batch_client.wait_for_batch(
+            batch_id=batch_state["batch_id"],
+            poll_interval=openai_config.batch_poll_interval,
+            max_wait=budget.remaining_runtime,
+        )
+    except BatchTimeoutError:
+        # The batch is stored as pending, so the next run resumes it
+        openai_config.logger.info(
+            f"Batch {batch_state['batch_id']} did not finish within the runtime "
+            "budget, leaving it for the next run."
+        )
+        return
+    except BatchFailedError:
+        # Failed, expired and cancelled batches cannot be resumed, so their
+        # companies are submitted again by the next run
+        save_batch_state(
+            bq_client,
+            openai_config,
+            llm_enrichment_config,
+            batch_state,
+            status=BatchStatuses.failed,
+        )
+        raise
+    enriched_fields, failed_ids = parse_enrichment_batch(
+        batch_state=batch_state,
+        responses=responses,
+        openai_client=openai_client,
+    )
+    if failed_ids:
+        openai_config.logger.warning(
+            f"Leaving {len(failed_ids)} companies with invalid batch results "
+            "for the next run."
+        )
+        companies = [
+            company
+            for company in companies
+            if company[llm_enrichment_config.id_column] not in failed_ids
+        ]
+
+    join_enriched_fields(
+        companies=companies,
+        enriched_fields=enriched_fields,
+        llm_enrichment_config=llm_enrichment_config,
+    )
+    for chunk_index, company_chunk in enumerate(
+        chunked(companies, chunk_size=chunk_size)
+    ):
+        write_companies(
+            companies=company_chunk,
+            bq_client=bq_client,
+            llm_enrichment_config=llm_enrichment_config,
+            # Adds the watermark column to tables created before it existed
+            check_for_new_columns=chunk_index == 0,
+        )
+        processed_index.add(
+            company[llm_enrichment_config.id_column] for company in company_chunk
+        )
+    # Failed companies are only found again if discovery is not advanced past
+    # them
+    if not is_partial and not failed_ids:
+        processed_index.commit_discovery()
+    save_processed_index(processed_index, llm_enrichment_config)
+    save_batch_state(
+        bq_client,
+        openai_config,
+        llm_enrichment_config,
+        batch_state,
+        status=BatchStatuses.completed,
+    )
 
 
 if __name__ == "__main__":
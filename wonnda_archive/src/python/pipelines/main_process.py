@@ -1,26 +1,151 @@
+import argparse
 import logging
+from typing import Callable, Optional
 
-from loaders.gdrive import process_gdrive
-from loaders.llm_enrichment import process_enrichment
-from loaders.sql_queries import process_il_ol_sql_queries, process_rl_sql_queries
+from configs.cassette import cassette_configs
 from pnd_utils.logging import get_logger
+from utils.cassette import Cassette
 
 LOGGER = get_logger("pipeline.main", level=logging.INFO)
 
 
-def main_process() -> None:
-    LOGGER.info("-----Loading GDrive Files-----")
-    process_gdrive()
+class Stages:
+    gdrive = "gdrive"
+    sql_il_ol = "sql-il-ol"
+    enrich = "enrich"
+    sql_rl = "sql-rl"
+
+
+# Loaders are imported within the stages, so that only the connectors of the
+# selected stages are loaded
+def run_gdrive(args: argparse.Namespace, cassette: Cassette) -> None:
+    from loaders.gdrive import process_gdrive
+
+    process_gdrive(cassette=cassette)
+
+
+def run_sql_il_ol(args: argparse.Namespace, cassette: Cassette) -> None:
+    from loaders.sql_queries import process_il_ol_sql_queries
 
-    LOGGER.info("-----Processing IL & OL SQL Queries-----")
     process_il_ol_sql_queries()
 
-    LOGGER.info("-----Processing LLM Enrichment-----")
-    process_enrichment()
 
-    LOGGER.info("-----Processing RL SQL Queries-----")
+def run_enrich(args: argparse.Namespace, cassette: Cassette) -> None:
+    from loaders.llm_enrichment import CHUNK_SIZE, process_enrichment
+
+    process_enrichment(
+        chunk_size=(
+            args.enrich_chunk_size if args.enrich_chunk_size is not None else CHUNK_SIZE
+        ),
+        batch_mode=args.enrich_batch_mode,
+        max_concurrency=args.enrich_max_concurrency,
+        max_runtime=args.enrich_max_runtime,
+        max_spend=args.enrich_max_spend,
+        targets=args.enrich_targets,
+        cassette=cassette,
+    )
+
+
+def run_sql_rl(args: argparse.Namespace, cassette: Cassette) -> None:
+    from loaders.sql_queries import process_rl_sql_queries
+
     process_rl_sql_queries()
 
 
+# Stage name -> (log title, runner), in execution order
+STAGES: dict[str, tuple[str, Callable[[argparse.Namespace, Cassette], None]]] = {
+    Stages.gdrive: ("Loading GDrive Files", run_gdrive),
+    Stages.sql_il_ol: ("Processing IL & OL SQL Queries", run_sql_il_ol),
+    Stages.enrich: ("Processing LLM Enrichment", run_enrich),
+    Stages.sql_rl: ("Processing RL SQL Queries", run_sql_rl),
+}
+
+
+def parse_stages(value: str) -> list[str]:
+    """
+    Parse a comma-separated list of stage names.
+
+    :param value: Comma-separated stage names
+    :return: List of stage names
+    """
+    stages = [stage.strip() for stage in value.split(",") if stage.strip()]
+    unknown_stages = [stage for stage in stages if stage not in STAGES]
+    if unknown_stages:
+        raise argparse.ArgumentTypeError(
+            f"Unknown stages {', '.join(unknown_stages)}. "
+            f"Choose from {', '.join(STAGES)}."
+        )
+
+    return stages
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the Wonnda BigQuery pipeline.")
+    parser.add_argument(
+        "--stages",
+        type=parse_stages,
+        default=list(STAGES),
+        help=f"Comma-separated stages to run. Defaults to all: {','.join(STAGES)}",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only log the stages and settings that would run.",
+    )
+    parser.add_argument(
+        "--enrich-chunk-size",
+        type=int,
+        help="Companies per enrichment chunk.",
+    )
+    parser.add_argument(
+        "--enrich-max-concurrency",
+        type=int,
+        help="Enrichment chunks sent to OpenAI at the same time.",
+    )
+    parser.add_argument(
+        "--enrich-max-runtime",
+        type=float,
+        help="Seconds after which no further enrichment chunks are started.",
+    )
+    parser.add_argument(
+        "--enrich-max-spend",
+        type=float,
+        help="API spend in USD after which no further enrichment chunks are started.",
+    )
+    parser.add_argument(
+        "--enrich-targets",
+        type=lambda value: [target.strip() for target in value.split(",")],
+        help="Comma-separated enrichment configurations to run. Defaults to all.",
+    )
+    parser.add_argument(
+        "--enrich-batch-mode",
+        action="store_true",
+        help="Submit the OpenAI enrichment as one asynchronous batch.",
+    )
+
+    return parser.parse_args(argv)
+
+
+def main_process(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+
+    # Run the selected stages in pipeline order
+    stages = [stage for stage in STAGES if stage in args.stages]
+    if args.dry_run:
+        for stage in stages:
+            title, _ = STAGES[stage]
+            LOGGER.info(f"[Dry run] Would run stage {stage}: {title}")
+    else:
+        # One cassette for the whole run, as recording starts a new cassette
+        cassette = Cassette.from_config(cassette_configs.get_config("cassette"))
+        for stage in stages:
+            title, runner = STAGES[stage]
+            LOGGER.info(f"-----{title}-----")
+            runner(args, cassette)
+
+    if args.dry_run:
+        LOGGER.info(f"[Dry run] Settings: {vars(args)}")
+
+
 if __name__ == "__main__":
     main_process()
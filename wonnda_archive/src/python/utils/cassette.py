@@ -0,0 +1,328 @@
+import json
+import logging
+from base64 import b64decode, b64encode
+from collections import defaultdict, deque
+from collections.abc import Iterable, Mapping, Sequence
+from datetime import date, datetime
+from importlib import import_module
+from os import makedirs, path
+from threading import Lock
+from time import monotonic, sleep
+from typing import Any, Callable, Optional, TypeVar
+
+from configs.cassette import CassetteConfiguration
+from utils.spend_meter import SpendMeter
+
+T = TypeVar("T")
+
+
+class CassetteMissError(Exception):
+    pass
+
+
+def get_qualified_name(type_: type) -> str:
+    return f"{type_.__module__}:{type_.__qualname__}"
+
+
+def import_qualified_name(qualified_name: str) -> Any:
+    module_name, qualname = qualified_name.split(":")
+    imported = import_module(module_name)
+    for name in qualname.split("."):
+        imported = getattr(imported, name)
+
+    return imported
+
+
+def encode_tagged(value: Any) -> Optional[dict[str, str]]:
+    """
+    Encode a value that JSON has no type for as a tagged string.
+
+    :param value: Value to encode
+    :return: Tagged string, or None if the value has no tagged encoding
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return {"__bytes__": b64encode(value).decode()}
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, type):
+        return {"__type__": get_qualified_name(value)}
+
+    return None
+
+
+def encode(value: Any) -> Any:
+    """
+    Encode a request or response value to JSON-compatible data, keeping the
+    types needed to decode it again (bytes, tuples, dates, timestamps and
+    pydantic models).
+
+    :param value: Value to encode
+    :return: JSON-compatible data
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    tagged_value = encode_tagged(value)
+    if tagged_value is not None:
+        return tagged_value
+    if isinstance(value, tuple):
+        return {"__tuple__": [encode(item) for item in value]}
+    if hasattr(value, "model_dump"):
+        return {
+            "__model__": get_qualified_name(type(value)),
+            "data": value.model_dump(mode="json"),
+        }
+    if isinstance(value, Mapping) or hasattr(value, "items"):
+        return {str(key): encode(item) for key, item in value.items()}
+    if isinstance(value, Iterable):
+        return [encode(item) for item in value]
+    if hasattr(value, "__dict__"):
+        return {"__object__": type(value).__name__, **encode(vars(value))}
+
+    return str(value)
+
+
+def decode(value: Any) -> Any:
+    """
+    Decode data encoded with encode.
+
+    :param value: Encoded data
+    :return: Decoded value
+    """
+    if isinstance(value, list):
+        return [decode(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if "__bytes__" in value:
+        return b64decode(value["__bytes__"])
+    if "__tuple__" in value:
+        return tuple(decode(item) for item in value["__tuple__"])
+    if "__datetime__" in value:
+        return datetime.fromisoformat(value["__datetime__"])
+    if "__date__" in value:
+        return date.fromisoformat(value["__date__"])
+    if "__type__" in value:
+        return import_qualified_name(value["__type__"])
+    if "__model__" in value:
+        return import_qualified_name(value["__model__"]).model_validate(value["data"])
+
+    return {key: decode(item) for key, item in value.items()}
+
+
+class Cassette:
+    """
+    Records the calls made through wrapped clients, with their responses and
+    latencies, to a JSONL file, or replays them from it without network access.
+
+    Each recording session starts a new cassette. In replay mode a call is
+    answered by the first unused recording with the same service, method and
+    request. Calls whose request changed since the recording, e.g. as it holds
+    the current time, are answered by the next unused recording of the same
+    service and method with a warning. The recorded latency is scaled by
+    time_scale, so 1 replays with the original timing and 0 without any waiting.
+    The API usage of a call is recorded with it and replayed into the spend
+    meter of the wrapped client.
+    """
+
+    def __init__(
+        self,
+        mode: str,
+        cassette_path: str,
+        time_scale: float,
+        logger: logging.Logger,
+    ):
+        self.mode = mode
+        self.cassette_path = cassette_path
+        self.time_scale = time_scale
+        self.logger = logger
+        self._lock = Lock()
+        self._by_request: dict[tuple[str, str, str], deque[dict[str, Any]]] = (
+            defaultdict(deque)
+        )
+        self._by_method: dict[tuple[str, str], deque[dict[str, Any]]] = defaultdict(
+            deque
+        )
+
+        if self.mode == CassetteConfiguration.Modes.replay:
+            with open(self.cassette_path) as cassette_file:
+                for line in cassette_file:
+                    interaction = json.loads(line)
+                    interaction["used"] = False
+                    self._by_request[
+                        (
+                            interaction["service"],
+                            interaction["method"],
+                            interaction["request_key"],
+                        )
+                    ].append(interaction)
+                    self._by_method[
+                        (interaction["service"], interaction["method"])
+                    ].append(interaction)
+            self.logger.info(f"Replaying cassette {self.cassette_path}.")
+        elif self.mode == CassetteConfiguration.Modes.record:
+            makedirs(path.dirname(self.cassette_path), exist_ok=True)
+            # Interactions of earlier sessions would be replayed out of order
+            open(self.cassette_path, "w").close()
+            self.logger.info(f"Recording cassette {self.cassette_path}.")
+
+    @classmethod
+    def from_config(cls, cassette_config: CassetteConfiguration) -> "Cassette":
+        return cls(
+            mode=cassette_config.mode,
+            cassette_path=cassette_config.cassette_path,
+            time_scale=cassette_config.time_scale,
+            logger=cassette_config.logger,
+        )
+
+    def wrap(
+        self,
+        factory: Callable[[], T],
+        service: str,
+        logger: logging.Logger,
+        spend_meter: Optional[SpendMeter] = None,
+    ) -> T:
+        """
+        Wrap a client so that its method calls are recorded or replayed. In
+        replay mode the client is never created.
+
+        :param factory: Function creating the client
+        :param service: Name to record the client's calls under
+        :param logger: Logger exposed as the client's logger attribute
+        :param spend_meter: Spend meter the client records its usage in
+        :return: The client itself if the cassette is off, else a proxy of it
+        """
+        if self.mode == CassetteConfiguration.Modes.off:
+            return factory()
+        client = None if self.mode == CassetteConfiguration.Modes.replay else factory()
+
+        return CassetteProxy(  # type: ignore
+            cassette=self,
+            service=service,
+            client=client,
+            logger=logger,
+            spend_meter=spend_meter,
+        )
+
+    def call(
+        self,
+        service: str,
+        method: str,
+        request: dict[str, Any],
+        func: Callable[[], Any],
+        spend_meter: Optional[SpendMeter] = None,
+    ) -> Any:
+        """
+        Record or replay a single client call.
+
+        :param service: Name of the service
+        :param method: Name of the called method
+        :param request: Call arguments
+        :param func: Function making the actual call
+        :param spend_meter: Spend meter the client records its usage in
+        :return: The (recorded) response
+        """
+        encoded_request = encode(request)
+        request_key = json.dumps(encoded_request, sort_keys=True)
+        if self.mode == CassetteConfiguration.Modes.replay:
+            return self._replay(service, method, request_key, spend_meter)
+
+        usages: list[list[int]] = list()
+        start_time = monotonic()
+        if spend_meter is None:
+            response = func()
+        else:
+            with spend_meter.capture() as usages:
+                response = func()
+        latency = monotonic() - start_time
+        encoded_response = encode(response)
+        # Lazy results such as query row iterators are consumed by encoding
+        if not isinstance(response, (str, bytes, Mapping, Sequence)) and isinstance(
+            response, Iterable
+        ):
+            response = decode(encoded_response)
+
+        interaction = {
+            "service": service,
+            "method": method,
+            "request_key": request_key,
+            "request": encoded_request,
+            "response": encoded_response,
+            "latency": latency,
+            "usages": usages,
+        }
+        with self._lock:
+            with open(self.cassette_path, "a") as cassette_file:
+                cassette_file.write(json.dumps(interaction) + "\n")
+
+        return response
+
+    def _replay(
+        self,
+        service: str,
+        method: str,
+        request_key: str,
+        spend_meter: Optional[SpendMeter] = None,
+    ) -> Any:
+        interaction: Optional[dict[str, Any]] = None
+        with self._lock:
+            for candidates in (
+                self._by_request[(service, method, request_key)],
+                self._by_method[(service, method)],
+            ):
+                while candidates and candidates[0]["used"]:
+                    candidates.popleft()
+                if candidates:
+                    interaction = candidates.popleft()
+                    interaction["used"] = True
+                    break
+
+        if interaction is None:
+            raise CassetteMissError(f"No recording left for {service}.{method}")
+        if interaction["request_key"] != request_key:
+            self.logger.warning(
+                f"Request to {service}.{method} differs from the recording. "
+                "Replaying the next recording of the method instead."
+            )
+
+        sleep(interaction["latency"] * self.time_scale)
+        if spend_meter is not None:
+            for input_tokens, output_tokens in interaction.get("usages", list()):
+                spend_meter.record(
+                    input_tokens=input_tokens, output_tokens=output_tokens
+                )
+
+        return decode(interaction["response"])
+
+
+class CassetteProxy:
+    def __init__(
+        self,
+        cassette: Cassette,
+        service: str,
+        client: Any,
+        logger: logging.Logger,
+        spend_meter: Optional[SpendMeter] = None,
+    ):
+        self.cassette = cassette
+        self.service = service
+        self.client = client
+        self.logger = logger
+        self.spend_meter = spend_meter
+
+    def __getattr__(self, name: str) -> Any:
+        if self.client is not None:
+            attribute = getattr(self.client, name)
+            if not callable(attribute):
+                return attribute
+
+        def recorded_method(*args: Any, **kwargs: Any) -> Any:
+            return self.cassette.call(
+                service=self.service,
+                method=name,
+                request={"args": args, "kwargs": kwargs},
+                func=lambda: getattr(self.client, name)(*args, **kwargs),
+                spend_meter=self.spend_meter,
+            )
+
+        return recorded_method
@@ -0,0 +1,132 @@
+from sys import intern
+from typing import Any, Iterator, Mapping, Optional
+
+# Columns of ol.companies and the fields added by the enrichment. The processed
+# watermark column is configurable and kept with the other columns.
+FIELDS = (
+    "company_id",
+    "company_name",
+    "formatted_company_name",
+    "latest_tradeshow_date",
+    "email",
+    "phone",
+    "address",
+    "country",
+    "website",
+    "domain",
+    "bubble_company_id",
+    "category",
+    "tags",
+    "source",
+    "description",
+    "company_type1",
+    "loaded_at",
+    "formatted_address",
+    "determined_company_type1",
+    "enriched_description",
+)
+# Low-cardinality fields whose values are shared between records
+INTERNED_FIELDS = frozenset(
+    ("country", "category", "source", "company_type1", "determined_company_type1")
+)
+FIELD_SET = frozenset(FIELDS)
+# Marks unset slots, as None is a valid value
+MISSING = object()
+
+
+class CompanyRecord:
+    """
+    Compact company record with dict-style access.
+
+    Known columns are stored in slots, any other column in a dict created only
+    when needed. Like a dict, a record only has the keys that were set, so
+    as_row returns the same row a plain dict would have held.
+    """
+
+    __slots__ = FIELDS + ("_extra",)
+
+    def __init__(self, values: Optional[Mapping[str, Any]] = None):
+        self._extra: Optional[dict[str, Any]] = None
+        if values is not None:
+            self.update(values)
+
+    @classmethod
+    def from_row(cls, row: Mapping[str, Any]) -> "CompanyRecord":
+        """
+        Create a record from a query result row.
+
+        :param row: Query result row
+        :return: Company record
+        """
+        return cls(row)
+
+    def __getitem__(self, key: str) -> Any:
+        if key in FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is None:
+            raise KeyError(key)
+
+        return self._extra[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in FIELD_SET:
+            if key in INTERNED_FIELDS and isinstance(value, str):
+                value = intern(value)
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = dict()
+            self._extra[key] = value
+
+    def __contains__(self, key: object) -> bool:
+        if key in FIELD_SET:
+            return hasattr(self, key)
+
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self) -> Iterator[str]:
+        return self.keys()
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.keys())
+
+    def __repr__(self) -> str:
+        return f"CompanyRecord({self.as_row()})"
+
+    def keys(self) -> Iterator[str]:
+        for field in FIELDS:
+            if hasattr(self, field):
+                yield field
+        if self._extra is not None:
+            yield from self._extra
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def update(self, values: Mapping[str, Any]) -> None:
+        for key, value in values.items():
+            self[key] = value
+
+    def as_row(self) -> dict[str, Any]:
+        """
+        Convert the record to a row for loading to BigQuery. The BigQuery client
+        serialises dicts, so this is the only copy of the values made for the
+        load; it reads the slots directly instead of going through __getitem__.
+
+        :return: Row with all keys that were set
+        """
+        row = dict()
+        for field in FIELDS:
+            value = getattr(self, field, MISSING)
+            if value is not MISSING:
+                row[field] = value
+        if self._extra is not None:
+            row.update(self._extra)
+
+        return row
@@ -0,0 +1,132 @@
+import logging
+from time import monotonic
+from typing import Any, Callable, Optional
+
+from configs.llm_enrichment import LLMEnrichmentConfiguration
+from utils.company_record import CompanyRecord
+from utils.spend_meter import SpendMeter
+
+# Input fields of the enrichment, the fewer are missing the fewer Perplexity
+# lookups a company needs and the better its enrichment
+ENRICHMENT_INPUT_FIELDS = (
+    "address",
+    "description",
+    "domain",
+    "country",
+    "email",
+    "phone",
+)
+
+
+def get_missing_field_count(company: CompanyRecord) -> int:
+    return sum(1 for field in ENRICHMENT_INPUT_FIELDS if not company.get(field))
+
+
+# Priority -> (sort key, descending)
+PRIORITY_SORT_KEYS: dict[str, tuple[Callable[[CompanyRecord], Any], bool]] = {
+    # Empty dates sort last in descending order
+    LLMEnrichmentConfiguration.Priorities.latest_tradeshow_date: (
+        lambda company: (
+            company.get("latest_tradeshow_date") is not None,
+            company.get("latest_tradeshow_date"),
+        ),
+        True,
+    ),
+    LLMEnrichmentConfiguration.Priorities.bubble_company_id: (
+        lambda company: bool(company.get("bubble_company_id")),
+        True,
+    ),
+    LLMEnrichmentConfiguration.Priorities.missing_fields: (
+        get_missing_field_count,
+        False,
+    ),
+}
+
+
+def prioritise_companies(
+    companies: list[CompanyRecord],
+    priorities: list[str],
+) -> list[CompanyRecord]:
+    """
+    Order companies by the given priorities, the first priority deciding first.
+    Companies of equal priority keep their original order.
+
+    :param companies: Company records to order
+    :param priorities: Priority names, see LLMEnrichmentConfiguration.Priorities
+    :return: Ordered company records
+    """
+    prioritised_companies = list(companies)
+    # Stable sorts from the least to the most significant priority
+    for priority in reversed(priorities):
+        sort_key, descending = PRIORITY_SORT_KEYS[priority]
+        prioritised_companies.sort(key=sort_key, reverse=descending)
+
+    return prioritised_companies
+
+
+class EnrichmentBudget:
+    """
+    Wall-clock and spend budget of an enrichment run. Both limits are optional;
+    without any limit the budget is never exhausted.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        max_runtime: Optional[float] = None,
+        max_spend: Optional[float] = None,
+        spend_meters: Optional[list[SpendMeter]] = None,
+    ):
+        self.logger = logger
+        self.max_runtime = max_runtime
+        self.max_spend = max_spend
+        self.spend_meters = spend_meters or list()
+        self.start_time = monotonic()
+        self.exhausted_reason: Optional[str] = None
+
+    @property
+    def runtime(self) -> float:
+        return monotonic() - self.start_time
+
+    @property
+    def spend(self) -> float:
+        return sum(spend_meter.spend for spend_meter in self.spend_meters)
+
+    @property
+    def remaining_runtime(self) -> Optional[float]:
+        if self.max_runtime is None:
+            return None
+        return max(self.max_runtime - self.runtime, 0.0)
+
+    @property
+    def remaining_spend(self) -> Optional[float]:
+        if self.max_spend is None:
+            return None
+        return max(self.max_spend - self.spend, 0.0)
+
+    def is_exhausted(self) -> bool:
+        """
+        Check whether the run should stop starting new work. The reason is
+        logged once, when the budget is first found exhausted.
+
+        :return: True if the runtime or spend limit is reached
+        """
+        if self.exhausted_reason is not None:
+            return True
+
+        if self.max_runtime is not None and self.runtime >= self.max_runtime:
+            self.exhausted_reason = (
+                f"runtime of {self.runtime:.0f}s reached the limit of "
+                f"{self.max_runtime:.0f}s"
+            )
+        elif self.max_spend is not None and self.spend >= self.max_spend:
+            self.exhausted_reason = (
+                f"spend of ${self.spend:.2f} reached the limit of "
+                f"${self.max_spend:.2f}"
+            )
+        else:
+            return False
+
+        self.logger.info(f"Enrichment budget exhausted: {self.exhausted_reason}.")
+
+        return True
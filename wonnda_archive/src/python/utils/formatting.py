@@ -0,0 +1,235 @@
+from re import compile
+from typing import Optional
+
+# Upper-cased legal form (without dots) -> canonical spelling
+LEGAL_FORMS = {
+    "AB": "AB",
+    "AG": "AG",
+    "AS": "AS",
+    "BV": "B.V.",
+    "CO": "Co.",
+    "CORP": "Corp.",
+    "EK": "e.K.",
+    "EV": "e.V.",
+    "GBR": "GbR",
+    "GMBH": "GmbH",
+    "INC": "Inc.",
+    "KG": "KG",
+    "KGAA": "KGaA",
+    "LLC": "LLC",
+    "LLP": "LLP",
+    "LTD": "Ltd.",
+    "NV": "N.V.",
+    "OHG": "OHG",
+    "OY": "Oy",
+    "PLC": "PLC",
+    "SA": "S.A.",
+    "SAS": "S.A.S.",
+    "SARL": "S.à r.l.",
+    "SL": "S.L.",
+    "SPA": "S.p.A.",
+    "SRL": "S.r.l.",
+    "UG": "UG",
+}
+# Words joining legal forms in a suffix, e.g. 'GmbH & Co. KG'
+LEGAL_FORM_JOINERS = {"&", "+"}
+# Lower-case joining words inside names, e.g. 'Fruits and Vegetables'
+JOINING_WORDS = {"and", "of", "the", "und", "der", "die", "das", "de", "la", "le"}
+VOWELS = set("AEIOUÄÖÜY")
+# Re-cased words of at most this length may be acronyms or brands, e.g. 'ABC' or
+# 'IKEA', whose capitalisation cannot be derived from a single-case name
+MAX_AMBIGUOUS_WORD_LENGTH = 4
+# Prefixes followed by an inner capital, e.g. 'McDonalds' or "O'Neill"
+INNER_CAPITAL_PREFIXES = ("MC", "O'")
+# Minimum confidence of a formatting to skip LLM formatting
+FAST_PATH_CONFIDENCE = 0.8
+# Confidence of names re-cased from a single-case spelling
+RECASED_CONFIDENCE = 0.9
+AMBIGUOUS_CONFIDENCE = 0.7
+
+STREET_NUMBER_LAST_PATTERN = compile(
+    r"^(?P<street>\D.*?)\s+(?P<number>\d+\s?[a-zA-Z]?(?:\s?[-/]\s?\d+[a-zA-Z]?)?)$"
+)
+STREET_NUMBER_FIRST_PATTERN = compile(
+    r"^(?P<number>\d+\s?[a-zA-Z]?(?:[-/]\d+[a-zA-Z]?)?)\s+(?P<street>\D.*)$"
+)
+# Dutch postcodes, e.g. '1234 AB', or numeric postcodes with an optional
+# country prefix, e.g. 'D-12345'
+ZIP_CITY_PATTERN = compile(
+    r"^(?P<zip>\d{4}\s?[A-Z]{2}(?=\s)|(?:[A-Z]{1,2}-)?\d{4,5})\s+(?P<city>\D+)$"
+)
+HOUSE_NUMBER_PATTERN = compile(r"^\d+\s?[a-zA-Z]?(?:[-/]\d+[a-zA-Z]?)?$")
+PO_BOX_PATTERN = compile(
+    r"(?i)\b(?:p\.?\s?o\.?\s?box|postfach|postbus|apartado|case postale|bp)\b"
+)
+COUNTRY_PATTERN = compile(r"^[^\W\d_][^\W\d_ .'-]*(?:[ .'-]+[^\W\d_]+)*$")
+
+
+def get_legal_form(word: str) -> Optional[str]:
+    return LEGAL_FORMS.get(word.replace(".", "").upper())
+
+
+def get_legal_form_start(words: list[str]) -> int:
+    """
+    Get the position of the legal form suffix of a name, e.g. 2 for
+    ['FROZEN', 'POWER', 'GMBH', '&', 'CO', 'KG']. The first word is never part of
+    the suffix.
+
+    :param words: Words of the name
+    :return: Position of the first word of the suffix, the number of words if
+    the name has no legal form suffix
+    """
+    legal_form_start = len(words)
+    while legal_form_start > 1 and (
+        get_legal_form(words[legal_form_start - 1])
+        or words[legal_form_start - 1] in LEGAL_FORM_JOINERS
+    ):
+        legal_form_start -= 1
+    # Joiners only belong to the suffix between legal forms
+    while (
+        legal_form_start < len(words) and words[legal_form_start] in LEGAL_FORM_JOINERS
+    ):
+        legal_form_start += 1
+
+    return legal_form_start
+
+
+def format_name_word(
+    word: str, position: int, is_single_case: bool
+) -> tuple[str, float]:
+    """
+    Capitalise a word of a company name.
+
+    :param word: Word of the name
+    :param position: Position of the word in the name
+    :param is_single_case: Whether the name is all upper or all lower case
+    :return: Formatted word and a confidence score between 0 and 1
+    """
+    if not is_single_case:
+        # Mixed case names are kept as they are, e.g. 'iPhone' or 'McCain'
+        return word, 1.0
+    if position > 0 and word.lower() in JOINING_WORDS:
+        return word.lower(), 1.0
+    if not word.isalpha():
+        # Words with digits or punctuation, e.g. '3M' or 'A&B'
+        return word.upper() if word.isupper() else word, AMBIGUOUS_CONFIDENCE
+    if not VOWELS.intersection(word.upper()):
+        # Likely an acronym, e.g. 'BMW'
+        return word.upper(), AMBIGUOUS_CONFIDENCE
+    if len(word) <= MAX_AMBIGUOUS_WORD_LENGTH or word.upper().startswith(
+        INNER_CAPITAL_PREFIXES
+    ):
+        return word.capitalize(), AMBIGUOUS_CONFIDENCE
+
+    return word.capitalize(), RECASED_CONFIDENCE
+
+
+def format_company_name(company_name: Optional[str]) -> tuple[str, float]:
+    """
+    Format a company name with proper capitalisation and legal form spelling,
+    e.g. 'FROZEN POWER GMBH' -> 'Frozen Power GmbH'. Only legal forms at the end
+    of the name are rewritten.
+
+    :param company_name: Raw company name
+    :return: Formatted name and a confidence score between 0 and 1
+    """
+    if not company_name or not company_name.strip():
+        return "", 0.0
+
+    words = company_name.split()
+    is_single_case = company_name.isupper() or company_name.islower()
+    legal_form_start = get_legal_form_start(words)
+    confidence = 1.0
+    formatted_words = list()
+    for position, word in enumerate(words):
+        legal_form = get_legal_form(word)
+        if position >= legal_form_start:
+            formatted_words.append(legal_form or word)
+            continue
+
+        formatted_word, word_confidence = format_name_word(
+            word, position, is_single_case
+        )
+        if legal_form:
+            # Legal forms inside a name are more likely words, e.g. 'Spa' in
+            # 'Thermal Spa Supplies Ltd'
+            word_confidence = min(word_confidence, AMBIGUOUS_CONFIDENCE)
+        formatted_words.append(formatted_word)
+        confidence = min(confidence, word_confidence)
+
+    return " ".join(formatted_words), confidence
+
+
+def join_address_parts(parts: list[str]) -> str:
+    """
+    Join address parts with ', ', keeping bare commas for empty parts,
+    e.g. ['742', 'Evergreen Terrace', 'Springfield', '', '', 'USA'] ->
+    '742, Evergreen Terrace, Springfield,,, USA'.
+
+    :param parts: Address parts
+    :return: Joined address
+    """
+    return ",".join(f" {part}" if part else "" for part in parts).lstrip()
+
+
+def is_target_layout(parts: list[str]) -> bool:
+    """
+    Check whether six address parts plausibly are 'House Number, Street Name,
+    City, State, Zip, Country'.
+
+    :param parts: Address parts
+    :return: True if every part fits its position
+    """
+    number, street, city, state, zip_code, country = parts
+
+    return bool(
+        HOUSE_NUMBER_PATTERN.match(number)
+        and any(character.isalpha() for character in street)
+        and city
+        and not any(character.isdigit() for character in city + state)
+        and (not zip_code or any(character.isdigit() for character in zip_code))
+        and COUNTRY_PATTERN.match(country)
+    )
+
+
+def format_address(address: Optional[str]) -> tuple[str, float]:
+    """
+    Reorder a complete address to 'House Number, Street Name, City, State, Zip,
+    Country', e.g. 'Lungo Adige 12, 39100 Bolzano, Italy' ->
+    '12, Lungo Adige, Bolzano,, 39100, Italy'.
+
+    :param address: Raw address
+    :return: Formatted address and a confidence score between 0 and 1. Addresses
+    that do not match a known layout, and PO boxes, are returned unchanged with
+    confidence 0.
+    """
+    if not address or not address.strip():
+        return "", 0.0
+
+    parts = [part.strip() for part in address.strip().split(",")]
+    if PO_BOX_PATTERN.search(address):
+        return address, 0.0
+
+    # Already in the target layout
+    if len(parts) == 6:
+        if is_target_layout(parts):
+            return join_address_parts(parts), 0.9
+        return address, 0.0
+
+    if len(parts) != 3:
+        return address, 0.0
+
+    street_part, zip_city_part, country = parts
+    street_match = STREET_NUMBER_LAST_PATTERN.match(
+        street_part
+    ) or STREET_NUMBER_FIRST_PATTERN.match(street_part)
+    zip_city_match = ZIP_CITY_PATTERN.match(zip_city_part)
+    if not (street_match and zip_city_match and COUNTRY_PATTERN.match(country)):
+        return address, 0.0
+
+    number = street_match.group("number").replace(" ", "")
+    street = street_match.group("street").strip()
+    zip_code = zip_city_match.group("zip")
+    city = zip_city_match.group("city").strip()
+
+    return join_address_parts([number, street, city, "", zip_code, country]), 0.9
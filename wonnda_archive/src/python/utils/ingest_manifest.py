@@ -0,0 +1,55 @@
+import json
+from hashlib import sha256
+from typing import Any, Iterable, Optional
+
+
+def get_content_checksum(sheet_data: Any) -> str:
+    """
+    Checksum of a file's cell values, independent of its name and format.
+
+    :param sheet_data: Values read from the file
+    :return: SHA-256 hex digest
+    """
+    return sha256(
+        json.dumps(sheet_data, default=str, sort_keys=True).encode()
+    ).hexdigest()
+
+
+def get_row_fingerprint(row: dict[str, Any]) -> str:
+    """
+    Fingerprint of a row's values as read from the file, before any per-file
+    metadata such as the source file name is added.
+
+    :param row: Row as read from the file
+    :return: SHA-256 hex digest
+    """
+    return sha256(json.dumps(row, default=str, sort_keys=True).encode()).hexdigest()
+
+
+class IngestManifest:
+    """
+    Checksums of already ingested files and fingerprints of already loaded rows.
+    """
+
+    def __init__(
+        self,
+        checksums: Iterable[str] = (),
+        row_fingerprints: Iterable[str] = (),
+    ):
+        self.checksums = set(checksums)
+        self.row_fingerprints = set(row_fingerprints)
+
+    def has_file(self, *checksums: Optional[str]) -> bool:
+        """
+        Check whether a file with any of the given checksums was ingested before.
+
+        :param checksums: Checksums of the file, e.g. Drive MD5 and content checksum
+        :return: True if the file is a duplicate
+        """
+        return any(checksum in self.checksums for checksum in checksums if checksum)
+
+    def add_file(self, *checksums: Optional[str]) -> None:
+        self.checksums.update(checksum for checksum in checksums if checksum)
+
+    def add_rows(self, row_fingerprints: Iterable[str]) -> None:
+        self.row_fingerprints.update(row_fingerprints)
@@ -0,0 +1,141 @@
+from datetime import date, datetime
+from re import IGNORECASE, compile
+from typing import Any, Optional
+
+from farmhash import fingerprint64
+
+# Mirrors r'^https?://(?:www\.)?' from the IL SQL
+WEBSITE_PREFIX_PATTERN = compile(r"^https?://(?:www\.)?")
+# Any remaining URL scheme, which NET.HOST strips as well
+URL_SCHEME_PATTERN = compile(r"^[a-z][a-z0-9+.\-]*://")
+# Mirrors r'^([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})$' (used with fullmatch,
+# as RE2's '$' does not match before a trailing newline)
+EMAIL_PATTERN = compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}")
+PRIVATE_EMAIL_PATTERN = compile(
+    r"@(gmail|yahoo|hotmail|outlook|aol|icloud|proton|zoho|yandex|mail|gmx|live|msn"
+    r"|inbox|rediff)\.",
+    IGNORECASE,
+)
+TRADESHOW_DATE_FORMAT = "%d.%m.%Y"
+
+
+def get_net_host(url: Optional[str]) -> Optional[str]:
+    """
+    Extract the host from a URL the same way BigQuery's NET.HOST does.
+
+    :param url: URL or bare host name
+    :return: Host part of the URL, or None if none can be determined
+    """
+    if url is None:
+        return None
+    url = url.strip()
+    if not url:
+        return None
+
+    scheme_match = URL_SCHEME_PATTERN.match(url.lower())
+    if scheme_match:
+        url = url[scheme_match.end() :]
+    elif url.startswith("//"):
+        url = url[2:]
+
+    for separator in ("/", "?", "#"):
+        url = url.split(separator, 1)[0]
+    # Drop user info and port
+    url = url.rsplit("@", 1)[-1]
+    if url.startswith("["):
+        url = url[: url.find("]") + 1] if "]" in url else url
+    else:
+        url = url.split(":", 1)[0]
+
+    return url or None
+
+
+def get_canonical_domain(website: Any) -> Optional[str]:
+    r"""
+    Canonicalise a website to its domain. Equivalent to the IL SQL expression
+    NET.HOST(REGEXP_REPLACE(LOWER(COALESCE(website, '')), r'^https?://(?:www\.)?', '')).
+
+    :param website: Raw website value
+    :return: Canonical domain, or None if the website is empty or invalid
+    """
+    website = str(website).lower() if website is not None else ""
+
+    return get_net_host(WEBSITE_PREFIX_PATTERN.sub("", website, count=1))
+
+
+def is_valid_business_email(email: Any) -> bool:
+    """
+    Check whether an email address is well-formed and not from a private provider.
+    Equivalent to the is_valid_email expression of the IL SQL.
+
+    :param email: Raw email value
+    :return: True if the email is a valid business email
+    """
+    if email is None:
+        return False
+    email = str(email)
+
+    return bool(EMAIL_PATTERN.fullmatch(email)) and not PRIVATE_EMAIL_PATTERN.search(
+        email
+    )
+
+
+def parse_tradeshow_date(tradeshow_date: Any) -> Optional[date]:
+    """
+    Parse a tradeshow date in the 'dd.mm.YYYY' format. Equivalent to
+    SAFE.PARSE_DATE('%d.%m.%Y', tradeshow_date) of the IL SQL.
+
+    :param tradeshow_date: Raw tradeshow date value
+    :return: Parsed date, or None if the value is empty or cannot be parsed
+    """
+    if tradeshow_date is None:
+        return None
+    try:
+        return datetime.strptime(str(tradeshow_date), TRADESHOW_DATE_FORMAT).date()
+    except ValueError:
+        return None
+
+
+def get_fingerprint_id(*values: Any) -> Optional[str]:
+    """
+    Build a stable ID from the concatenated values. Equivalent to
+    CAST(ABS(FARM_FINGERPRINT(CONCAT(values...))) AS STRING).
+
+    :param values: Values to concatenate, dates are formatted as 'YYYY-MM-DD'
+    :return: ID string, or None if any value is None (as CONCAT returns NULL)
+    """
+    if any(value is None for value in values):
+        return None
+    key = "".join(
+        value.isoformat() if isinstance(value, date) else str(value) for value in values
+    )
+    fingerprint = fingerprint64(key)
+    # FARM_FINGERPRINT returns the fingerprint as signed INT64
+    if fingerprint >= 1 << 63:
+        fingerprint -= 1 << 64
+
+    return str(abs(fingerprint))
+
+
+def normalise_tradeshow_company(row: dict[str, Any]) -> dict[str, Any]:
+    """
+    Add the pre-computed normalisation columns used by the IL SQL to a raw
+    tradeshow company row.
+
+    :param row: Tradeshow company row with snake_case keys
+    :return: The same row, with canonical_domain, is_valid_email,
+    parsed_tradeshow_date, company_id and tradeshow_company_id set
+    """
+    canonical_domain = get_canonical_domain(row.get("website"))
+    parsed_tradeshow_date = parse_tradeshow_date(row.get("tradeshow_date"))
+    company_key = canonical_domain if canonical_domain is not None else row.get("name")
+
+    row["canonical_domain"] = canonical_domain
+    row["is_valid_email"] = is_valid_business_email(row.get("email"))
+    row["parsed_tradeshow_date"] = parsed_tradeshow_date
+    row["company_id"] = get_fingerprint_id(company_key)
+    row["tradeshow_company_id"] = get_fingerprint_id(
+        parsed_tradeshow_date, company_key, row.get("source_file")
+    )
+
+    return row
@@ -0,0 +1,103 @@
+import json
+from bisect import bisect_left
+from heapq import merge
+from os import makedirs, path, replace
+from typing import Any, Iterable, Iterator, Optional
+
+
+class ProcessedIdIndex:
+    """
+    Local sorted index of already processed IDs, together with the load
+    watermarks of the processed and unprocessed tables it was synced up to.
+    """
+
+    def __init__(
+        self,
+        ids: Iterable[str] = (),
+        processed_watermark: Optional[str] = None,
+        unprocessed_watermark: Optional[str] = None,
+    ):
+        self._ids = sorted(set(ids))
+        self.processed_watermark = processed_watermark
+        self.unprocessed_watermark = unprocessed_watermark
+        # Watermark of the latest discovery, committed once it is fully processed
+        self.discovered_watermark: Optional[str] = None
+
+    def __contains__(self, id_: object) -> bool:
+        if not isinstance(id_, str):
+            return False
+        position = bisect_left(self._ids, id_)
+        return position < len(self._ids) and self._ids[position] == id_
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._ids)
+
+    def add(self, ids: Iterable[str]) -> None:
+        """
+        Merge new IDs into the index.
+
+        :param ids: IDs to add
+        """
+        new_ids = sorted({id_ for id_ in ids if id_ not in self})
+        if new_ids:
+            self._ids = list(merge(self._ids, new_ids))
+
+    def clear(self) -> None:
+        """
+        Remove all IDs and watermarks, e.g. when the processed table was dropped.
+        """
+        self._ids = list()
+        self.processed_watermark = None
+        self.unprocessed_watermark = None
+        self.discovered_watermark = None
+
+    def commit_discovery(self) -> None:
+        """
+        Advance the unprocessed watermark to the latest discovery, once all
+        discovered rows have been processed.
+        """
+        if self.discovered_watermark is not None:
+            self.unprocessed_watermark = self.discovered_watermark
+            self.discovered_watermark = None
+
+    @classmethod
+    def load(cls, index_path: str) -> "ProcessedIdIndex":
+        """
+        Load an index from disk. Returns an empty index if none exists yet.
+
+        :param index_path: Path to the index file
+        :return: Loaded index
+        """
+        if not path.exists(index_path):
+            return cls()
+
+        with open(index_path) as index_file:
+            index_data: dict[str, Any] = json.load(index_file)
+
+        return cls(
+            ids=index_data["ids"],
+            processed_watermark=index_data["processed_watermark"],
+            unprocessed_watermark=index_data["unprocessed_watermark"],
+        )
+
+    def save(self, index_path: str) -> None:
+        """
+        Atomically write the index to disk.
+
+        :param index_path: Path to the index file
+        """
+        makedirs(path.dirname(index_path), exist_ok=True)
+        temp_path = f"{index_path}.tmp"
+        with open(temp_path, "w") as index_file:
+            json.dump(
+                {
+                    "processed_watermark": self.processed_watermark,
+                    "unprocessed_watermark": self.unprocessed_watermark,
+                    "ids": self._ids,
+                },
+                index_file,
+            )
+        replace(temp_path, index_path)
@@ -0,0 +1,97 @@
+import logging
+from collections import deque
+from math import inf
+from threading import Lock
+from time import monotonic, sleep
+from typing import Optional
+
+
+class RateLimiter:
+    """
+    Thread-safe sliding-window budget for requests and tokens per minute. APIs
+    that only limit requests are budgeted without a token limit.
+
+    Token usage is reserved with an estimate when a request starts and
+    corrected with the actual usage once the response is in. Rate limit errors
+    halve the usable share of the budget, which then recovers gradually with
+    each successful request.
+    """
+
+    WINDOW = 60.0
+    MIN_BUDGET_SHARE = 0.1
+    BUDGET_RECOVERY = 0.05
+
+    def __init__(
+        self,
+        requests_per_minute: int,
+        tokens_per_minute: Optional[int],
+        logger: logging.Logger,
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.logger = logger
+        self.budget_share = 1.0
+        self._lock = Lock()
+        # [start time, tokens] per request within the window
+        self._requests: deque[list[float]] = deque()
+        self._tokens = 0.0
+
+    def _expire(self, now: float) -> None:
+        while self._requests and self._requests[0][0] <= now - self.WINDOW:
+            self._tokens -= self._requests.popleft()[1]
+
+    def acquire(self, tokens: int) -> list[float]:
+        """
+        Block until a request with the given estimated token count fits into
+        the budget, then reserve it.
+
+        :param tokens: Estimated total tokens of the request
+        :return: Reservation, to be passed to record_usage
+        """
+        while True:
+            with self._lock:
+                now = monotonic()
+                self._expire(now)
+                request_limit = max(
+                    1, int(self.requests_per_minute * self.budget_share)
+                )
+                token_limit = (
+                    self.tokens_per_minute * self.budget_share
+                    if self.tokens_per_minute is not None
+                    else inf
+                )
+                # A single oversized request is let through on an empty window
+                if len(self._requests) < request_limit and (
+                    self._tokens + tokens <= token_limit or not self._requests
+                ):
+                    reservation = [now, float(tokens)]
+                    self._requests.append(reservation)
+                    self._tokens += tokens
+                    return reservation
+                wait_time = self._requests[0][0] + self.WINDOW - now
+            sleep(max(wait_time, 0.1))
+
+    def record_usage(self, reservation: list[float], tokens: int) -> None:
+        """
+        Replace the estimated token count of a finished request with its actual
+        usage and recover part of the budget.
+
+        :param reservation: Reservation as returned by acquire
+        :param tokens: Actual total tokens of the request
+        """
+        with self._lock:
+            if any(request is reservation for request in self._requests):
+                self._tokens += tokens - reservation[1]
+                reservation[1] = float(tokens)
+            self.budget_share = min(1.0, self.budget_share + self.BUDGET_RECOVERY)
+
+    def report_rate_limit(self) -> None:
+        """
+        Halve the usable share of the budget after a rate limit error.
+        """
+        with self._lock:
+            self.budget_share = max(self.MIN_BUDGET_SHARE, self.budget_share / 2)
+            self.logger.warning(
+                "Rate limit hit. Reducing budget to "
+                f"{self.budget_share:.0%} of the configured limits."
+            )
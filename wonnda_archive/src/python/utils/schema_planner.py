@@ -0,0 +1,192 @@
+from datetime import date, datetime
+from typing import Any, Iterable, Optional
+
+# BigQuery column types inferred from Python values
+STRING = "STRING"
+INTEGER = "INTEGER"
+FLOAT = "FLOAT"
+BOOLEAN = "BOOLEAN"
+TIMESTAMP = "TIMESTAMP"
+DATE = "DATE"
+
+# Standard SQL names reported by INFORMATION_SCHEMA.COLUMNS
+TYPE_ALIASES = {"INT64": INTEGER, "FLOAT64": FLOAT, "BOOL": BOOLEAN}
+
+# Values of each type from which get_schema_from_row infers the column type
+PROTOTYPE_VALUES: dict[str, Any] = {
+    STRING: "",
+    INTEGER: 0,
+    FLOAT: 0.0,
+    BOOLEAN: False,
+    TIMESTAMP: datetime(1970, 1, 1),
+    DATE: date(1970, 1, 1),
+}
+
+
+class SchemaMismatchError(Exception):
+    pass
+
+
+def get_value_type(value: Any) -> Optional[str]:
+    """
+    Get the BigQuery type of a value.
+
+    :param value: Value of a row
+    :return: BigQuery type, None for empty values
+    """
+    if value is None or value == "":
+        return None
+    # bool is a subclass of int and datetime of date
+    if isinstance(value, bool):
+        return BOOLEAN
+    if isinstance(value, int):
+        return INTEGER
+    if isinstance(value, float):
+        return FLOAT
+    if isinstance(value, datetime):
+        return TIMESTAMP
+    if isinstance(value, date):
+        return DATE
+
+    return STRING
+
+
+def widen_type(current_type: Optional[str], value_type: Optional[str]) -> Optional[str]:
+    """
+    Get the narrowest type holding values of both types.
+
+    :param current_type: Type planned so far
+    :param value_type: Type of another value
+    :return: Widened type
+    """
+    if current_type is None or current_type == value_type:
+        return value_type
+    if value_type is None:
+        return current_type
+    if {current_type, value_type} == {INTEGER, FLOAT}:
+        return FLOAT
+
+    return STRING
+
+
+def can_coerce(value: Any, value_type: Optional[str], column_type: str) -> bool:
+    """
+    Check whether a value can be loaded into a column of the given type.
+
+    :param value: Value of a row
+    :param value_type: BigQuery type of the value
+    :param column_type: BigQuery type of the column
+    :return: True if the value is empty, of the column type or convertible to it
+    """
+    if value_type is None or value_type == column_type or column_type == STRING:
+        return True
+    if column_type == FLOAT and value_type == INTEGER:
+        return True
+
+    return column_type == INTEGER and value_type == FLOAT and value.is_integer()
+
+
+class SchemaPlan:
+    """
+    Union schema of all rows to be loaded into a table in one run.
+
+    Columns are collected from every row, while types are inferred from a sample
+    of the rows of each file and widened on conflicts, so that a column holding
+    numbers in one file and text in another is planned as STRING. Rows beyond
+    the sample only widen a column if their value cannot be converted to the
+    planned type. The types of columns already in the table take precedence
+    over the planned types; rows with values that do not fit them are rejected.
+    """
+
+    def __init__(self, sample_size: int):
+        self.sample_size = sample_size
+        self.columns: dict[str, Optional[str]] = dict()
+        self.existing_columns: dict[str, str] = dict()
+
+    def add_rows(self, rows: Iterable[dict[str, Any]]) -> None:
+        """
+        Add the columns of the rows of a file to the plan.
+
+        :param rows: Rows of a file
+        """
+        for index, row in enumerate(rows):
+            sample = index < self.sample_size
+            for column, value in row.items():
+                current_type = self.columns.setdefault(column, None)
+                value_type = get_value_type(value)
+                if sample or (
+                    current_type is not None
+                    and not can_coerce(value, value_type, current_type)
+                ):
+                    self.columns[column] = widen_type(current_type, value_type)
+
+    def set_existing_columns(self, existing_columns: dict[str, str]) -> None:
+        """
+        Set the columns already in the table.
+
+        :param existing_columns: Column name -> type of the existing table
+        """
+        self.existing_columns = {
+            column: TYPE_ALIASES.get(column_type, column_type)
+            for column, column_type in existing_columns.items()
+        }
+
+    def get_column_type(self, column: str) -> str:
+        if column in self.existing_columns:
+            return self.existing_columns[column]
+
+        # Columns without any sampled value are loaded as STRING
+        return self.columns.get(column) or STRING
+
+    def get_new_columns(self) -> list[str]:
+        return [
+            column for column in self.columns if column not in self.existing_columns
+        ]
+
+    def get_prototype_row(self, columns: Optional[list[str]] = None) -> dict[str, Any]:
+        """
+        Get a row with a value of the planned type for each column, to create
+        the table schema from.
+
+        :param columns: Columns to include, defaults to all planned columns
+        :return: Prototype row
+        """
+        return {
+            column: PROTOTYPE_VALUES.get(self.get_column_type(column), "")
+            for column in (columns if columns is not None else self.columns)
+        }
+
+    def coerce_row(self, row: dict[str, Any]) -> dict[str, Any]:
+        """
+        Fill a row up to all planned columns and convert its values to the
+        column types, so that all rows of the run load without schema checks.
+
+        :param row: Row to load
+        :return: Row with a value for every planned column
+        :raises SchemaMismatchError: if a value does not fit the type of an
+        existing column
+        """
+        coerced_row: dict[str, Any] = dict()
+        for column in self.columns:
+            value: Any = row.get(column)
+            column_type = self.get_column_type(column)
+            value_type = get_value_type(value)
+            if value_type is None:
+                # Empty cells of non-text columns are loaded as NULL
+                value = value if column_type == STRING else None
+            elif not can_coerce(value, value_type, column_type):
+                raise SchemaMismatchError(
+                    f"Value {value!r} of column {column} does not fit its "
+                    f"type {column_type}."
+                )
+            elif value_type == column_type:
+                pass
+            elif column_type == STRING:
+                value = str(value)
+            elif column_type == FLOAT:
+                value = float(value)
+            else:
+                value = int(value)
+            coerced_row[column] = value
+
+        return coerced_row
@@ -0,0 +1,81 @@
+from contextlib import contextmanager
+from threading import Lock, local
+from typing import Iterator
+
+
+class SpendMeter:
+    """
+    Thread-safe tally of the requests and tokens billed by an API, and the
+    resulting spend in USD. The usage recorded by a single call can be captured,
+    e.g. to store it with a cassette recording and replay it later.
+    """
+
+    def __init__(
+        self,
+        input_price_per_million: float = 0.0,
+        output_price_per_million: float = 0.0,
+        request_price: float = 0.0,
+    ):
+        self.input_price_per_million = input_price_per_million
+        self.output_price_per_million = output_price_per_million
+        self.request_price = request_price
+        self.requests = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self._lock = Lock()
+        self._captures = local()
+
+    def record(self, input_tokens: int = 0, output_tokens: int = 0) -> None:
+        """
+        Record the usage of a finished request.
+
+        :param input_tokens: Prompt tokens of the request
+        :param output_tokens: Completion tokens of the request
+        """
+        with self._lock:
+            self.requests += 1
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+        usages = getattr(self._captures, "usages", None)
+        if usages is not None:
+            usages.append([input_tokens, output_tokens])
+
+    @contextmanager
+    def capture(self) -> Iterator[list[list[int]]]:
+        """
+        Collect the usage recorded by the current thread within the context.
+
+        :return: Input and output tokens per recorded request
+        """
+        usages: list[list[int]] = list()
+        self._captures.usages = usages
+        try:
+            yield usages
+        finally:
+            self._captures.usages = None
+
+    def get_price(
+        self, requests: int = 1, input_tokens: int = 0, output_tokens: int = 0
+    ) -> float:
+        """
+        Get the price of the given usage, e.g. to estimate a request upfront.
+
+        :param requests: Number of requests
+        :param input_tokens: Prompt tokens of the requests
+        :param output_tokens: Completion tokens of the requests
+        :return: Price in USD
+        """
+        return (
+            requests * self.request_price
+            + input_tokens * self.input_price_per_million / 1_000_000
+            + output_tokens * self.output_price_per_million / 1_000_000
+        )
+
+    @property
+    def spend(self) -> float:
+        with self._lock:
+            return self.get_price(
+                requests=self.requests,
+                input_tokens=self.input_tokens,
+                output_tokens=self.output_tokens,
+            )
@@ -0,0 +1,2 @@
+ALTER TABLE {dataset}.{dwh_table}
+{column_definitions};
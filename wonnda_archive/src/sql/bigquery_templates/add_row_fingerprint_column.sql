@@ -0,0 +1,2 @@
+ALTER TABLE {dataset}.{dwh_table}
+ADD COLUMN IF NOT EXISTS row_fingerprint STRING;
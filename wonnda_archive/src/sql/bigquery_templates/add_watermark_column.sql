@@ -0,0 +1,2 @@
+ALTER TABLE {processed_dataset}.{processed_table}
+ADD COLUMN IF NOT EXISTS {watermark_column} TIMESTAMP;
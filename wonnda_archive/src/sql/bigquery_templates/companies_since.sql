@@ -0,0 +1,4 @@
+SELECT
+  *
+FROM {unprocessed_dataset}.{unprocessed_table}
+WHERE {unprocessed_watermark_column} >= DATE({watermark});
@@ -0,0 +1,9 @@
+SELECT
+  custom_id,
+  request_type,
+  input_companies,
+  formatted_fields,
+  retrieved_fields
+FROM {batch_state_dataset}.{batch_request_table}
+WHERE target = {target}
+  AND batch_id = {batch_id};
@@ -0,0 +1,4 @@
+SELECT
+  md5_checksum,
+  content_checksum
+FROM {dataset}.{manifest_table};
@@ -0,0 +1,4 @@
+SELECT DISTINCT
+  row_fingerprint
+FROM {dataset}.{dwh_table}
+WHERE row_fingerprint IS NOT NULL;
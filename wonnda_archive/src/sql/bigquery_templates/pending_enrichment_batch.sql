@@ -0,0 +1,9 @@
+SELECT
+  batch_id
+FROM {batch_state_dataset}.{batch_state_table}
+WHERE target = {target}
+QUALIFY
+  ROW_NUMBER() OVER (PARTITION BY batch_id ORDER BY recorded_at DESC) = 1
+  AND status = 'pending'
+ORDER BY recorded_at DESC
+LIMIT 1;
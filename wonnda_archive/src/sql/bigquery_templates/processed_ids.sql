@@ -0,0 +1,4 @@
+SELECT
+  {id_column} AS id,
+  {watermark_column} AS watermark
+FROM {processed_dataset}.{processed_table};
@@ -0,0 +1,5 @@
+SELECT
+  {id_column} AS id,
+  {watermark_column} AS watermark
+FROM {processed_dataset}.{processed_table}
+WHERE {watermark_column} > TIMESTAMP({watermark});
@@ -0,0 +1,5 @@
+SELECT
+  column_name,
+  data_type
+FROM {dataset}.INFORMATION_SCHEMA.COLUMNS
+WHERE table_name = {table_name};
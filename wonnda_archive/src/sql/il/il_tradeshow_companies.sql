@@ -1,3 +1,12 @@
+/* The normalisation columns are added by the GDrive loader only when it loads
+   new files, so make sure they exist before the IL reads them. */
+ALTER TABLE `supplier-scraping.dl_gdrive.tradeshow_companies`
+ADD COLUMN IF NOT EXISTS canonical_domain STRING,
+ADD COLUMN IF NOT EXISTS is_valid_email BOOL,
+ADD COLUMN IF NOT EXISTS parsed_tradeshow_date DATE,
+ADD COLUMN IF NOT EXISTS company_id STRING,
+ADD COLUMN IF NOT EXISTS tradeshow_company_id STRING;
+
 CREATE OR REPLACE TABLE `supplier-scraping.il.tradeshow_companies` (
 /* KEYS */
 tradeshow_company_id STRING,
@@ -25,52 +34,76 @@ loaded_at           DATE
 );
 
 INSERT INTO `supplier-scraping.il.tradeshow_companies`
+/* Domain, email validity, tradeshow date and IDs are pre-computed by the GDrive
+   loader. Rows loaded before that (is_valid_email IS NULL) are normalised here. */
+WITH legacy_domains AS (
+SELECT
+ts.* EXCEPT (canonical_domain),
+IF(
+  ts.is_valid_email IS NULL,
+  NET.HOST(REGEXP_REPLACE(LOWER(COALESCE(ts.website, '')), r'^https?://(?:www\.)?', '')),
+  ts.canonical_domain
+) as canonical_domain
+FROM `supplier-scraping.dl_gdrive.tradeshow_companies` ts
+),
+normalised AS (
 SELECT
-CAST(
-  ABS(FARM_FINGERPRINT(
-    CONCAT(
-      PARSE_DATE('%d.%m.%Y', ts.tradeshow_date),
-      COALESCE(
-        NET.HOST(REGEXP_REPLACE(LOWER(COALESCE(ts.website, '')), r'^https?://(?:www\.)?', '')),
-        ts.name
-      ),
-      ts.source_file
-    )
-  )) AS STRING
+ts.* EXCEPT (is_valid_email, parsed_tradeshow_date, company_id, tradeshow_company_id),
+IF(
+  ts.is_valid_email IS NULL,
+  CAST(
+    ABS(FARM_FINGERPRINT(
+      CONCAT(
+        SAFE.PARSE_DATE('%d.%m.%Y', ts.tradeshow_date),
+        COALESCE(ts.canonical_domain, ts.name),
+        ts.source_file
+      )
+    )) AS STRING
+  ),
+  ts.tradeshow_company_id
 ) as tradeshow_company_id,
-CAST(
-  ABS(FARM_FINGERPRINT(
-    COALESCE(
-      NET.HOST(REGEXP_REPLACE(LOWER(COALESCE(ts.website, '')), r'^https?://(?:www\.)?', '')),
-      ts.name
-    )
-  )
-) AS STRING) as company_id,
-b.bubble_company_id,
-ts.name as company_name,
-PARSE_DATE('%d.%m.%Y', ts.tradeshow_date) as tradeshow_date,
-ts.email,
+IF(
+  ts.is_valid_email IS NULL,
+  CAST(ABS(FARM_FINGERPRINT(COALESCE(ts.canonical_domain, ts.name))) AS STRING),
+  ts.company_id
+) as company_id,
+IF(
+  ts.is_valid_email IS NULL,
+  SAFE.PARSE_DATE('%d.%m.%Y', ts.tradeshow_date),
+  ts.parsed_tradeshow_date
+) as parsed_tradeshow_date,
 COALESCE(
+  ts.is_valid_email,
   REGEXP_CONTAINS(ts.email, r'^([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})$') 
   AND NOT REGEXP_CONTAINS(LOWER(ts.email), r'@(gmail|yahoo|hotmail|outlook|aol|icloud|proton|zoho|yandex|mail|gmx|live|msn|inbox|rediff)\.'),
   FALSE
-) as is_valid_email,
+) as is_valid_email
+FROM legacy_domains ts
+)
+SELECT
+ts.tradeshow_company_id,
+ts.company_id,
+b.bubble_company_id,
+ts.name as company_name,
+ts.parsed_tradeshow_date as tradeshow_date,
+ts.email,
+ts.is_valid_email,
 ts.phone,
 ts.address,
 ts.country,
 ts.website,
-NET.HOST(REGEXP_REPLACE(LOWER(COALESCE(ts.website, '')), r'^https?://(?:www\.)?', '')) as domain,
+ts.canonical_domain as domain,
 ts.category_1 as category,
 ts.tags as tags,
 ts.source_file as source,
 ts.description,
 ts.company_type1,
 DATE(TIMESTAMP(ts.loaded_at)) as loaded_at
-FROM `supplier-scraping.dl_gdrive.tradeshow_companies` ts
+FROM normalised ts
 LEFT JOIN `supplier-scraping.dl_gdrive.bubble_company_ids` b
-  ON NET.HOST(REGEXP_REPLACE(LOWER(COALESCE(ts.website, '')), r'^https?://(?:www\.)?', '')) = b.domain
+  ON ts.canonical_domain = b.domain
 LEFT JOIN `supplier-scraping.dl_gdrive.unlisted_companies` uc
-  ON NET.HOST(REGEXP_REPLACE(LOWER(COALESCE(ts.website, '')), r'^https?://(?:www\.)?', '')) = uc.domain
+  ON ts.canonical_domain = uc.domain
 WHERE uc.domain IS NULL;
 QUALIFY ROW_NUMBER() OVER (
   PARTITION BY tradeshow_company_id 
@@ -0,0 +1,176 @@
+import json
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+import pytest
+from pydantic import BaseModel
+
+pytest.importorskip("pnd_utils")
+
+from connectors.openai_batch.openai_batch import (  # noqa: E402
+    BatchFailedError,
+    BatchTimeoutError,
+    OpenAIBatch,
+    get_strict_schema,
+)
+from utils.spend_meter import SpendMeter  # noqa: E402
+
+
+class CompanyArray(BaseModel):  # type: ignore
+    class Company(BaseModel):  # type: ignore
+        company_id: str
+        enriched_description: str
+
+    companies: list[Company]
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Serves the files and batches endpoints of the OpenAI API from the state of
+    its server.
+    """
+
+    def send_json(self, body: dict) -> None:
+        content = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_POST(self) -> None:
+        content = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path == "/files":
+            self.server.uploads.append(content)
+            self.send_json({"id": "file-input"})
+        elif self.path == "/batches":
+            self.server.batch_requests.append(json.loads(content))
+            self.send_json({"id": "batch-1", "status": "validating"})
+        else:
+            self.send_error(404)
+
+    def do_GET(self) -> None:
+        if self.path == "/batches/batch-1":
+            self.send_json(self.server.batches.pop(0))
+        elif self.path == "/files/file-output/content":
+            content = self.server.output.encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+        else:
+            self.send_error(404)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.uploads = list()
+    server.batch_requests = list()
+    server.batches = list()
+    server.output = ""
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(server):
+    return OpenAIBatch(
+        token="test",  # noqa: S106
+        model="gpt-4o-mini",
+        logger=logging.getLogger("test.openai_batch"),
+        base_url=f"http://127.0.0.1:{server.server_address[1]}",
+        spend_meter=SpendMeter(
+            input_price_per_million=1.0, output_price_per_million=2.0
+        ),
+    )
+
+
+def get_output_line(custom_id: str, content: str, status_code: int = 200) -> str:
+    return json.dumps(
+        {
+            "custom_id": custom_id,
+            "response": {
+                "status_code": status_code,
+                "body": {
+                    "choices": [{"message": {"content": content}}],
+                    "usage": {"prompt_tokens": 100, "completion_tokens": 50},
+                },
+            },
+            "error": None,
+        }
+    )
+
+
+def test_submit_batch_uploads_strict_requests(server, client):
+    batch_id = client.submit_batch([("0-full", "Enrich", CompanyArray)])
+
+    assert batch_id == "batch-1"
+    assert server.batch_requests == [
+        {
+            "input_file_id": "file-input",
+            "endpoint": "/v1/chat/completions",
+            "completion_window": "24h",
+        }
+    ]
+    # The batch file is the last part of the multipart upload
+    batch_file = server.uploads[0].rsplit(b"\r\n\r\n", 1)[1].split(b"\r\n--")[0]
+    request = json.loads(batch_file)
+    assert request["custom_id"] == "0-full"
+    json_schema = request["body"]["response_format"]["json_schema"]
+    assert json_schema["strict"] is True
+    assert json_schema["schema"]["additionalProperties"] is False
+
+
+def test_wait_for_batch_returns_successful_responses(server, client):
+    server.batches = [
+        {"id": "batch-1", "status": "in_progress"},
+        {"id": "batch-1", "status": "completed", "output_file_id": "file-output"},
+    ]
+    server.output = "\n".join(
+        [
+            get_output_line("0-full", '{"companies": []}'),
+            get_output_line("1-full", "rate limited", status_code=429),
+        ]
+    )
+
+    responses = client.wait_for_batch("batch-1", poll_interval=0)
+
+    assert responses == {"0-full": '{"companies": []}'}
+    # Failed requests are billed as well
+    assert client.spend_meter.input_tokens == 200
+    assert client.spend_meter.output_tokens == 100
+
+
+def test_wait_for_batch_stops_polling_after_max_wait(server, client):
+    server.batches = [{"id": "batch-1", "status": "in_progress"}]
+
+    with pytest.raises(BatchTimeoutError):
+        client.wait_for_batch("batch-1", poll_interval=60, max_wait=30)
+
+    assert client.spend_meter.requests == 0
+
+
+@pytest.mark.parametrize("status", ["failed", "expired", "cancelled"])
+def test_wait_for_batch_raises_for_unfinished_batches(server, client, status):
+    server.batches = [{"id": "batch-1", "status": status}]
+
+    with pytest.raises(BatchFailedError):
+        client.wait_for_batch("batch-1", poll_interval=0)
+
+
+def test_get_strict_schema_requires_all_properties():
+    schema = get_strict_schema(CompanyArray.model_json_schema())
+
+    company_schema = schema["$defs"]["Company"]
+    assert schema["additionalProperties"] is False
+    assert schema["required"] == ["companies"]
+    assert company_schema["additionalProperties"] is False
+    assert company_schema["required"] == ["company_id", "enriched_description"]
@@ -0,0 +1,18 @@
+import pytest
+
+pytest.importorskip("google.auth")
+pytest.importorskip("pnd_utils")
+
+from connectors.sheets.sheets import get_sheet_range  # noqa: E402
+
+
+@pytest.mark.parametrize(
+    "sheet_name, sheet_range",
+    [
+        ("Sheet1", "'Sheet1'"),
+        ("Messe 2024", "'Messe 2024'"),
+        ("Partner's list", "'Partner''s list'"),
+    ],
+)
+def test_sheet_names_are_quoted(sheet_name, sheet_range):
+    assert get_sheet_range(sheet_name) == sheet_range
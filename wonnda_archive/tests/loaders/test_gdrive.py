@@ -0,0 +1,270 @@
+from datetime import date
+
+import pytest
+
+pytest.importorskip("pnd_database")
+pytest.importorskip("pnd_gsheets")
+
+from configs.gdrive import GDriveConfiguration  # noqa: E402
+from loaders.gdrive import (  # noqa: E402
+    GSHEETS_FILE_TYPE,
+    XLSX_FILE_TYPE,
+    PendingFile,
+    apply_schema_plan,
+    load_file,
+    read_file,
+)
+from utils.ingest_manifest import (  # noqa: E402
+    IngestManifest,
+    get_content_checksum,
+    get_row_fingerprint,
+)
+from utils.schema_planner import SchemaMismatchError, SchemaPlan  # noqa: E402
+
+HEADER = ["Name", "Website"]
+ACME = ["ACME GmbH", "acme.de"]
+BETA = ["Beta AG", "beta.de"]
+
+
+class StubGSheets:
+    """
+    Serves the tabs of Google Sheets and the values of XLSX files by file ID,
+    and records the reads and moves. Stands in for the Sheets API client as well.
+    """
+
+    def __init__(self, spreadsheets=None, xlsx_files=None):
+        self.spreadsheets = spreadsheets or dict()
+        self.xlsx_files = xlsx_files or dict()
+        self.reads = list()
+        self.moved_file_ids = list()
+
+    def get_sheet_names(self, spreadsheet_id):
+        return list(self.spreadsheets[spreadsheet_id])
+
+    def read_sheets(self, spreadsheet_id, sheet_names):
+        self.reads.append(spreadsheet_id)
+        return [
+            self.spreadsheets[spreadsheet_id][sheet_name] for sheet_name in sheet_names
+        ]
+
+    def read_xlsx(self, file_id):
+        self.reads.append(file_id)
+        return self.xlsx_files[file_id]
+
+    def move_file(self, file_id, source_folder_id, destination_folder_id):
+        self.moved_file_ids.append(file_id)
+
+
+class StubBigQuery:
+    """
+    Reports the columns of an existing table and records the queries run and
+    the rows written.
+    """
+
+    def __init__(self, table_columns):
+        self.table_columns = table_columns
+        self.queries = list()
+        self.written_tables = list()
+
+    def create_dataset(self, dataset_name, location):
+        pass
+
+    def table_exists(self, dataset_name, table_name):
+        return True
+
+    def parametrized_query(self, query_path, query_params):
+        return iter(
+            {"column_name": column_name, "data_type": data_type}
+            for column_name, data_type in self.table_columns.items()
+        )
+
+    def query(self, query_path, async_):
+        with open(query_path) as query_file:
+            self.queries.append(query_file.read())
+
+    def write_to_table(self, data, dataset, table_name, check_for_new_columns):
+        assert not check_for_new_columns
+        self.written_tables.append(table_name)
+
+
+class StubBigQueryConfig:
+    location = "EU"
+
+
+@pytest.fixture
+def gdrive_config():
+    return GDriveConfiguration(
+        service_account_file_path="service_account.json",
+        unprocessed_folder_id="unprocessed",
+        processed_folder_id="processed",
+        dwh_table="tradeshow_companies",
+    )
+
+
+def read_test_file(gsheets, gdrive_config, manifest, file_id, **kwargs):
+    return read_file(
+        file_name=f"{file_id}.csv",
+        file_id=file_id,
+        file_type=kwargs.pop("file_type", GSHEETS_FILE_TYPE),
+        gsheets=gsheets,
+        sheets_client=gsheets,
+        gdrive_config=gdrive_config,
+        manifest=manifest,
+        **kwargs,
+    )
+
+
+def test_known_md5_checksum_skips_download(gdrive_config):
+    gsheets = StubGSheets(spreadsheets={"file": {"Sheet1": [HEADER, ACME]}})
+    manifest = IngestManifest(checksums=["md5"])
+
+    pending_file = read_test_file(
+        gsheets, gdrive_config, manifest, "file", md5_checksum="md5"
+    )
+
+    assert pending_file is None
+    assert gsheets.reads == list()
+    assert gsheets.moved_file_ids == ["file"]
+
+
+def test_known_content_checksum_skips_file(gdrive_config):
+    gsheets = StubGSheets(xlsx_files={"export": [HEADER, ACME]})
+    manifest = IngestManifest(checksums=[get_content_checksum([HEADER, ACME])])
+
+    pending_file = read_test_file(
+        gsheets, gdrive_config, manifest, "export", file_type=XLSX_FILE_TYPE
+    )
+
+    assert pending_file is None
+    assert gsheets.moved_file_ids == ["export"]
+
+
+def test_loaded_rows_are_filtered_by_fingerprint(gdrive_config):
+    gsheets = StubGSheets(spreadsheets={"file": {"Sheet1": [HEADER, ACME, BETA]}})
+    manifest = IngestManifest(
+        row_fingerprints=[get_row_fingerprint(dict(zip(HEADER, ACME, strict=True)))]
+    )
+
+    pending_file = read_test_file(gsheets, gdrive_config, manifest, "file")
+
+    assert pending_file.row_count == 2
+    assert [row["name"] for row in pending_file.load_data] == ["Beta AG"]
+    assert pending_file.load_data[0]["row_fingerprint"] in manifest.row_fingerprints
+    assert gsheets.moved_file_ids == list()
+
+
+def test_duplicates_within_one_run_are_skipped(gdrive_config):
+    gsheets = StubGSheets(
+        spreadsheets={
+            "first": {"Sheet1": [HEADER, ACME]},
+            "copy": {"Sheet1": [HEADER, ACME]},
+            "overlap": {"Sheet1": [HEADER, ACME, BETA]},
+        }
+    )
+    manifest = IngestManifest()
+
+    first_file = read_test_file(
+        gsheets, gdrive_config, manifest, "first", md5_checksum="md5-first"
+    )
+    copy_file = read_test_file(
+        gsheets, gdrive_config, manifest, "copy", md5_checksum="md5-copy"
+    )
+    overlap_file = read_test_file(gsheets, gdrive_config, manifest, "overlap")
+
+    assert len(first_file.load_data) == 1
+    assert copy_file is None
+    assert [row["name"] for row in overlap_file.load_data] == ["Beta AG"]
+    assert gsheets.moved_file_ids == ["copy"]
+
+
+@pytest.mark.parametrize(
+    "file_type, gsheets",
+    [
+        (
+            GSHEETS_FILE_TYPE,
+            StubGSheets(spreadsheets={"file": {"Tab": [HEADER, ACME]}}),
+        ),
+        (XLSX_FILE_TYPE, StubGSheets(xlsx_files={"file": [HEADER, ACME]})),
+    ],
+)
+def test_single_sheet_checksum_matches_ingested_files(
+    gdrive_config, file_type, gsheets
+):
+    # Files ingested before all tabs were read are in the manifest with the
+    # checksum of their only sheet
+    pending_file = read_test_file(
+        gsheets, gdrive_config, IngestManifest(), "file", file_type=file_type
+    )
+
+    assert pending_file.content_checksum == get_content_checksum([HEADER, ACME])
+
+
+def test_multiple_tabs_are_hashed_together(gdrive_config):
+    gsheets = StubGSheets(
+        spreadsheets={"file": {"2023": [HEADER, ACME], "2024": [HEADER, BETA]}}
+    )
+
+    pending_file = read_test_file(gsheets, gdrive_config, IngestManifest(), "file")
+
+    assert pending_file.content_checksum == get_content_checksum(
+        [[HEADER, ACME], [HEADER, BETA]]
+    )
+    assert [row["sheet_name"] for row in pending_file.load_data] == ["2023", "2024"]
+    # All tabs are read in one request
+    assert gsheets.reads == ["file"]
+
+
+def test_empty_tabs_are_skipped(gdrive_config):
+    gsheets = StubGSheets(
+        spreadsheets={"file": {"Notes": list(), "Tab": [HEADER, ACME], "Draft": list()}}
+    )
+
+    pending_file = read_test_file(gsheets, gdrive_config, IngestManifest(), "file")
+
+    assert pending_file.content_checksum == get_content_checksum([HEADER, ACME])
+    assert [row["sheet_name"] for row in pending_file.load_data] == ["Tab"]
+
+
+def test_new_columns_are_added_with_planned_types(gdrive_config):
+    schema_plan = SchemaPlan(sample_size=10)
+    schema_plan.add_rows(
+        [
+            {"name": "ACME GmbH", "founded": None},
+            {"name": "Beta AG", "founded": date(2001, 5, 1)},
+        ]
+    )
+    bq_client = StubBigQuery(table_columns={"name": "STRING"})
+
+    apply_schema_plan(schema_plan, gdrive_config, bq_client, StubBigQueryConfig)
+
+    assert len(bq_client.queries) == 1
+    assert "ADD COLUMN IF NOT EXISTS `founded` DATE" in bq_client.queries[0]
+    assert schema_plan.get_new_columns() == list()
+
+
+def test_file_with_unfitting_value_is_not_loaded(gdrive_config):
+    schema_plan = SchemaPlan(sample_size=10)
+    schema_plan.add_rows([{"employees": 5}, {"employees": "n/a"}])
+    schema_plan.set_existing_columns({"employees": "INT64"})
+    gsheets = StubGSheets()
+    bq_client = StubBigQuery(table_columns={"employees": "INT64"})
+    pending_file = PendingFile(
+        file_name="file.csv",
+        file_id="file",
+        content_checksum="content",
+        row_count=2,
+        load_data=[{"employees": 5}, {"employees": "n/a"}],
+    )
+
+    with pytest.raises(SchemaMismatchError):
+        load_file(
+            pending_file,
+            schema_plan,
+            gsheets,
+            gdrive_config,
+            bq_client,
+            StubBigQueryConfig,
+        )
+
+    assert bq_client.written_tables == list()
+    assert gsheets.moved_file_ids == list()
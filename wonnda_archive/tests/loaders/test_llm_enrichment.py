@@ -0,0 +1,387 @@
+import logging
+from datetime import date, datetime
+from os import path
+from threading import Barrier
+
+import pytest
+
+pytest.importorskip("pnd_database")
+pytest.importorskip("langchain_openai")
+
+from configs.llm_enrichment import (  # noqa: E402
+    LLMEnrichmentConfiguration,
+    LLMEnrichmentConfigurationCollection,
+)
+from configs.openai import OpenAIConfiguration  # noqa: E402
+from loaders import llm_enrichment  # noqa: E402
+from loaders.llm_enrichment import (  # noqa: E402
+    BatchRequestTypes,
+    BatchStatuses,
+    EnrichmentFailedError,
+    check_target_schema,
+    estimate_request_spend,
+    get_companies_to_process,
+    join_enriched_fields,
+    load_batch_state,
+    prepare_enrichment_inputs,
+    process_enrichment,
+    render_enrichment_requests,
+    save_batch_requests,
+    save_batch_state,
+    submit_enrichment_batch,
+    sync_processed_index,
+)
+from utils.company_record import CompanyRecord  # noqa: E402
+from utils.processed_index import ProcessedIdIndex  # noqa: E402
+from utils.spend_meter import SpendMeter  # noqa: E402
+
+
+class StubBigQuery:
+    """
+    Returns the rows set for a query template and records the queries run and
+    the rows written.
+    """
+
+    def __init__(self, results=None, existing_tables=None):
+        self.results = results or dict()
+        self.existing_tables = existing_tables
+        self.queries = list()
+        self.tables = dict()
+
+    def create_dataset(self, dataset_name):
+        pass
+
+    def create_table(self, dataset, table_name, schema):
+        self.tables[table_name] = list()
+
+    def write_to_table(self, data, dataset, table_name, check_for_new_columns):
+        self.tables[table_name].extend(data)
+
+    def table_exists(self, dataset_name, table_name):
+        return self.existing_tables is None or table_name in self.existing_tables
+
+    def parametrized_query(self, query_path, query_params):
+        query_name = path.basename(query_path)
+        self.queries.append(
+            (query_name, {param.name: param.value for param in query_params})
+        )
+        return iter(self.results.get(query_name, list()))
+
+
+class StubOpenAIBatch:
+    """
+    Records the submitted batch requests.
+    """
+
+    def __init__(self, spend_meter):
+        self.spend_meter = spend_meter
+        self.logger = logging.getLogger("test.openai_batch")
+        self.batch_requests = list()
+
+    def submit_batch(self, batch_requests):
+        self.batch_requests.extend(batch_requests)
+        return "batch-1"
+
+
+def get_company(company_id):
+    return {
+        "company_id": company_id,
+        "company_name": "ACME GMBH",
+        "address": "Hauptstr. 1, 10115 Berlin",
+        "description": "Makes things.",
+    }
+
+
+class StubCassette:
+    """
+    Hands out no clients, for runs whose targets are stubbed.
+    """
+
+    def wrap(self, factory, service, logger, spend_meter=None):
+        return None
+
+
+@pytest.fixture
+def llm_enrichment_config(tmp_path):
+    return LLMEnrichmentConfiguration(
+        id_column="company_id",
+        unprocessed_table="companies",
+        processed_table="companies",
+        index_dir=str(tmp_path),
+    )
+
+
+@pytest.fixture
+def offerings_config(tmp_path):
+    return LLMEnrichmentConfiguration(
+        id_column="offering_id",
+        unprocessed_table="offerings",
+        processed_table="offerings",
+        index_dir=str(tmp_path),
+        input_columns={"company_name": "offering_name"},
+    )
+
+
+def get_offering(offering_id, company_id):
+    return CompanyRecord(
+        {
+            "offering_id": offering_id,
+            "company_id": company_id,
+            "offering_name": "ACME GMBH",
+            "address": "Hauptstr. 1, 10115 Berlin",
+            "description": "Makes things.",
+            "domain": "acme.de",
+            "country": "DE",
+        }
+    )
+
+
+def test_sync_processed_index_pulls_rows_since_watermark(llm_enrichment_config):
+    processed_index = ProcessedIdIndex()
+    bq_client = StubBigQuery(
+        results={
+            "processed_ids.sql": [
+                {"id": "2", "watermark": datetime(2024, 3, 5, 12, 30)},
+                {"id": "1", "watermark": datetime(2024, 3, 4, 8, 0)},
+                {"id": "3", "watermark": None},
+            ],
+        }
+    )
+    sync_processed_index(bq_client, llm_enrichment_config, processed_index)
+
+    assert list(processed_index) == ["1", "2", "3"]
+    assert processed_index.processed_watermark == "2024-03-05T12:30:00"
+
+    bq_client.results = {
+        "processed_ids_since.sql": [
+            {"id": "4", "watermark": datetime(2024, 3, 6, 7, 0)},
+        ],
+    }
+    sync_processed_index(bq_client, llm_enrichment_config, processed_index)
+
+    query_name, query_params = bq_client.queries[-1]
+    assert query_name == "processed_ids_since.sql"
+    assert query_params["watermark"] == "2024-03-05T12:30:00"
+    assert list(processed_index) == ["1", "2", "3", "4"]
+    assert processed_index.processed_watermark == "2024-03-06T07:00:00"
+
+
+def test_companies_since_rereads_the_watermark_day(llm_enrichment_config):
+    # loaded_at is a DATE, so rows loaded later on the watermark day are only
+    # found by re-reading the whole day
+    with open(
+        path.join(llm_enrichment_config.query_templates_path, "companies_since.sql")
+    ) as query_file:
+        assert ">= DATE({watermark})" in query_file.read()
+
+    processed_index = ProcessedIdIndex(
+        ids=["1"],
+        processed_watermark="2024-03-05T12:30:00",
+        unprocessed_watermark="2024-03-05",
+    )
+    bq_client = StubBigQuery(
+        results={
+            "companies_since.sql": [
+                {"company_id": "1", "loaded_at": date(2024, 3, 5)},
+                {"company_id": "2", "loaded_at": date(2024, 3, 5)},
+                {"company_id": "3", "loaded_at": date(2024, 3, 6)},
+            ],
+        }
+    )
+    companies = get_companies_to_process(
+        bq_client, llm_enrichment_config, processed_index
+    )
+
+    assert ("companies_since.sql", "2024-03-05") in [
+        (query_name, query_params.get("watermark"))
+        for query_name, query_params in bq_client.queries
+    ]
+    assert [company["company_id"] for company in companies] == ["2", "3"]
+    # The discovery only becomes the watermark once it is committed
+    assert processed_index.unprocessed_watermark == "2024-03-05"
+    assert processed_index.discovered_watermark == "2024-03-06"
+
+
+def test_pending_batch_is_rebuilt_from_request_rows(llm_enrichment_config):
+    openai_config = OpenAIConfiguration(api_key="test")
+    batch_state = {
+        "batch_id": "batch-1",
+        "requests": {
+            f"0-{BatchRequestTypes.full}": {
+                "type": BatchRequestTypes.full,
+                "input_companies": [{"company_id": "1", "name": "ACME GMBH"}],
+                "retrieved_fields": {"1": {"address": "A", "description": "B"}},
+            },
+            f"0-{BatchRequestTypes.description}": {
+                "type": BatchRequestTypes.description,
+                "input_companies": [{"company_id": "2", "name": "Acme GmbH"}],
+                "formatted_fields": {"2": {"formatted_company_name": "Acme GmbH"}},
+                "retrieved_fields": {"2": {"address": "C", "description": "D"}},
+            },
+        },
+    }
+    bq_client = StubBigQuery(existing_tables=set())
+    save_batch_requests(bq_client, openai_config, llm_enrichment_config, batch_state)
+    save_batch_state(
+        bq_client,
+        openai_config,
+        llm_enrichment_config,
+        batch_state,
+        status=BatchStatuses.pending,
+    )
+
+    # One small row per request instead of one cell holding the whole batch
+    request_rows = bq_client.tables[openai_config.batch_request_table]
+    assert len(request_rows) == 2
+    assert bq_client.tables[openai_config.batch_state_table][0]["status"] == (
+        BatchStatuses.pending
+    )
+
+    bq_client.existing_tables = None
+    bq_client.results = {
+        "pending_enrichment_batch.sql": [{"batch_id": "batch-1"}],
+        "enrichment_batch_requests.sql": request_rows,
+    }
+    loaded_state = load_batch_state(bq_client, openai_config, llm_enrichment_config)
+
+    assert loaded_state["batch_id"] == "batch-1"
+    assert loaded_state["requests"][f"0-{BatchRequestTypes.full}"] == {
+        **batch_state["requests"][f"0-{BatchRequestTypes.full}"],
+        "formatted_fields": {},
+    }
+    assert (
+        loaded_state["requests"][f"0-{BatchRequestTypes.description}"]
+        == batch_state["requests"][f"0-{BatchRequestTypes.description}"]
+    )
+    assert bq_client.queries[-1][1]["batch_id"] == "batch-1"
+
+
+def test_submitted_chunks_are_capped_by_the_remaining_spend(llm_enrichment_config):
+    spend_meter = SpendMeter(input_price_per_million=1.0, output_price_per_million=1.0)
+    company_chunks = [[get_company("1")], [get_company("2")], [get_company("3")]]
+    chunk_spend = sum(
+        estimate_request_spend(
+            prompt=prompt,
+            company_count=len(request_state["input_companies"]),
+            spend_meter=spend_meter,
+        )
+        for _, prompt, _, request_state in render_enrichment_requests(
+            company_chunks[0],
+            chunk_index=0,
+            llm_enrichment_config=llm_enrichment_config,
+        )
+    )
+
+    openai_batch_client = StubOpenAIBatch(spend_meter=spend_meter)
+    batch_state = submit_enrichment_batch(
+        company_chunks=company_chunks,
+        openai_batch_client=openai_batch_client,
+        llm_enrichment_config=llm_enrichment_config,
+        max_spend=chunk_spend * 2.5,
+    )
+
+    assert set(batch_state["requests"]) == {
+        custom_id for custom_id, _, _ in openai_batch_client.batch_requests
+    }
+    assert {
+        company_id
+        for request_state in batch_state["requests"].values()
+        for company_id in request_state["retrieved_fields"]
+    } == {"1", "2"}
+
+
+def test_no_batch_is_submitted_without_remaining_spend(llm_enrichment_config):
+    openai_batch_client = StubOpenAIBatch(
+        spend_meter=SpendMeter(input_price_per_million=1.0)
+    )
+    batch_state = submit_enrichment_batch(
+        company_chunks=[[get_company("1")]],
+        openai_batch_client=openai_batch_client,
+        llm_enrichment_config=llm_enrichment_config,
+        max_spend=0.0,
+    )
+
+    assert batch_state is None
+    assert openai_batch_client.batch_requests == list()
+
+
+def test_target_schema_accepts_mapped_columns(offerings_config):
+    # Offerings of one company share its company_id, but not their offering_id
+    check_target_schema(
+        [get_offering("o1", "1"), get_offering("o2", "1")], offerings_config
+    )
+
+
+def test_target_schema_rejects_missing_columns(llm_enrichment_config):
+    with pytest.raises(EnrichmentFailedError, match="company_name"):
+        check_target_schema([get_offering("o1", "1")], llm_enrichment_config)
+
+
+def test_target_schema_rejects_duplicate_ids(offerings_config):
+    with pytest.raises(EnrichmentFailedError, match="1 duplicate values"):
+        check_target_schema(
+            [get_offering("o1", "1"), get_offering("o1", "1")], offerings_config
+        )
+
+
+def test_enrichment_is_keyed_by_the_id_column(offerings_config):
+    offerings = [get_offering("o1", "1"), get_offering("o2", "1")]
+    llm_input_companies, _, _ = prepare_enrichment_inputs(
+        offerings, offerings_config, fast_path_confidence=1.1
+    )
+
+    assert [company["company_id"] for company in llm_input_companies] == [
+        "o1",
+        "o2",
+    ]
+    assert llm_input_companies[0]["name"] == "ACME GMBH"
+
+    join_enriched_fields(
+        offerings,
+        [
+            {"company_id": "o1", "enriched_description": "First."},
+            {"company_id": "o2", "enriched_description": "Second."},
+        ],
+        offerings_config,
+    )
+
+    assert [offering["enriched_description"] for offering in offerings] == [
+        "First.",
+        "Second.",
+    ]
+    # The company_id column of the target is left alone
+    assert [offering["company_id"] for offering in offerings] == ["1", "1"]
+
+
+def test_targets_are_processed_concurrently(
+    monkeypatch, llm_enrichment_config, offerings_config
+):
+    enrichment_configs = LLMEnrichmentConfigurationCollection()
+    enrichment_configs.add(companies=llm_enrichment_config, offerings=offerings_config)
+    monkeypatch.setattr(llm_enrichment, "llm_enrichment_configs", enrichment_configs)
+    # Each target waits for the other, so they only finish if run side by side
+    barrier = Barrier(2, timeout=5)
+    processed_tables = list()
+
+    def process_target(llm_enrichment_config, budget, **kwargs):
+        barrier.wait()
+        processed_tables.append(llm_enrichment_config.processed_table)
+        if llm_enrichment_config.processed_table == "offerings":
+            raise ValueError("Broken target")
+
+    monkeypatch.setattr(llm_enrichment, "process_enrichment_target", process_target)
+
+    # A failing target does not stop the others
+    with pytest.raises(EnrichmentFailedError, match="targets offerings"):
+        process_enrichment(cassette=StubCassette())
+
+    assert sorted(processed_tables) == ["companies", "offerings"]
+
+
+def test_unknown_targets_fail_before_the_run(monkeypatch, llm_enrichment_config):
+    enrichment_configs = LLMEnrichmentConfigurationCollection()
+    enrichment_configs.add(companies=llm_enrichment_config)
+    monkeypatch.setattr(llm_enrichment, "llm_enrichment_configs", enrichment_configs)
+
+    with pytest.raises(EnrichmentFailedError, match="offerings"):
+        process_enrichment(targets=["offerings"], cassette=StubCassette())
@@ -0,0 +1,77 @@
+import json
+import logging
+
+import pytest
+
+pytest.importorskip("pnd_utils")
+
+from configs.cassette import CassetteConfiguration, cassette_configs  # noqa: E402
+from pipelines import main_process  # noqa: E402
+
+LOGGER = logging.getLogger("test.main_process")
+
+
+class Client:
+    def get(self, key):
+        return {"key": key}
+
+
+def get_stage_runner(service, responses):
+    def run_stage(args, cassette):
+        client = cassette.wrap(Client, service=service, logger=LOGGER)
+        responses.append(client.get(service))
+
+    return run_stage
+
+
+@pytest.fixture
+def stages(monkeypatch):
+    responses = list()
+    monkeypatch.setattr(
+        main_process,
+        "STAGES",
+        {
+            main_process.Stages.gdrive: (
+                "GDrive",
+                get_stage_runner("gdrive.bigquery", responses),
+            ),
+            main_process.Stages.enrich: (
+                "Enrichment",
+                get_stage_runner("enrichment.bigquery", responses),
+            ),
+        },
+    )
+    return responses
+
+
+def test_stages_share_one_cassette(monkeypatch, tmp_path, stages):
+    cassette_path = tmp_path / "cassette.jsonl"
+    cassette_config = cassette_configs.get_config("cassette")
+    monkeypatch.setattr(cassette_config, "cassette_path", str(cassette_path))
+    monkeypatch.setattr(cassette_config, "time_scale", 0)
+
+    monkeypatch.setattr(cassette_config, "mode", CassetteConfiguration.Modes.record)
+    main_process.main_process(["--stages", "gdrive,enrich"])
+
+    # Recording the enrichment does not start a new cassette
+    assert [
+        json.loads(line)["service"] for line in cassette_path.read_text().splitlines()
+    ] == ["gdrive.bigquery", "enrichment.bigquery"]
+
+    monkeypatch.setattr(cassette_config, "mode", CassetteConfiguration.Modes.replay)
+    main_process.main_process(["--stages", "gdrive,enrich"])
+
+    assert stages[2:] == stages[:2]
+
+
+def test_dry_run_keeps_the_cassette(monkeypatch, tmp_path, stages):
+    cassette_path = tmp_path / "cassette.jsonl"
+    cassette_path.write_text("recording\n")
+    cassette_config = cassette_configs.get_config("cassette")
+    monkeypatch.setattr(cassette_config, "cassette_path", str(cassette_path))
+    monkeypatch.setattr(cassette_config, "mode", CassetteConfiguration.Modes.record)
+
+    main_process.main_process(["--dry-run"])
+
+    assert stages == list()
+    assert cassette_path.read_text() == "recording\n"
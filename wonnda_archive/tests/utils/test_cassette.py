@@ -0,0 +1,105 @@
+import logging
+from datetime import date, datetime
+
+import pytest
+
+pytest.importorskip("pnd_utils")
+
+from configs.cassette import CassetteConfiguration  # noqa: E402
+from utils.cassette import Cassette, CassetteMissError, decode, encode  # noqa: E402
+from utils.spend_meter import SpendMeter  # noqa: E402
+
+LOGGER = logging.getLogger("test.cassette")
+
+
+class Client:
+    def __init__(self, spend_meter=None):
+        self.calls = list()
+        self.spend_meter = spend_meter
+
+    def get(self, key, suffix=b""):
+        self.calls.append(key)
+        if self.spend_meter is not None:
+            self.spend_meter.record(input_tokens=100, output_tokens=10)
+        return {"key": key, "content": b"\x00raw" + suffix, "pair": (key, 1)}
+
+
+def get_cassette(mode, cassette_path):
+    return Cassette(
+        mode=mode, cassette_path=str(cassette_path), time_scale=0, logger=LOGGER
+    )
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        b"\x00\xffbytes",
+        ("a", 1, (2, b"x")),
+        {"created": datetime(2024, 3, 5, 12, 30), "day": date(2024, 3, 5)},
+        [None, True, 1.5, "text"],
+    ],
+)
+def test_decode_restores_encoded_value(value):
+    assert decode(encode(value)) == value
+
+
+def test_replay_returns_recorded_responses(tmp_path):
+    cassette_path = tmp_path / "cassette.jsonl"
+    client = Client()
+    recorder = get_cassette(CassetteConfiguration.Modes.record, cassette_path)
+    recorded = recorder.wrap(lambda: client, service="test", logger=LOGGER)
+    responses = [recorded.get("a"), recorded.get("b", suffix=b"!")]
+
+    player = get_cassette(CassetteConfiguration.Modes.replay, cassette_path)
+    replayed = player.wrap(Client, service="test", logger=LOGGER)
+
+    assert replayed.get("b", suffix=b"!") == responses[1]
+    assert replayed.get("a") == responses[0]
+    assert client.calls == ["a", "b"]
+
+
+def test_record_starts_a_new_cassette(tmp_path):
+    cassette_path = tmp_path / "cassette.jsonl"
+    for key in ("a", "b"):
+        recorder = get_cassette(CassetteConfiguration.Modes.record, cassette_path)
+        recorder.wrap(Client, service="test", logger=LOGGER).get(key)
+
+    assert len(cassette_path.read_text().splitlines()) == 1
+
+
+def test_replay_warns_for_changed_requests(tmp_path, caplog):
+    cassette_path = tmp_path / "cassette.jsonl"
+    recorder = get_cassette(CassetteConfiguration.Modes.record, cassette_path)
+    response = recorder.wrap(Client, service="test", logger=LOGGER).get("a")
+
+    player = get_cassette(CassetteConfiguration.Modes.replay, cassette_path)
+    replayed = player.wrap(Client, service="test", logger=LOGGER)
+    with caplog.at_level(logging.WARNING, logger=LOGGER.name):
+        assert replayed.get("changed") == response
+
+    assert "differs from the recording" in caplog.text
+    with pytest.raises(CassetteMissError):
+        replayed.get("a")
+
+
+def test_replay_records_spend_of_recorded_calls(tmp_path):
+    cassette_path = tmp_path / "cassette.jsonl"
+    recorded_meter = SpendMeter(request_price=0.5)
+    recorder = get_cassette(CassetteConfiguration.Modes.record, cassette_path)
+    recorder.wrap(
+        lambda: Client(spend_meter=recorded_meter),
+        service="test",
+        logger=LOGGER,
+        spend_meter=recorded_meter,
+    ).get("a")
+
+    replayed_meter = SpendMeter(request_price=0.5)
+    player = get_cassette(CassetteConfiguration.Modes.replay, cassette_path)
+    replayed = player.wrap(
+        Client, service="test", logger=LOGGER, spend_meter=replayed_meter
+    )
+    replayed.get("a")
+
+    assert replayed_meter.spend == recorded_meter.spend == 0.5
+    assert replayed_meter.input_tokens == 100
+    assert replayed_meter.output_tokens == 10
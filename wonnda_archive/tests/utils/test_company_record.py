@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from utils.company_record import CompanyRecord
+
+
+def test_as_row_matches_a_plain_dict():
+    row = {
+        "company_id": "1",
+        "company_name": "ACME GMBH",
+        "address": None,
+        "custom_column": "value",
+    }
+    company = CompanyRecord.from_row(row)
+
+    assert company.as_row() == row
+    assert list(company.as_row()) == list(row)
+    assert "address" in company
+    assert "email" not in company
+
+
+def test_watermark_column_is_not_fixed():
+    enriched_at = datetime(2024, 3, 5, 12, 30)
+    company = CompanyRecord({"company_id": "1"})
+    company["processed_at"] = enriched_at
+
+    assert company.as_row() == {"company_id": "1", "processed_at": enriched_at}
+    assert "enriched_at" not in company
+
+
+def test_low_cardinality_values_are_interned():
+    countries = ["".join(["Ger", "many"]) for _ in range(2)]
+    companies = [CompanyRecord({"country": country}) for country in countries]
+
+    assert companies[0]["country"] is companies[1]["country"]
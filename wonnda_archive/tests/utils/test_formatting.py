@@ -0,0 +1,111 @@
+import pytest
+from utils.formatting import FAST_PATH_CONFIDENCE, format_address, format_company_name
+
+
+@pytest.mark.parametrize(
+    "company_name, formatted_name",
+    [
+        ("FROZEN POWER GMBH", "Frozen Power GmbH"),
+        ("frozen power gmbh", "Frozen Power GmbH"),
+        ("FRUITS AND VEGETABLES B.V.", "Fruits and Vegetables B.V."),
+        ("McCain Foods", "McCain Foods"),
+        ("FROZEN POWER GMBH & CO KG", "Frozen Power GmbH & Co. KG"),
+        ("Nordic Foods AS", "Nordic Foods AS"),
+    ],
+)
+def test_format_company_name_fast_path(company_name, formatted_name):
+    name, confidence = format_company_name(company_name)
+
+    assert name == formatted_name
+    assert confidence >= FAST_PATH_CONFIDENCE
+
+
+@pytest.mark.parametrize(
+    "company_name",
+    [
+        # Short words may be acronyms or brands
+        "ABC TRADING",
+        "IKEA",
+        # Inner capitals cannot be derived from a single-case name
+        "MCDONALDS",
+        "O'NEILL SPORTS",
+        "BMW AG",
+        "3M DEUTSCHLAND GMBH",
+    ],
+)
+def test_format_company_name_ambiguous_names_go_to_llm(company_name):
+    _, confidence = format_company_name(company_name)
+
+    assert confidence < FAST_PATH_CONFIDENCE
+
+
+@pytest.mark.parametrize(
+    "company_name, formatted_name",
+    [
+        ("Thermal Spa Supplies Ltd", "Thermal Spa Supplies Ltd."),
+        ("Nordic Sa Foods", "Nordic Sa Foods"),
+        ("BEAUTY SPA PRODUCTS", "Beauty Spa Products"),
+        ("Andersen As Consulting", "Andersen As Consulting"),
+        ("TRADING CO AND SONS", "Trading Co and Sons"),
+        ("NORDIC AB SOLUTIONS", "Nordic Ab Solutions"),
+        ("Costa Sl Imports", "Costa Sl Imports"),
+    ],
+)
+def test_format_company_name_keeps_legal_forms_inside_names(
+    company_name, formatted_name
+):
+    name, confidence = format_company_name(company_name)
+
+    assert name == formatted_name
+    assert confidence < FAST_PATH_CONFIDENCE
+
+
+def test_format_company_name_empty():
+    assert format_company_name(None) == ("", 0.0)
+    assert format_company_name("  ") == ("", 0.0)
+
+
+@pytest.mark.parametrize(
+    "address, formatted_address",
+    [
+        (
+            "Lungo Adige 12, 39100 Bolzano, Italy",
+            "12, Lungo Adige, Bolzano,, 39100, Italy",
+        ),
+        (
+            "Main Street 10, 1234 AB Amsterdam, Netherlands",
+            "10, Main Street, Amsterdam,, 1234 AB, Netherlands",
+        ),
+        (
+            "Hauptstr. 5a, D-12345 Berlin, Germany",
+            "5a, Hauptstr., Berlin,, D-12345, Germany",
+        ),
+        (
+            "742, Evergreen Terrace, Springfield,,, USA",
+            "742, Evergreen Terrace, Springfield,,, USA",
+        ),
+    ],
+)
+def test_format_address_fast_path(address, formatted_address):
+    formatted, confidence = format_address(address)
+
+    assert formatted == formatted_address
+    assert confidence >= FAST_PATH_CONFIDENCE
+
+
+@pytest.mark.parametrize(
+    "address",
+    [
+        "PO Box 12, 12345 Town, Germany",
+        "Postfach 1020, 12345 Berlin, Germany",
+        "1, 2, 3, 4, 5, 6",
+        "12, Main Street, 1234, , 5678, Netherlands",
+        "Somewhere in Berlin",
+        "Main Street 10, London SW1A 1AA, United Kingdom",
+    ],
+)
+def test_format_address_unknown_layouts_go_to_llm(address):
+    formatted, confidence = format_address(address)
+
+    assert formatted == address
+    assert confidence < FAST_PATH_CONFIDENCE
@@ -0,0 +1,40 @@
+from utils.ingest_manifest import (
+    IngestManifest,
+    get_content_checksum,
+    get_row_fingerprint,
+)
+
+
+def test_content_checksum_is_stable():
+    # Checksums are stored in the manifest table, so their input format must not
+    # change between releases
+    assert get_content_checksum([["Name"], ["ACME"]]) == (
+        "239b52e2afcd7cc129cb4df588c6b03041b899fbad124dc3160691d3f9c217de"
+    )
+
+
+def test_row_fingerprint_ignores_key_order():
+    assert get_row_fingerprint({"Name": "ACME", "City": "Berlin"}) == (
+        get_row_fingerprint({"City": "Berlin", "Name": "ACME"})
+    )
+    assert get_row_fingerprint({"Name": "ACME"}) != get_row_fingerprint(
+        {"Name": "ACME GmbH"}
+    )
+
+
+def test_has_file_matches_any_checksum():
+    manifest = IngestManifest(checksums=["md5", "content"])
+
+    assert manifest.has_file(None, "content")
+    assert manifest.has_file("md5")
+    assert not manifest.has_file(None, "other")
+    assert not manifest.has_file(None)
+
+
+def test_add_file_ignores_missing_checksums():
+    manifest = IngestManifest()
+    manifest.add_file(None, "", "content")
+    manifest.add_rows(["row"])
+
+    assert manifest.checksums == {"content"}
+    assert manifest.row_fingerprints == {"row"}
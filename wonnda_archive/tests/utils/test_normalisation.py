@@ -0,0 +1,115 @@
+from datetime import date
+
+import pytest
+from utils.normalisation import (
+    get_canonical_domain,
+    get_fingerprint_id,
+    is_valid_business_email,
+    normalise_tradeshow_company,
+    parse_tradeshow_date,
+)
+
+
+# FARM_FINGERPRINT(CONCAT(CAST(x AS STRING), y, CAST(z AS STRING))) examples
+# from the BigQuery documentation
+@pytest.mark.parametrize(
+    "values, farm_fingerprint",
+    [
+        (("1", "foo", "true"), -1541654101129638711),
+        (("2", "apple", "false"), 2794438866806483259),
+        (("3", "", "true"), -4880158226897771312),
+    ],
+)
+def test_get_fingerprint_id_matches_farm_fingerprint(values, farm_fingerprint):
+    assert get_fingerprint_id(*values) == str(abs(farm_fingerprint))
+
+
+def test_get_fingerprint_id_formats_dates_like_concat():
+    assert get_fingerprint_id(date(2024, 3, 5), "a") == get_fingerprint_id(
+        "2024-03-05a"
+    )
+
+
+def test_get_fingerprint_id_is_null_if_any_value_is_null():
+    assert get_fingerprint_id("a", None) is None
+
+
+@pytest.mark.parametrize(
+    "website, domain",
+    [
+        ("https://www.Example.com/path?q=1", "example.com"),
+        ("http://shop.example.de:8080/", "shop.example.de"),
+        ("example.com/about", "example.com"),
+        # Only a www. directly after the scheme is stripped
+        ("www.example.com", "www.example.com"),
+        ("ftp://example.com", "example.com"),
+        ("", None),
+        (None, None),
+    ],
+)
+def test_get_canonical_domain(website, domain):
+    assert get_canonical_domain(website) == domain
+
+
+@pytest.mark.parametrize(
+    "email, is_valid",
+    [
+        ("info@firma.de", True),
+        ("first.last+sales@sub.firma.co.uk", True),
+        ("someone@gmail.com", False),
+        ("someone@GMX.de", False),
+        ("no-at-sign.de", False),
+        ("info@firma.de\n", False),
+        ("info@firma.d", False),
+        (None, False),
+    ],
+)
+def test_is_valid_business_email(email, is_valid):
+    assert is_valid_business_email(email) is is_valid
+
+
+@pytest.mark.parametrize(
+    "tradeshow_date, parsed_date",
+    [
+        ("05.03.2024", date(2024, 3, 5)),
+        ("5.3.2024", date(2024, 3, 5)),
+        # SAFE.PARSE_DATE returns NULL for values it cannot parse
+        ("2024-03-05", None),
+        ("31.02.2024", None),
+        ("", None),
+        (None, None),
+    ],
+)
+def test_parse_tradeshow_date(tradeshow_date, parsed_date):
+    assert parse_tradeshow_date(tradeshow_date) == parsed_date
+
+
+def test_normalise_tradeshow_company():
+    row = normalise_tradeshow_company(
+        {
+            "name": "Firma GmbH",
+            "website": "https://www.firma.de",
+            "email": "info@firma.de",
+            "tradeshow_date": "05.03.2024",
+            "source_file": "fair_2024",
+        }
+    )
+
+    assert row["canonical_domain"] == "firma.de"
+    assert row["is_valid_email"] is True
+    assert row["parsed_tradeshow_date"] == date(2024, 3, 5)
+    assert row["company_id"] == get_fingerprint_id("firma.de")
+    assert row["tradeshow_company_id"] == get_fingerprint_id(
+        "2024-03-05firma.defair_2024"
+    )
+
+
+def test_normalise_tradeshow_company_without_website_or_date():
+    row = normalise_tradeshow_company(
+        {"name": "Firma GmbH", "website": None, "tradeshow_date": "unknown"}
+    )
+
+    assert row["canonical_domain"] is None
+    assert row["company_id"] == get_fingerprint_id("Firma GmbH")
+    # CONCAT with a NULL date is NULL
+    assert row["tradeshow_company_id"] is None
@@ -0,0 +1,102 @@
+import json
+
+from utils.processed_index import ProcessedIdIndex
+
+
+def test_membership_only_matches_indexed_ids():
+    processed_index = ProcessedIdIndex(ids=["b", "d", "b"])
+
+    assert "b" in processed_index
+    assert "d" in processed_index
+    assert "c" not in processed_index
+    assert "e" not in processed_index
+    assert 1 not in processed_index
+    assert len(processed_index) == 2
+
+
+def test_add_merges_ids_in_order():
+    processed_index = ProcessedIdIndex(ids=["b", "d"])
+    processed_index.add(["e", "a", "d", "c", "a"])
+
+    assert list(processed_index) == ["a", "b", "c", "d", "e"]
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index_path = str(tmp_path / "index" / "el_companies.json")
+    processed_index = ProcessedIdIndex(
+        ids=["2", "1"],
+        processed_watermark="2024-03-05T12:30:00",
+        unprocessed_watermark="2024-03-04T08:00:00",
+    )
+    processed_index.discovered_watermark = "2024-03-05T09:00:00"
+    processed_index.save(index_path)
+
+    loaded_index = ProcessedIdIndex.load(index_path)
+
+    assert list(loaded_index) == ["1", "2"]
+    assert loaded_index.processed_watermark == "2024-03-05T12:30:00"
+    assert loaded_index.unprocessed_watermark == "2024-03-04T08:00:00"
+    # An uncommitted discovery is not persisted
+    assert loaded_index.discovered_watermark is None
+    assert [file.name for file in (tmp_path / "index").iterdir()] == [
+        "el_companies.json"
+    ]
+
+
+def test_save_replaces_existing_index(tmp_path):
+    index_path = str(tmp_path / "el_companies.json")
+    ProcessedIdIndex(ids=["1"]).save(index_path)
+    ProcessedIdIndex(ids=["2"]).save(index_path)
+
+    with open(index_path) as index_file:
+        assert json.load(index_file)["ids"] == ["2"]
+
+
+def test_load_without_index_returns_empty_index(tmp_path):
+    processed_index = ProcessedIdIndex.load(str(tmp_path / "missing.json"))
+
+    assert len(processed_index) == 0
+    assert processed_index.unprocessed_watermark is None
+
+
+def test_discovered_watermark_only_advances_on_commit(tmp_path):
+    index_path = str(tmp_path / "el_companies.json")
+    processed_index = ProcessedIdIndex(unprocessed_watermark="2024-03-04T08:00:00")
+    processed_index.discovered_watermark = "2024-03-05T09:00:00"
+    processed_index.save(index_path)
+
+    assert processed_index.unprocessed_watermark == "2024-03-04T08:00:00"
+    assert ProcessedIdIndex.load(index_path).unprocessed_watermark == (
+        "2024-03-04T08:00:00"
+    )
+
+    processed_index.commit_discovery()
+    processed_index.save(index_path)
+
+    assert processed_index.unprocessed_watermark == "2024-03-05T09:00:00"
+    assert processed_index.discovered_watermark is None
+    assert ProcessedIdIndex.load(index_path).unprocessed_watermark == (
+        "2024-03-05T09:00:00"
+    )
+
+
+def test_commit_without_discovery_keeps_watermark():
+    processed_index = ProcessedIdIndex(unprocessed_watermark="2024-03-04T08:00:00")
+    processed_index.commit_discovery()
+
+    assert processed_index.unprocessed_watermark == "2024-03-04T08:00:00"
+
+
+def test_clear_resets_ids_and_watermarks():
+    processed_index = ProcessedIdIndex(
+        ids=["1"],
+        processed_watermark="2024-03-05T12:30:00",
+        unprocessed_watermark="2024-03-04T08:00:00",
+    )
+    processed_index.discovered_watermark = "2024-03-05T09:00:00"
+    processed_index.clear()
+
+    assert len(processed_index) == 0
+    assert processed_index.processed_watermark is None
+    assert processed_index.unprocessed_watermark is None
+    assert processed_index.discovered_watermark is None
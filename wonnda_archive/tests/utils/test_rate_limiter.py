@@ -0,0 +1,37 @@
+import logging
+
+from utils.rate_limiter import RateLimiter
+
+
+def get_rate_limiter(tokens_per_minute):
+    return RateLimiter(
+        requests_per_minute=2,
+        tokens_per_minute=tokens_per_minute,
+        logger=logging.getLogger("test.rate_limiter"),
+    )
+
+
+def test_acquire_without_token_limit_only_counts_requests():
+    rate_limiter = get_rate_limiter(tokens_per_minute=None)
+
+    rate_limiter.acquire(tokens=1_000_000)
+    rate_limiter.acquire(tokens=1_000_000)
+
+    assert len(rate_limiter._requests) == 2
+
+
+def test_acquire_blocks_at_request_limit(monkeypatch):
+    rate_limiter = get_rate_limiter(tokens_per_minute=None)
+    rate_limiter.acquire(tokens=0)
+    rate_limiter.acquire(tokens=0)
+    waits = list()
+
+    def expire_window(seconds):
+        waits.append(seconds)
+        rate_limiter._requests[0][0] -= RateLimiter.WINDOW
+
+    monkeypatch.setattr("utils.rate_limiter.sleep", expire_window)
+    rate_limiter.acquire(tokens=0)
+
+    assert len(waits) == 1
+    assert waits[0] > 0
@@ -0,0 +1,44 @@
+import pytest
+from utils.schema_planner import (
+    FLOAT,
+    INTEGER,
+    STRING,
+    SchemaMismatchError,
+    SchemaPlan,
+)
+
+
+def test_unconvertible_value_beyond_sample_widens_column():
+    schema_plan = SchemaPlan(sample_size=1)
+    schema_plan.add_rows([{"employees": 10}, {"employees": "n/a"}])
+
+    assert schema_plan.get_column_type("employees") == STRING
+    assert schema_plan.coerce_row({"employees": 10}) == {"employees": "10"}
+
+
+def test_convertible_value_beyond_sample_keeps_column_type():
+    schema_plan = SchemaPlan(sample_size=1)
+    schema_plan.add_rows([{"revenue": 1.5}, {"revenue": 2}])
+
+    assert schema_plan.get_column_type("revenue") == FLOAT
+    assert schema_plan.coerce_row({"revenue": 2}) == {"revenue": 2.0}
+
+
+def test_conflicting_files_widen_to_string():
+    schema_plan = SchemaPlan(sample_size=10)
+    schema_plan.add_rows([{"zip": 10115}])
+    schema_plan.add_rows([{"zip": "1011 AB"}, {"zip": None}])
+
+    assert schema_plan.get_column_type("zip") == STRING
+    assert schema_plan.coerce_row({"zip": None}) == {"zip": None}
+
+
+def test_value_not_fitting_existing_column_is_rejected():
+    schema_plan = SchemaPlan(sample_size=10)
+    schema_plan.add_rows([{"employees": "n/a"}, {"employees": 5.0}])
+    schema_plan.set_existing_columns({"employees": "INT64"})
+
+    assert schema_plan.get_column_type("employees") == INTEGER
+    assert schema_plan.coerce_row({"employees": 5.0}) == {"employees": 5}
+    with pytest.raises(SchemaMismatchError):
+        schema_plan.coerce_row({"employees": "n/a"})
@@ -0,0 +1,32 @@
+from threading import Thread
+
+from utils.spend_meter import SpendMeter
+
+
+def test_spend_adds_request_and_token_prices():
+    spend_meter = SpendMeter(
+        input_price_per_million=1.0, output_price_per_million=2.0, request_price=0.01
+    )
+    spend_meter.record(input_tokens=1_000_000, output_tokens=500_000)
+
+    assert spend_meter.spend == 2.01
+
+
+def test_get_price_does_not_record_usage():
+    spend_meter = SpendMeter(input_price_per_million=1.0, request_price=0.01)
+
+    assert spend_meter.get_price(requests=2, input_tokens=1_000_000) == 1.02
+    assert spend_meter.spend == 0
+
+
+def test_capture_only_collects_usage_of_the_current_thread():
+    spend_meter = SpendMeter()
+    other_thread = Thread(target=spend_meter.record, kwargs={"input_tokens": 5})
+    with spend_meter.capture() as usages:
+        spend_meter.record(input_tokens=1, output_tokens=2)
+        other_thread.start()
+        other_thread.join()
+    spend_meter.record(input_tokens=3)
+
+    assert usages == [[1, 2]]
+    assert spend_meter.input_tokens == 9